@@ -0,0 +1,135 @@
+"""Read path over ``audit_log`` (writes go through ``db.audit_log``).
+
+Pages are keyset ordered by ``(at, id)`` descending, like trade history.
+Each filter has a composite ``(column, at DESC, id DESC)`` index in
+``db/init/01_schema.sql`` so a filtered page is one index range scan, and the
+time range is a bare predicate on the partition key so old months are pruned.
+Exports stream through a server-side cursor in ascending order and never hold
+the whole window in memory.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from . import db
+from .pagination import decode_cursor, encode_cursor
+from .partitions import time_range
+
+MAX_PAGE = 500
+EXPORT_FETCH_ROWS = 2000
+
+_COLUMNS = ("id", "at", "actor", "actor_type", "action", "resource", "resource_id", "details", "ip", "user_agent")
+CSV_HEADER = ["id", "at", "actor", "actorType", "action", "resource", "resourceId", "details", "ip", "userAgent"]
+
+
+def build_query(
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    resource: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    ascending: bool = False,
+) -> Tuple[str, List[Any]]:
+    where: List[str] = []
+    params: List[Any] = []
+    for column, value in (("a.actor", actor), ("a.action", action), ("a.resource", resource)):
+        if value:
+            where.append(f"{column} = %s")
+            params.append(value)
+    range_where, range_params = time_range("a.at", start, end)
+    where.extend(range_where)
+    params.extend(range_params)
+    if cursor:
+        at, row_id = decode_cursor(cursor)
+        where.append(f"(a.at, a.id) {'>' if ascending else '<'} (%s, %s::uuid)")
+        params.extend([at, row_id])
+    sql = f"SELECT {', '.join('a.' + c for c in _COLUMNS)} FROM audit_log a"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    order = "ASC" if ascending else "DESC"
+    sql += f" ORDER BY a.at {order}, a.id {order}"
+    if limit is not None:
+        # one extra row tells us whether there is a next page
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+    return sql, params
+
+
+def to_entry(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    row_id, at, actor, actor_type, action, resource, resource_id, details, ip, user_agent = row
+    if isinstance(details, str):
+        details = json.loads(details)
+    return {
+        "id": str(row_id),
+        "at": at.astimezone(timezone.utc).isoformat(),
+        "actor": actor,
+        "actorType": actor_type,
+        "action": action,
+        "resource": resource,
+        "resourceId": resource_id,
+        "details": details,
+        "ip": ip,
+        "userAgent": user_agent,
+    }
+
+
+async def fetch_page(limit: int, cursor: Optional[str] = None, **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page, newest first, and the cursor for the next page (or None)."""
+    limit = max(1, min(limit, MAX_PAGE))
+    sql, params = build_query(limit=limit, cursor=cursor, **filters)
+    async with db.connection("read") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [to_entry(r) for r in rows], next_cursor
+
+
+async def iter_entries(**filters: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Every matching row, oldest first, via a server-side (named) cursor."""
+    sql, params = build_query(ascending=True, **filters)
+    async with db.connection("read") as conn:
+        async with conn.transaction():  # type: ignore
+            async with conn.cursor(name="audit_export") as cur:  # type: ignore
+                cur.itersize = EXPORT_FETCH_ROWS
+                await cur.execute(sql, params)
+                async for row in cur:
+                    yield to_entry(row)
+
+
+async def export_ndjson(**filters: Any) -> AsyncIterator[bytes]:
+    buf: List[str] = []
+    async for entry in iter_entries(**filters):
+        buf.append(json.dumps(entry, default=str))
+        if len(buf) >= EXPORT_FETCH_ROWS:
+            yield ("\n".join(buf) + "\n").encode()
+            buf.clear()
+    if buf:
+        yield ("\n".join(buf) + "\n").encode()
+
+
+async def export_csv(**filters: Any) -> AsyncIterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    rows = 0
+    async for e in iter_entries(**filters):
+        writer.writerow([
+            e["id"], e["at"], e["actor"], e["actorType"], e["action"], e["resource"], e["resourceId"],
+            json.dumps(e["details"], default=str) if e["details"] is not None else "", e["ip"], e["userAgent"],
+        ])
+        rows += 1
+        if rows % EXPORT_FETCH_ROWS == 0:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue().encode()
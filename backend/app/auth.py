@@ -1,7 +1,256 @@
-from typing import Optional
+"""Bearer-token authentication.
+
+Static tokens (``AUTH_TOKENS`` / ``AUTH_TOKENS_FILE``) live in a prebuilt index
+of keyed digests: a request hashes its token once and does one set lookup, and
+since the key is random per process, lookup timing says nothing about stored
+tokens. The file is re-read when its mtime/size/inode change and the index is
+replaced with a single assignment, so rotation needs no restart; a missing or
+empty file keeps the last good index.
+
+JWTs are accepted when ``AUTH_JWT_JWKS_URL`` (or ``AUTH_JWT_SECRET``) is set and
+PyJWT is installed. Unless ``AUTH_JWT_ALGORITHMS`` is set, the algorithms follow
+the key source (HS256 for a secret, RS256/ES256 for a JWKS); a list that cannot
+match the key source fails startup. The key set is fetched in the background
+and held in memory, so verification of known keys never does I/O on the
+request path. A token signed with a ``kid`` the set does not have triggers one
+refetch (shared by concurrent requests, at most every
+``AUTH_JWKS_MIN_REFETCH_SEC``), so a rotated-in key works before the next
+periodic refresh. Verified tokens are remembered (LRU, bounded by
+``AUTH_CACHE_SIZE``) until the earlier of their ``exp`` and ``AUTH_CACHE_TTL_SEC``.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import httpx
 from fastapi import Depends, Header, HTTPException, status
+from prometheus_client import Counter
+
 from .settings import settings
 
+try:
+    import jwt  # type: ignore
+except Exception:  # pragma: no cover
+    jwt = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+AUTH_RESULTS = Counter("auth_verifications_total", "Token verifications by method and result", ["method", "result"])
+AUTH_TOKEN_RELOADS = Counter("auth_token_reloads_total", "Static token index rebuilds from AUTH_TOKENS_FILE")
+AUTH_JWKS_REFRESHES = Counter("auth_jwks_refreshes_total", "JWKS fetches by result", ["result"])
+
+_KEY = secrets.token_bytes(32)
+
+
+def _digest(token: str) -> bytes:
+    return hmac.new(_KEY, token.encode(), hashlib.sha256).digest()
+
+
+class TokenIndex:
+    """Immutable set of keyed token digests; replaced wholesale on reload."""
+
+    def __init__(self, tokens: List[str], source: Any = None):
+        self.digests: FrozenSet[bytes] = frozenset(_digest(t) for t in tokens if t)
+        self.source = source
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def contains(self, token: str) -> bool:
+        # the only byte comparison is between keyed digests, which callers cannot steer
+        return _digest(token) in self.digests
+
+
+_inline: Tuple[Any, TokenIndex] = (None, TokenIndex([]))
+_file_index: Optional[TokenIndex] = None
+_file_stamp: Optional[Tuple[int, int, int]] = None
+_jwks: Optional[Any] = None
+_jwks_fetched_at = 0.0
+_jwt_cache: "OrderedDict[bytes, float]" = OrderedDict()
+_task: Optional[asyncio.Task] = None
+_kid_refetch: Optional[asyncio.Task] = None
+_kid_refetch_at = float("-inf")
+
+_HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+
+
+def _static_index() -> TokenIndex:
+    global _inline
+    if _file_index is not None:
+        return _file_index
+    src, idx = _inline
+    # settings.AUTH_TOKENS may be reassigned at runtime (tests, admin tooling)
+    if settings.AUTH_TOKENS is not src:
+        idx = TokenIndex(list(settings.AUTH_TOKENS or []), settings.AUTH_TOKENS)
+        _inline = (settings.AUTH_TOKENS, idx)
+    return idx
+
+
+def _read_tokens(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [ln.strip() for ln in f if ln.strip()]
+
+
+def reload_tokens(force: bool = False) -> bool:
+    """Re-read AUTH_TOKENS_FILE if it changed; returns True when the index was swapped."""
+    global _file_index, _file_stamp
+    path = settings.AUTH_TOKENS_FILE
+    if not path:
+        _file_index = _file_stamp = None
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if stamp == _file_stamp and not force:
+        return False
+    try:
+        tokens = _read_tokens(path)
+    except OSError as e:
+        _logger.warning("Failed to load AUTH_TOKENS_FILE: %s", e)
+        return False
+    _file_stamp = stamp
+    if not tokens:
+        # mid-rotation or truncated: keep accepting the last good set
+        _logger.warning("AUTH_TOKENS_FILE is empty; keeping %d previous tokens", len(_file_index or ()))
+        return False
+    _file_index = TokenIndex(tokens, path)
+    AUTH_TOKEN_RELOADS.inc()
+    _logger.info("Loaded %d auth tokens from file", len(tokens))
+    return True
+
+
+def jwt_enabled() -> bool:
+    return jwt is not None and bool(settings.AUTH_JWT_JWKS_URL or settings.AUTH_JWT_SECRET)
+
+
+def jwt_algorithms() -> List[str]:
+    """Accepted JWT algorithms: ``AUTH_JWT_ALGORITHMS``, or the ones the key source can verify."""
+    configured = [a.strip() for a in (settings.AUTH_JWT_ALGORITHMS or "").split(",") if a.strip()]
+    if configured:
+        return configured
+    return ["HS256"] if settings.AUTH_JWT_SECRET else ["RS256", "ES256"]
+
+
+def config_error() -> Optional[str]:
+    """Why the JWT settings cannot verify any token, or None when they are consistent."""
+    if not (settings.AUTH_JWT_JWKS_URL or settings.AUTH_JWT_SECRET):
+        return None
+    algorithms = jwt_algorithms()
+    hmac_only = all(a in _HMAC_ALGORITHMS for a in algorithms)
+    if settings.AUTH_JWT_SECRET and not hmac_only:
+        return f"AUTH_JWT_SECRET verifies HS* tokens only, but AUTH_JWT_ALGORITHMS={','.join(algorithms)}"
+    if not settings.AUTH_JWT_SECRET and any(a in _HMAC_ALGORITHMS for a in algorithms):
+        return f"AUTH_JWT_JWKS_URL keys cannot verify HS* algorithms (AUTH_JWT_ALGORITHMS={','.join(algorithms)})"
+    return None
+
+
+def has_credentials() -> bool:
+    """True when at least one way of authenticating is configured."""
+    return len(_static_index()) > 0 or jwt_enabled()
+
+
+async def refresh_jwks() -> bool:
+    global _jwks, _jwks_fetched_at
+    if jwt is None or not settings.AUTH_JWT_JWKS_URL:
+        return False
+    try:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            r = await client.get(settings.AUTH_JWT_JWKS_URL)
+            r.raise_for_status()
+        _jwks = jwt.PyJWKSet.from_dict(r.json())
+        _jwks_fetched_at = time.monotonic()
+        AUTH_JWKS_REFRESHES.labels("ok").inc()
+        return True
+    except Exception as e:
+        AUTH_JWKS_REFRESHES.labels("error").inc()
+        _logger.warning("auth: JWKS refresh failed: %s", e)
+        return False
+
+
+def _unknown_kid(token: str) -> bool:
+    """True for a JWT whose ``kid`` is not in the cached key set (a refetch may find it)."""
+    if not jwt_enabled() or settings.AUTH_JWT_SECRET or not settings.AUTH_JWT_JWKS_URL or token.count(".") != 2:
+        return False
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")  # type: ignore[union-attr]
+    except Exception:
+        return False
+    if _jwks is None:
+        return True
+    return kid is not None and all(k.key_id != kid for k in _jwks.keys)
+
+
+async def refetch_for_unknown_kid() -> bool:
+    """Refetch the JWKS once for an unseen ``kid``; concurrent callers share the fetch,
+    and a new one starts at most every ``AUTH_JWKS_MIN_REFETCH_SEC``."""
+    global _kid_refetch, _kid_refetch_at
+    if _kid_refetch is None or _kid_refetch.done():
+        now = time.monotonic()
+        if now - _kid_refetch_at < settings.AUTH_JWKS_MIN_REFETCH_SEC:
+            return False
+        _kid_refetch_at = now
+        AUTH_RESULTS.labels("jwt", "kid_refetch").inc()
+        _kid_refetch = asyncio.get_running_loop().create_task(refresh_jwks())
+    return await asyncio.shield(_kid_refetch)
+
+
+def _jwt_key(token: str) -> Any:
+    if settings.AUTH_JWT_SECRET:
+        return settings.AUTH_JWT_SECRET
+    if _jwks is None:
+        return None
+    kid = jwt.get_unverified_header(token).get("kid")  # type: ignore[union-attr]
+    for k in _jwks.keys:
+        if k.key_id == kid or (kid is None and len(_jwks.keys) == 1):
+            return k.key
+    return None
+
+
+def _verify_jwt(token: str) -> bool:
+    if not jwt_enabled() or token.count(".") != 2:
+        return False
+    now = time.time()
+    d = _digest(token)
+    expires = _jwt_cache.get(d)
+    if expires is not None:
+        if expires > now:
+            _jwt_cache.move_to_end(d)
+            AUTH_RESULTS.labels("jwt", "cached").inc()
+            return True
+        del _jwt_cache[d]
+    try:
+        key = _jwt_key(token)
+        if key is None:
+            AUTH_RESULTS.labels("jwt", "unknown_key").inc()
+            return False
+        claims: Dict[str, Any] = jwt.decode(  # type: ignore[union-attr]
+            token,
+            key,
+            algorithms=jwt_algorithms(),
+            audience=settings.AUTH_JWT_AUDIENCE or None,
+            issuer=settings.AUTH_JWT_ISSUER or None,
+            options={"require": ["exp"], "verify_aud": bool(settings.AUTH_JWT_AUDIENCE)},
+        )
+    except Exception:
+        AUTH_RESULTS.labels("jwt", "invalid").inc()
+        return False
+    _jwt_cache[d] = min(float(claims["exp"]), now + settings.AUTH_CACHE_TTL_SEC)
+    while len(_jwt_cache) > max(1, settings.AUTH_CACHE_SIZE):
+        _jwt_cache.popitem(last=False)
+    AUTH_RESULTS.labels("jwt", "ok").inc()
+    return True
+
 
 def _extract_bearer(token_header: Optional[str]) -> Optional[str]:
     if not token_header:
@@ -18,14 +267,69 @@ def validate_token(token: Optional[str]) -> bool:
         return True
     if not token:
         return False
-    # Demo: static token list. Replace with JWT/DB validation for production.
-    return token in set(settings.AUTH_TOKENS or [])
+    if _static_index().contains(token):
+        AUTH_RESULTS.labels("static", "ok").inc()
+        return True
+    if _verify_jwt(token):
+        return True
+    AUTH_RESULTS.labels("static", "rejected").inc()
+    return False
+
+
+async def authenticate(token: Optional[str]) -> bool:
+    """``validate_token`` plus one JWKS refetch when the token names an unseen key."""
+    if validate_token(token):
+        return True
+    if token and _unknown_kid(token) and await refetch_for_unknown_kid():
+        return validate_token(token)
+    return False
 
 
 async def require_auth(authorization: Optional[str] = Header(default=None)):
     if not settings.REQUIRE_AUTH:
         return True
     tok = _extract_bearer(authorization)
-    if not validate_token(tok):
+    if not await authenticate(tok):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
     return True
+
+
+async def _run() -> None:
+    interval = max(0.1, float(settings.AUTH_TOKENS_RELOAD_SEC))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reload_tokens()
+        except Exception as e:
+            _logger.warning("auth: token reload failed: %s", e)
+        if settings.AUTH_JWT_JWKS_URL and time.monotonic() - _jwks_fetched_at >= settings.AUTH_JWKS_CACHE_SEC:
+            await refresh_jwks()
+
+
+async def start() -> None:
+    """Load AUTH_TOKENS_FILE and the JWKS, then watch both for changes.
+
+    Raises ``ValueError`` when the JWT settings cannot verify any token.
+    """
+    global _task
+    error = config_error()
+    if error:
+        raise ValueError(error)
+    reload_tokens(force=True)
+    if settings.AUTH_JWT_JWKS_URL:
+        if jwt is None:
+            _logger.warning("auth: AUTH_JWT_JWKS_URL set but PyJWT is not installed; JWTs will be rejected")
+        else:
+            await refresh_jwks()
+    if (settings.AUTH_TOKENS_FILE or jwt_enabled()) and settings.AUTH_TOKENS_RELOAD_SEC > 0:
+        if _task is None or _task.done():
+            _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Generic, List, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+_logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+# Prometheus metrics (labelled by writer name, e.g. "audit")
+WRITER_QUEUE_DEPTH = Gauge(
+    "batch_writer_queue_depth",
+    "Records buffered in memory waiting to be flushed",
+    ["writer"],
+    multiprocess_mode="livesum",
+)
+WRITER_FLUSH_SECONDS = Histogram(
+    "batch_writer_flush_seconds",
+    "Time to flush one batch (including retries)",
+    ["writer"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+WRITER_RECORDS_WRITTEN = Counter(
+    "batch_writer_records_written_total",
+    "Records successfully flushed",
+    ["writer"],
+)
+WRITER_RECORDS_DROPPED = Counter(
+    "batch_writer_records_dropped_total",
+    "Records dropped (queue_full | flush_failed | shutdown | db_unavailable)",
+    ["writer", "reason"],
+)
+WRITER_FLUSH_FAILURES = Counter(
+    "batch_writer_flush_failures_total",
+    "Failed flush attempts (each retry counts)",
+    ["writer"],
+)
+
+
+class BatchWriter(Generic[T]):
+    """Bounded in-memory buffer drained by one background task.
+
+    ``enqueue`` never waits: callers on the control path hand off a record and
+    return. The writer flushes when ``batch_size`` records are buffered or
+    ``flush_interval`` seconds after the first record of a batch arrived,
+    retrying a failed batch with backoff before dropping it. ``stop`` drains
+    whatever is left.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[T]], Awaitable[None]],
+        *,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+    ):
+        self.name = name
+        self._flush = flush
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._buf: Deque[T] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def enqueue(self, item: T) -> bool:
+        """Buffer one record. Returns False (and counts a drop) when the buffer is full."""
+        if len(self._buf) >= self.max_queue:
+            WRITER_RECORDS_DROPPED.labels(self.name, "queue_full").inc()
+            return False
+        self._buf.append(item)
+        WRITER_QUEUE_DEPTH.labels(self.name).set(len(self._buf))
+        if self._wake is not None and (len(self._buf) == 1 or len(self._buf) >= self.batch_size):
+            self._wake.set()
+        return True
+
+    def start(self) -> bool:
+        if self.running:
+            return False
+        self._stopping = False
+        self._wake = asyncio.Event()
+        if self._buf:
+            self._wake.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Flush everything still buffered, then stop the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._task
+        finally:
+            self._task = None
+            if self._buf:
+                WRITER_RECORDS_DROPPED.labels(self.name, "shutdown").inc(len(self._buf))
+                _logger.warning("%s writer: dropped %d records at shutdown", self.name, len(self._buf))
+                self._buf.clear()
+            WRITER_QUEUE_DEPTH.labels(self.name).set(0)
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            if not self._buf:
+                if self._stopping:
+                    return
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if len(self._buf) < self.batch_size and not self._stopping:
+                # time trigger: give the batch flush_interval to fill up
+                self._wake.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            n = min(len(self._buf), self.batch_size)
+            batch = [self._buf.popleft() for _ in range(n)]
+            WRITER_QUEUE_DEPTH.labels(self.name).set(len(self._buf))
+            await self._flush_with_retry(batch)
+
+    async def _flush_with_retry(self, batch: List[T]) -> None:
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._flush(batch)
+                WRITER_RECORDS_WRITTEN.labels(self.name).inc(len(batch))
+                WRITER_FLUSH_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                WRITER_FLUSH_FAILURES.labels(self.name).inc()
+                _logger.debug("%s writer: flush attempt %d failed: %s", self.name, attempt + 1, e)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        WRITER_FLUSH_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        WRITER_RECORDS_DROPPED.labels(self.name, "flush_failed").inc(len(batch))
+        _logger.warning("%s writer: dropped batch of %d after %d attempts", self.name, len(batch), self.max_retries + 1)
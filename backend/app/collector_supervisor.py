@@ -0,0 +1,187 @@
+"""Supervision for sharded collector processes.
+
+``HLIQ_COLLECTOR_SHARDS`` splits the collector into shards separated by ``;``.
+Each shard is ``venues=A,B``, ``pairs=X/Y,...`` or both joined with ``|`` (a
+bare list means venues). Its process gets them as ``COLLECTOR_VENUES`` /
+``COLLECTOR_PAIRS``, plus ``COLLECTOR_SHARD`` and ``COLLECTOR_SHARDS``. An
+empty spec is one shard that covers everything.
+
+Every shard runs in its own supervised task. When a shard exits or crashes it is
+restarted after a full-jitter exponential backoff (``HLIQ_COLLECTOR_RESTART_*``).
+A run that stayed up longer than the maximum delay resets the backoff. Shards
+can be pinned to CPUs with ``HLIQ_COLLECTOR_CPUS``.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+from .settings import settings
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+COLLECTOR_RESTARTS = Counter("collector_shard_restarts_total", "Collector shard restarts after an exit or crash", ["shard"])
+COLLECTOR_UP = Gauge(
+    "collector_shard_up",
+    "1 while the collector shard's process is running",
+    ["shard"],
+    multiprocess_mode="livemax",
+)
+
+_FILTER_ENV = {"venues": "COLLECTOR_VENUES", "pairs": "COLLECTOR_PAIRS"}
+
+
+class Shard:
+    """One collector shard: its filter, CPU pinning and health."""
+
+    def __init__(self, index: int, count: int, filters: Optional[Dict[str, str]] = None, cpus: Optional[Set[int]] = None):
+        self.index = index
+        self.count = count
+        self.filters = filters or {}
+        self.cpus = cpus
+        self.state = "stopped"  # starting | running | backoff | stopped
+        self.pid: Optional[int] = None
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self.last_exit: Optional[float] = None
+        self.last_exit_code: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.quotes = 0
+        self.last_quote_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return str(self.index)
+
+    def env(self) -> Dict[str, str]:
+        env = {"COLLECTOR_SHARD": str(self.index), "COLLECTOR_SHARDS": str(self.count)}
+        for key, value in self.filters.items():
+            env[_FILTER_ENV[key]] = value
+        return env
+
+    def quotes_seen(self, n: int) -> None:
+        self.quotes += n
+        self.last_quote_at = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "shard": self.index,
+            "filters": dict(self.filters),
+            "cpus": sorted(self.cpus) if self.cpus else None,
+            "state": self.state,
+            "pid": self.pid,
+            "restarts": self.restarts,
+            "uptimeSec": round(now - self.started_at, 3) if self.started_at and self.state == "running" else None,
+            "lastExitCode": self.last_exit_code,
+            "lastError": self.last_error,
+            "quotes": self.quotes,
+            "lastQuoteAgeSec": round(now - self.last_quote_at, 3) if self.last_quote_at else None,
+        }
+
+
+def parse_cpus(spec: Optional[str]) -> List[int]:
+    """``"0,2-3"`` -> [0, 2, 3]."""
+    cpus: List[int] = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if sep:
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def parse_shards(spec: Optional[str], cpus: Optional[str] = None) -> List[Shard]:
+    """Shards from ``HLIQ_COLLECTOR_SHARDS``; shard i gets CPU ``cpus[i % len(cpus)]``."""
+    items = [s.strip() for s in (spec or "").split(";") if s.strip()]
+    cpu_list = parse_cpus(cpus)
+    shards: List[Shard] = []
+    for i, item in enumerate(items or [""]):
+        filters: Dict[str, str] = {}
+        for clause in item.split("|"):
+            clause = clause.strip()
+            if not clause:
+                continue
+            key, sep, value = clause.partition("=")
+            if not sep:
+                key, value = "venues", clause
+            key = key.strip().lower()
+            if key not in _FILTER_ENV:
+                raise ValueError(f"unknown collector shard filter {key!r} (expected venues= or pairs=)")
+            filters[key] = ",".join(v.strip() for v in value.split(",") if v.strip())
+        pinned = {cpu_list[i % len(cpu_list)]} if cpu_list else None
+        shards.append(Shard(i, max(1, len(items)), filters, pinned))
+    return shards
+
+
+RunShard = Callable[[Shard], Awaitable[Optional[int]]]
+
+
+class Supervisor:
+    """Runs ``run_shard(shard)`` for every shard and restarts it whenever it returns or raises."""
+
+    def __init__(
+        self,
+        shards: List[Shard],
+        run_shard: RunShard,
+        *,
+        backoff_base_ms: Optional[int] = None,
+        backoff_max_ms: Optional[int] = None,
+    ):
+        self.shards = shards
+        self._run_shard = run_shard
+        self.backoff_base = (backoff_base_ms if backoff_base_ms is not None else settings.HLIQ_COLLECTOR_RESTART_BASE_MS) / 1000.0
+        self.backoff_max = (backoff_max_ms if backoff_max_ms is not None else settings.HLIQ_COLLECTOR_RESTART_MAX_MS) / 1000.0
+
+    def _backoff_delay(self, attempt: int) -> float:
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def _supervise(self, shard: Shard) -> None:
+        attempt = 0
+        try:
+            while True:
+                shard.state = "starting"
+                shard.started_at = time.time()
+                started = time.monotonic()
+                try:
+                    shard.last_exit_code = await self._run_shard(shard)
+                    shard.last_error = None
+                    _logger.warning("collector shard %s exited rc=%s; restarting", shard.name, shard.last_exit_code)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    shard.last_error = str(e)
+                    _logger.exception("collector shard %s crashed: %s", shard.name, e)
+                finally:
+                    shard.pid = None
+                    shard.last_exit = time.time()
+                    COLLECTOR_UP.labels(shard.name).set(0)
+                attempt = 0 if time.monotonic() - started > self.backoff_max else attempt + 1
+                shard.state = "backoff"
+                shard.restarts += 1
+                COLLECTOR_RESTARTS.labels(shard.name).inc()
+                await asyncio.sleep(self._backoff_delay(attempt))
+        finally:
+            shard.state = "stopped"
+
+    async def run(self) -> None:
+        tasks = [asyncio.ensure_future(self._supervise(shard)) for shard in self.shards]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # cancelling gather cancels every shard but returns as soon as the first one is
+            # done; wait until the others have stopped their processes too
+            await asyncio.wait(tasks)
+
+    def health(self) -> List[Dict[str, Any]]:
+        return [shard.as_dict() for shard in self.shards]
@@ -1,58 +1,222 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import json
 import logging
-from typing import Any, Optional, Dict
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional, Dict, List, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
 
 from .settings import settings
+from .batch_writer import WRITER_RECORDS_DROPPED, BatchWriter
 
 try:
     # psycopg3 async pool
-    from psycopg_pool import AsyncConnectionPool  # type: ignore
+    from psycopg_pool import AsyncConnectionPool, PoolTimeout  # type: ignore
     import psycopg  # type: ignore
 except Exception:  # pragma: no cover
     AsyncConnectionPool = None  # type: ignore
+    PoolTimeout = TimeoutError  # type: ignore
     psycopg = None  # type: ignore
 
 _logger = logging.getLogger("uvicorn.error")
 
-_pool: Optional[AsyncConnectionPool] = None
+# Prometheus metrics (labelled by pool name)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Connection checkouts that timed out",
+    ["pool"],
+)
+# set on every checkout/return and by a periodic sampler (scrape-time callbacks are not
+# exported in multiprocess mode); each worker has its own pools, so workers add up
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool", ["pool"], multiprocess_mode="livesum"
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_connections_idle", "Idle connections available in the pool", ["pool"], multiprocess_mode="livesum"
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_requests_waiting", "Requests queued for a connection", ["pool"], multiprocess_mode="livesum"
+)
+
+# Named pools:
+#   control - latency-sensitive reads/writes on the request path
+#   bulk    - background writers (audit, orders write-behind, rollups, snapshots)
+#   read    - history/chart reads; a replica when DATABASE_READ_URL is set, else the control pool
+POOL_NAMES = ("control", "bulk", "read")
+_pools: Dict[str, AsyncConnectionPool] = {}
+_stats_task: Optional[asyncio.Task] = None
+
+_AUDIT_COLUMNS = ("at", "actor", "actor_type", "action", "resource", "resource_id", "details", "ip", "user_agent")
+AuditRow = Tuple[Any, ...]
+_audit_writer: Optional[BatchWriter[AuditRow]] = None
 
 
 def is_enabled() -> bool:
     return bool(settings.DATABASE_URL) and AsyncConnectionPool is not None
 
 
+def get_pool(name: str = "control") -> Optional[AsyncConnectionPool]:
+    """A named pool, or None when the DB is disabled or not initialized yet."""
+    return _pools.get(name)
+
+
+def _pool_config(name: str) -> Tuple[str, int, int, float]:
+    if name == "bulk":
+        return (settings.DATABASE_URL or "", settings.DB_BULK_POOL_MIN, settings.DB_BULK_POOL_MAX,
+                settings.DB_BULK_POOL_TIMEOUT_SEC)
+    if name == "read":
+        return (settings.DATABASE_READ_URL or "", settings.DB_READ_POOL_MIN, settings.DB_READ_POOL_MAX,
+                settings.DB_POOL_TIMEOUT_SEC)
+    return (settings.DATABASE_URL or "", settings.DB_CONTROL_POOL_MIN, settings.DB_CONTROL_POOL_MAX,
+            settings.DB_POOL_TIMEOUT_SEC)
+
+
+def _sample_pool(name: str, pool: Any) -> None:
+    try:
+        stats = pool.get_stats()
+    except Exception:  # pragma: no cover
+        return
+    size, available = stats.get("pool_size", 0), stats.get("pool_available", 0)
+    DB_POOL_IDLE.labels(name).set(available)
+    DB_POOL_IN_USE.labels(name).set(size - available)
+    DB_POOL_WAITING.labels(name).set(stats.get("requests_waiting", 0))
+
+
+async def _sample_pools() -> None:
+    # catches changes no checkout sees: connections opened, closed or expired by the pool itself
+    while True:
+        for name, pool in list(_pools.items()):
+            _sample_pool(name, pool)
+        await asyncio.sleep(settings.DB_POOL_STATS_INTERVAL_SEC)
+
+
+async def _open_pool(name: str) -> AsyncConnectionPool:
+    conninfo, min_size, max_size, timeout = _pool_config(name)
+    # psycopg prepares a statement server-side once it has run prepare_threshold
+    # times on a connection; our statements are a small fixed set, so prepare early.
+    # A negative threshold disables preparing (e.g. behind pgbouncer transaction pooling).
+    threshold: Optional[int] = settings.DB_PREPARE_THRESHOLD if settings.DB_PREPARE_THRESHOLD >= 0 else None
+    pool = AsyncConnectionPool(
+        conninfo,
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+        name=name,
+        kwargs={"prepare_threshold": threshold},
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
 async def init_pool() -> None:
-    global _pool
+    global _stats_task
     if not settings.DATABASE_URL:
         _logger.info("DATABASE_URL not set; DB features disabled")
         return
     if AsyncConnectionPool is None:
         _logger.warning("psycopg_pool not available; DB features disabled")
         return
-    if _pool is None:
-        _logger.info("Initializing DB pool to %s", settings.DATABASE_URL)
-        # Min pool size small to reduce overhead in dev
-        _pool = AsyncConnectionPool(settings.DATABASE_URL, min_size=1, max_size=5, timeout=10)
+    if _pools:
+        return
+    _logger.info("Initializing DB pools to %s", settings.DATABASE_URL)
+    try:
+        _pools["control"] = await _open_pool("control")
+        _pools["bulk"] = await _open_pool("bulk")
+        if settings.DATABASE_READ_URL:
+            _logger.info("Routing reads to replica %s", settings.DATABASE_READ_URL)
+            _pools["read"] = await _open_pool("read")
+        else:
+            _pools["read"] = _pools["control"]
         # Test a connection
-        try:
-            async with _pool.connection() as conn:  # type: ignore
-                async with conn.cursor() as cur:  # type: ignore
-                    await cur.execute("SELECT 1")
-            _logger.info("DB pool initialized")
-        except Exception as e:
-            _logger.warning("Failed to initialize DB pool: %s", str(e))
-            await close_pool()
+        async with connection("control") as conn:
+            async with conn.cursor() as cur:  # type: ignore
+                await cur.execute("SELECT 1")
+        _logger.info("DB pools initialized")
+        if _stats_task is None:
+            _stats_task = asyncio.get_running_loop().create_task(_sample_pools())
+        start_audit_writer()
+    except Exception as e:
+        _logger.warning("Failed to initialize DB pool: %s", str(e))
+        await close_pool()
 
 
 async def close_pool() -> None:
-    global _pool
-    if _pool is not None:
+    global _stats_task
+    # Drain buffered audit rows while the pool is still usable
+    await stop_audit_writer()
+    task, _stats_task = _stats_task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    for name in _pools:
+        for gauge in (DB_POOL_IDLE, DB_POOL_IN_USE, DB_POOL_WAITING):
+            gauge.labels(name).set(0)
+    pools = list({id(p): p for p in _pools.values()}.values())
+    _pools.clear()
+    for pool in pools:
+        with contextlib.suppress(Exception):
+            await pool.close()  # type: ignore
+
+
+@contextlib.asynccontextmanager
+async def connection(pool: str = "control", timeout: Optional[float] = None) -> AsyncIterator[Any]:
+    """Check out a connection from a named pool, recording wait time and timeouts."""
+    p = _pools.get(pool)
+    if p is None:
+        raise RuntimeError("DB pool not initialized")
+    async with contextlib.AsyncExitStack() as stack:
+        # registered first so it runs last, once the connection is back in the pool
+        stack.callback(_sample_pool, pool, p)
+        started = time.perf_counter()
         try:
-            await _pool.close()  # type: ignore
+            conn = await stack.enter_async_context(p.connection(timeout=timeout))  # type: ignore
+        except PoolTimeout:
+            DB_POOL_TIMEOUTS.labels(pool).inc()
+            raise
         finally:
-            _pool = None
+            DB_POOL_CHECKOUT_WAIT.labels(pool).observe(time.perf_counter() - started)
+        _sample_pool(pool, p)
+        yield conn
+
+
+async def _flush_audit(rows: List[AuditRow]) -> None:
+    """Write one batch of audit rows with COPY (single round trip per batch)."""
+    async with connection("bulk") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            async with cur.copy(f"COPY audit_log ({', '.join(_AUDIT_COLUMNS)}) FROM STDIN") as copy:
+                for row in rows:
+                    await copy.write_row(row)
+
+
+def start_audit_writer() -> None:
+    """Start the background audit writer (idempotent; needs a running loop)."""
+    global _audit_writer
+    if _audit_writer is None:
+        _audit_writer = BatchWriter(
+            "audit",
+            _flush_audit,
+            max_queue=settings.AUDIT_QUEUE_MAX,
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            flush_interval=settings.AUDIT_FLUSH_INTERVAL_MS / 1000.0,
+        )
+    _audit_writer.start()
+
+
+async def stop_audit_writer() -> None:
+    if _audit_writer is not None:
+        await _audit_writer.stop()
 
 
 async def audit_log(
@@ -66,45 +230,32 @@ async def audit_log(
     ip: Optional[str] = None,
     user_agent: Optional[str] = None,
 ) -> None:
-    """Insert an audit_log row. No-ops if DB is not configured.
+    """Queue an audit_log row for the background writer. No-ops if DB is not configured.
 
-    This function is safe to call from anywhere; if the connection pool isn't available
-    it will log a debug message and return without raising.
+    Returns immediately: the row is timestamped here and written in a later batch,
+    so a slow database never delays the control action being audited. If the
+    buffer is full the row is dropped and counted rather than blocking. Pools are
+    opened at startup only; while they are not open (startup failed, or shutdown)
+    a configured DB's rows are dropped and counted too.
     """
-    if _pool is None:
-        # Optionally lazy-init to allow calling without explicit startup ordering
+    if not _pools:
         if is_enabled():
-            try:
-                await init_pool()
-            except Exception as e:  # pragma: no cover
-                _logger.debug("audit_log: init_pool failed: %s", e)
-                return
-        else:
-            return
-
-    sql = (
-        "INSERT INTO audit_log (actor, actor_type, action, resource, resource_id, details, ip, user_agent) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
-    )
-    try:
-        async with _pool.connection() as conn:  # type: ignore
-            async with conn.cursor() as cur:  # type: ignore
-                await cur.execute(
-                    sql,
-                    (
-                        actor,
-                        actor_type,
-                        action,
-                        resource,
-                        resource_id,
-                        details or {},
-                        ip,
-                        user_agent,
-                    ),
-                )
-    except Exception as e:
-        # Don't raise from control paths; just log
-        _logger.debug("audit_log insert failed: %s", e)
+            WRITER_RECORDS_DROPPED.labels("audit", "db_unavailable").inc()
+        return
+    if _audit_writer is None or not _audit_writer.running:
+        start_audit_writer()
+    assert _audit_writer is not None
+    _audit_writer.enqueue((
+        datetime.now(timezone.utc),
+        actor,
+        actor_type,
+        action,
+        resource,
+        resource_id,
+        json.dumps(details or {}, default=str),
+        ip,
+        user_agent,
+    ))
 
 
 def mask_token(tok: Optional[str]) -> Optional[str]:
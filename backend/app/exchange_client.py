@@ -1,13 +1,18 @@
 from __future__ import annotations
 import asyncio
+import logging
 import random
 import time
-from typing import Any, Dict, Optional
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Tuple
 
 import httpx
-from prometheus_client import Counter, Gauge
+from prometheus_client import Counter, Gauge, Histogram
 
 from .settings import settings
+from .exchange_throttle import get_scheduler
+from . import log_pipeline
 
 # Prometheus metrics
 EXCHANGE_REQUESTS = Counter(
@@ -17,124 +22,567 @@ EXCHANGE_REQUESTS = Counter(
 )
 CIRCUIT_OPEN = Gauge(
     "exchange_circuit_breaker_open",
-    "Circuit breaker open state (1=open, 0=closed)",
+    "Circuit breaker open state per venue/operation (1=open, 0=closed or half-open)",
+    ["venue", "operation"],
 )
+CIRCUIT_STATE = Gauge(
+    "exchange_circuit_breaker_state",
+    "Circuit breaker state per venue/operation (0=closed, 1=half_open, 2=open)",
+    ["venue", "operation"],
+)
+CIRCUIT_FAILURE_RATE = Gauge(
+    "exchange_circuit_breaker_failure_rate",
+    "Failure rate over the breaker's rolling window",
+    ["venue", "operation"],
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "exchange_circuit_breaker_transitions_total",
+    "Circuit breaker state transitions",
+    ["venue", "operation", "from_state", "to_state"],
+)
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+EXCHANGE_LATENCY = Histogram(
+    "exchange_request_duration_seconds",
+    "End-to-end exchange call latency including throttling, retries and backoff",
+    ["venue", "operation", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+EXCHANGE_ATTEMPT_LATENCY = Histogram(
+    "exchange_attempt_duration_seconds",
+    "Latency of a single HTTP attempt (attempt=0 is the first try)",
+    ["venue", "operation", "attempt", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+EXCHANGE_BACKOFF = Histogram(
+    "exchange_backoff_sleep_seconds",
+    "Time spent sleeping in retry backoff per call",
+    ["venue", "operation"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+EXCHANGE_RESPONSE_BYTES = Histogram(
+    "exchange_response_size_bytes",
+    "Exchange response body size",
+    ["venue", "operation"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+# Structured per-call trace log, sampled at EXCHANGE_TRACE_SAMPLE_RATE (written off the event loop)
+TRACE_LOGGER = log_pipeline.get_logger("app.exchange.trace")
+
+_STATE_CODES = {"closed": 0, "half_open": 1, "open": 2}
 
 
 class CircuitBreaker:
-    def __init__(self, fail_threshold: int = 5, open_cooldown_sec: int = 30):
-        self.fail_threshold = fail_threshold
+    """Rolling-window circuit breaker for one (venue, operation).
+
+    Opens when at least ``min_requests`` outcomes were seen in the last ``window_sec``
+    and the failure ratio reaches ``failure_rate_threshold``. After ``open_cooldown_sec``
+    exactly one caller is admitted as a half-open probe; everyone else is rejected
+    until that probe reports back. All transitions happen without awaiting, so the
+    check-and-set is atomic on the event loop.
+    """
+
+    def __init__(
+        self,
+        venue: str = "default",
+        operation: str = "default",
+        failure_rate_threshold: float = 0.5,
+        window_sec: float = 30.0,
+        min_requests: int = 5,
+        open_cooldown_sec: float = 30.0,
+    ):
+        self.venue = venue
+        self.operation = operation
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_sec = window_sec
+        self.min_requests = min_requests
         self.open_cooldown_sec = open_cooldown_sec
         self._state = "closed"  # closed | open | half_open
-        self._fail_count = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (monotonic ts, ok)
+        self._failures = 0
         self._opened_at: Optional[float] = None
-        CIRCUIT_OPEN.set(0)
+        self._probe_inflight = False
+        self._publish()
+
+    def _publish(self) -> None:
+        CIRCUIT_OPEN.labels(self.venue, self.operation).set(1 if self._state == "open" else 0)
+        CIRCUIT_STATE.labels(self.venue, self.operation).set(_STATE_CODES[self._state])
+        CIRCUIT_FAILURE_RATE.labels(self.venue, self.operation).set(self.failure_rate)
+
+    def _transition(self, new_state: str) -> None:
+        CIRCUIT_TRANSITIONS.labels(self.venue, self.operation, self._state, new_state).inc()
+        self._state = new_state
+        if new_state == "open":
+            self._opened_at = time.monotonic()
+        elif new_state == "closed":
+            self._opened_at = None
+            self._outcomes.clear()
+            self._failures = 0
+        self._publish()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_sec
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._trim(now)
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+
+    @property
+    def failure_rate(self) -> float:
+        total = len(self._outcomes)
+        return (self._failures / total) if total else 0.0
 
     def allow_request(self) -> bool:
         if self._state == "closed":
             return True
         if self._state == "open":
-            if self._opened_at and (time.time() - self._opened_at) >= self.open_cooldown_sec:
-                # allow a probe in half-open
-                self._state = "half_open"
+            if self._opened_at is not None and (time.monotonic() - self._opened_at) >= self.open_cooldown_sec:
+                self._transition("half_open")
+                self._probe_inflight = True
                 return True
             return False
-        if self._state == "half_open":
-            # allow a single inflight probe - naive implementation assumes caller serializes
+        # half_open: admit a new probe only if the previous one was released
+        if not self._probe_inflight:
+            self._probe_inflight = True
             return True
-        return True
+        return False
 
-    def on_success(self):
-        self._fail_count = 0
-        self._state = "closed"
-        self._opened_at = None
-        CIRCUIT_OPEN.set(0)
+    def on_success(self, probe: bool = False):
+        if self._state == "half_open":
+            # only the admitted probe decides; stragglers from before the trip are ignored
+            if probe:
+                self._probe_inflight = False
+                self._transition("closed")
+            return
+        self._record(True)
+        self._publish()
 
-    def on_failure(self):
-        self._fail_count += 1
+    def on_failure(self, probe: bool = False):
         if self._state == "half_open":
-            # on probe failure -> open
-            self._state = "open"
-            self._opened_at = time.time()
-            CIRCUIT_OPEN.set(1)
+            if probe:
+                # probe failed -> back to open for another cooldown
+                self._probe_inflight = False
+                self._transition("open")
+            return
+        if self._state == "open":
             return
-        if self._fail_count >= self.fail_threshold:
-            self._state = "open"
-            self._opened_at = time.time()
-            CIRCUIT_OPEN.set(1)
+        self._record(False)
+        if (
+            self._state == "closed"
+            and len(self._outcomes) >= self.min_requests
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._transition("open")
+            return
+        self._publish()
+
+    def release_probe(self):
+        """Give up the half-open probe slot without an outcome (e.g. caller cancelled)."""
+        if self._state == "half_open":
+            self._probe_inflight = False
 
     @property
     def state(self) -> str:
         return self._state
 
 
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+
+def get_breaker(venue: str, operation: str) -> CircuitBreaker:
+    """Return the shared breaker for (venue, operation)."""
+    key = (venue, operation)
+    cb = _breakers.get(key)
+    if cb is None:
+        cb = CircuitBreaker(
+            venue,
+            operation,
+            failure_rate_threshold=settings.EXCHANGE_CB_FAILURE_RATE,
+            window_sec=settings.EXCHANGE_CB_WINDOW_SEC,
+            min_requests=settings.EXCHANGE_CB_MIN_REQUESTS,
+            open_cooldown_sec=settings.EXCHANGE_CB_COOLDOWN_SEC,
+        )
+        _breakers[key] = cb
+    return cb
+
+
+class RetryBudget:
+    """Cap retries at ``ratio`` of recent first attempts (plus a small floor).
+
+    Counts are kept in one-second buckets over ``window_sec`` with running totals,
+    so the check is O(1) regardless of traffic. Under a venue-wide brownout every
+    request fails at once; the budget keeps retries from multiplying that load.
+    """
+
+    def __init__(self, ratio: float = 0.2, window_sec: int = 10, min_per_sec: float = 1.0):
+        self.ratio = ratio
+        self.window_sec = max(1, int(window_sec))
+        self.min_per_sec = min_per_sec
+        self._buckets: Deque[list] = deque()  # [second, requests, retries]
+        self._requests = 0
+        self._retries = 0
+
+    def _bucket(self) -> list:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window_sec:
+            _, requests, retries = self._buckets.popleft()
+            self._requests -= requests
+            self._retries -= retries
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self) -> None:
+        self._bucket()[1] += 1
+        self._requests += 1
+
+    def try_spend(self) -> bool:
+        """Reserve one retry if the budget allows it."""
+        current = self._bucket()
+        if self._retries + 1 > self.ratio * self._requests + self.min_per_sec * self.window_sec:
+            return False
+        current[2] += 1
+        self._retries += 1
+        return True
+
+
+class RecentOrders:
+    """TTL cache of client order ids we have already sent.
+
+    A second ``place_order`` with the same id joins the in-flight call or gets the
+    cached acknowledgement back instead of sending another order to the venue.
+    Each send runs in its own task, so cancelling one caller (the original or a
+    joiner) never cancels the send the others are waiting on. Failed sends are
+    forgotten so the caller can retry with the same id.
+    """
+
+    def __init__(self, ttl_sec: float = 600.0, max_entries: int = 10_000):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        # entries are in insertion order, so expired ones are always at the front
+        while self._entries:
+            ts, _ = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_entries and now - ts < self.ttl_sec:
+                break
+            self._entries.popitem(last=False)
+
+    def get(self, client_order_id: str) -> Optional[asyncio.Task]:
+        self._evict(time.monotonic())
+        entry = self._entries.get(client_order_id)
+        return entry[1] if entry else None
+
+    def start(self, client_order_id: str, send: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(send)
+        self._entries[client_order_id] = (time.monotonic(), task)
+        task.add_done_callback(lambda t: self._finished(client_order_id, t))
+        return task
+
+    def _finished(self, client_order_id: str, task: asyncio.Task) -> None:
+        # exception() also marks the error retrieved in case nobody awaited this send
+        if task.cancelled() or task.exception() is not None:
+            self.forget(client_order_id, task)
+
+    def forget(self, client_order_id: str, task: Optional[asyncio.Task] = None) -> None:
+        entry = self._entries.get(client_order_id)
+        if entry is not None and (task is None or entry[1] is task):
+            del self._entries[client_order_id]
+
+
+def new_client_order_id() -> str:
+    """Generate an idempotency key stored as ``orders.client_order_id``."""
+    return f"arb-{uuid.uuid4().hex}"
+
+
+class _ServerError(httpx.HTTPError):
+    """5xx from the venue (retryable, counts against the breaker)."""
+
+
+class OutcomeUnknown(RuntimeError):
+    """The request may have reached the venue but its result was lost.
+
+    Raised when retries run out after read-side failures (read timeouts, dropped
+    responses) or when a 2xx body cannot be decoded. For order writes the order
+    may be live on the venue and has to be reconciled, not treated as rejected.
+    """
+
+
+# Failures after the request was written: the venue may have acted on it
+_AMBIGUOUS_ERRORS = (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+class _CallTrace:
+    """Collects timings for one logical exchange call (all attempts).
+
+    Metrics are always recorded; the structured log line is only emitted for
+    sampled calls.
+    """
+
+    def __init__(self, venue: str, op: str, method: str, path: str):
+        self.venue = venue
+        self.op = op
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.sampled = settings.EXCHANGE_TRACE_SAMPLE_RATE > 0 and random.random() < settings.EXCHANGE_TRACE_SAMPLE_RATE
+        self.attempts: List[Dict[str, Any]] = []
+        self.backoff = 0.0
+        self.throttle_wait = 0.0
+
+    def attempt(self, n: int, started: float, outcome: str, status_code: Optional[int] = None, nbytes: Optional[int] = None) -> None:
+        dur = time.perf_counter() - started
+        EXCHANGE_ATTEMPT_LATENCY.labels(self.venue, self.op, str(n), outcome).observe(dur)
+        if nbytes is not None:
+            EXCHANGE_RESPONSE_BYTES.labels(self.venue, self.op).observe(nbytes)
+        if self.sampled:
+            self.attempts.append({
+                "attempt": n,
+                "outcome": outcome,
+                "status_code": status_code,
+                "duration_ms": round(dur * 1000, 3),
+                "bytes": nbytes,
+            })
+
+    def finish(self, status: str, error: Optional[str] = None, **extra: Any) -> None:
+        dur = time.perf_counter() - self.start
+        EXCHANGE_LATENCY.labels(self.venue, self.op, status).observe(dur)
+        if self.backoff > 0:
+            EXCHANGE_BACKOFF.labels(self.venue, self.op).observe(self.backoff)
+        if self.sampled:
+            TRACE_LOGGER.info({
+                "event": "exchange_call",
+                "venue": self.venue,
+                "operation": self.op,
+                "method": self.method,
+                "path": self.path,
+                "status": status,
+                "duration_ms": round(dur * 1000, 3),
+                "throttle_ms": round(self.throttle_wait * 1000, 3),
+                "backoff_ms": round(self.backoff * 1000, 3),
+                "attempts": self.attempts,
+                "error": error,
+                **extra,
+            })
+
+
+def _retry_after_seconds(resp: httpx.Response, default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("retry-after", default)))
+    except (TypeError, ValueError):
+        return default
+
+
 class ExchangeClient:
-    def __init__(self, base_url: str, api_key: Optional[str], api_secret: Optional[str]):
+    def __init__(self, base_url: str, api_key: Optional[str], api_secret: Optional[str], venue: str = "default"):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.api_secret = api_secret
+        self.venue = venue
         # A single async client - lifetime is app lifetime
         self._client = httpx.AsyncClient(timeout=10.0)
-        self._cb = CircuitBreaker()
         # Retry/backoff params
         self._max_retries = 4
         self._backoff_base = 0.2
         self._backoff_factor = 2.0
         self._backoff_max = 5.0
+        # Client-side token bucket shared by all clients of this venue
+        self._throttle = get_scheduler(venue) if settings.EXCHANGE_RATE_LIMIT_PER_SEC > 0 else None
+        # Retries are capped by budget; order writes are deduped by client order id
+        self._retry_budget = RetryBudget(
+            ratio=settings.EXCHANGE_RETRY_BUDGET_RATIO,
+            window_sec=settings.EXCHANGE_RETRY_BUDGET_WINDOW_SEC,
+            min_per_sec=settings.EXCHANGE_RETRY_BUDGET_MIN_PER_SEC,
+        )
+        self._recent_orders = RecentOrders(ttl_sec=settings.EXCHANGE_ORDER_DEDUPE_TTL_SEC)
+        self._order_timeout = settings.EXCHANGE_ORDER_TIMEOUT_SEC
 
-    async def _sleep_backoff(self, attempt: int):
+    async def _sleep_backoff(self, attempt: int) -> float:
         delay = min(self._backoff_base * (self._backoff_factor ** attempt), self._backoff_max)
         # jitter +- 50ms
         delay += random.uniform(0, 0.05)
+        started = time.perf_counter()
         await asyncio.sleep(delay)
+        return time.perf_counter() - started
 
-    def _headers(self) -> Dict[str, str]:
+    def _headers(self, idempotency_key: Optional[str] = None) -> Dict[str, str]:
         hdrs: Dict[str, str] = {"User-Agent": "arb-console/0.1"}
         if self.api_key:
             hdrs["X-API-KEY"] = self.api_key
         if self.api_secret:
             hdrs["X-API-SECRET"] = self.api_secret
+        if idempotency_key:
+            hdrs["Idempotency-Key"] = idempotency_key
         return hdrs
 
-    async def _request(self, op: str, method: str, path: str, *, json: Any | None = None, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
-        if not self._cb.allow_request():
+    def _breaker(self, op: str) -> CircuitBreaker:
+        return get_breaker(self.venue, op)
+
+    def _may_retry(self, op: str, idempotent: bool, attempt: int) -> bool:
+        if not idempotent or attempt >= self._max_retries:
+            return False
+        if not self._retry_budget.try_spend():
+            EXCHANGE_REQUESTS.labels(op, "retry_budget_exhausted").inc()
+            return False
+        return True
+
+    async def _request(
+        self,
+        op: str,
+        method: str,
+        path: str,
+        *,
+        json: Any | None = None,
+        params: Dict[str, Any] | None = None,
+        idempotency_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        trace = _CallTrace(self.venue, op, method, path)
+        cb = self._breaker(op)
+        if not cb.allow_request():
             EXCHANGE_REQUESTS.labels(op, "circuit_open").inc()
+            trace.finish("circuit_open")
             raise RuntimeError("circuit breaker open")
+        # allow_request() only leaves the breaker half-open for the caller it admitted as probe
+        probe = cb.state == "half_open"
+        try:
+            data = await self._request_attempts(
+                cb, probe, trace, op, method, path,
+                json=json, params=params, idempotency_key=idempotency_key, timeout=timeout,
+            )
+        except Exception as e:
+            trace.finish("failed", error=str(e), probe=probe)
+            raise
+        finally:
+            if probe:
+                # no-op unless the probe ended without reporting an outcome
+                cb.release_probe()
+        trace.finish("ok", probe=probe)
+        return data
+
+    async def _request_attempts(
+        self,
+        cb: CircuitBreaker,
+        probe: bool,
+        trace: _CallTrace,
+        op: str,
+        method: str,
+        path: str,
+        *,
+        json: Any | None,
+        params: Dict[str, Any] | None,
+        idempotency_key: Optional[str],
+        timeout: Optional[float],
+    ) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
+        # Reads are always safe to resend; writes only when the venue can dedupe them
+        idempotent = method == "GET" or bool(idempotency_key)
+        headers = self._headers(idempotency_key)
+        extra: Dict[str, Any] = {"timeout": timeout} if timeout is not None else {}
         last_exc: Optional[Exception] = None
+        self._retry_budget.record_request()
         for attempt in range(self._max_retries + 1):
+            if self._throttle is not None:
+                trace.throttle_wait += await self._throttle.acquire(op)
+            started = time.perf_counter()
             try:
-                resp = await self._client.request(method, url, headers=self._headers(), json=json, params=params)
+                resp = await self._client.request(method, url, headers=headers, json=json, params=params, **extra)
+                if resp.status_code == 429:
+                    trace.attempt(attempt, started, "rate_limited", 429, len(resp.content))
+                    # Venue says we are over its limit: back off the whole bucket, not just this call.
+                    # This is our fault, not the venue's, so it must not count against the breaker.
+                    last_exc = httpx.HTTPError("rate limited 429")
+                    if self._throttle is not None:
+                        self._throttle.penalize(_retry_after_seconds(resp))
+                    if self._may_retry(op, True, attempt):
+                        # a 429 means the venue rejected the request, so resending is safe
+                        EXCHANGE_REQUESTS.labels(op, "rate_limited").inc()
+                        if self._throttle is None:
+                            trace.backoff += await self._sleep_backoff(attempt)
+                        continue
+                    EXCHANGE_REQUESTS.labels(op, "failed").inc()
+                    break
                 if resp.status_code >= 500:
-                    raise httpx.HTTPError(f"server error {resp.status_code}")
-                data = resp.json()
-                self._cb.on_success()
+                    trace.attempt(attempt, started, "server_error", resp.status_code, len(resp.content))
+                    raise _ServerError(f"server error {resp.status_code}")
+                trace.attempt(attempt, started, "ok", resp.status_code, len(resp.content))
+                cb.on_success(probe)
+                try:
+                    data = resp.json()
+                except ValueError as e:
+                    # the venue accepted the request; resending would not tell us more
+                    EXCHANGE_REQUESTS.labels(op, "bad_response").inc()
+                    raise OutcomeUnknown(f"undecodable response for {op}: {e}") from e
                 EXCHANGE_REQUESTS.labels(op, "ok").inc()
                 return data
             except (httpx.ConnectError, httpx.ReadTimeout, httpx.HTTPError) as e:
+                if not isinstance(e, _ServerError):
+                    # 5xx attempts were already recorded with their status code
+                    trace.attempt(attempt, started, type(e).__name__)
                 last_exc = e
-                self._cb.on_failure()
-                if attempt < self._max_retries:
+                cb.on_failure(probe)
+                if cb.state != "closed":
+                    # tripped, probe failed, or someone else is probing: stop hammering the venue
+                    EXCHANGE_REQUESTS.labels(op, "failed").inc()
+                    break
+                if self._may_retry(op, idempotent, attempt):
                     EXCHANGE_REQUESTS.labels(op, "retry").inc()
-                    await self._sleep_backoff(attempt)
+                    trace.backoff += await self._sleep_backoff(attempt)
                     continue
                 EXCHANGE_REQUESTS.labels(op, "failed").inc()
         # exhausted
+        if isinstance(last_exc, _AMBIGUOUS_ERRORS):
+            raise OutcomeUnknown(f"exchange request outcome unknown for {op}: {last_exc}")
         raise RuntimeError(f"exchange request failed for {op}: {last_exc}")
 
     async def get_ticker(self, symbol: str) -> Dict[str, Any]:
         return await self._request("get_ticker", "GET", "/ticker", params={"symbol": symbol})
 
-    async def place_order(self, symbol: str, side: str, qty: float, price: Optional[float] = None, type_: str = "market") -> Dict[str, Any]:
+    async def place_order(
+        self,
+        symbol: str,
+        side: str,
+        qty: float,
+        price: Optional[float] = None,
+        type_: str = "market",
+        client_order_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        cid = client_order_id or new_client_order_id()
+        existing = self._recent_orders.get(cid)
+        if existing is not None:
+            # Same idempotency key seen recently: never send a second order
+            EXCHANGE_REQUESTS.labels("place_order", "deduplicated").inc()
+            return await asyncio.shield(existing)
         payload = {
             "symbol": symbol,
             "side": side,
             "qty": qty,
             "type": type_,
+            "clientOrderId": cid,
         }
         if price is not None:
             payload["price"] = price
-        return await self._request("place_order", "POST", "/orders", json=payload)
+        send = self._recent_orders.start(cid, self._send_order(cid, payload))
+        # shielded: a cancelled caller must not abort a send that others may have joined
+        return await asyncio.shield(send)
+
+    async def _send_order(self, cid: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self._request(
+            "place_order", "POST", "/orders",
+            json=payload, idempotency_key=cid, timeout=self._order_timeout,
+        )
+        if isinstance(result, dict):
+            result.setdefault("clientOrderId", cid)
+        return result
 
 
 _client_singleton: Optional[ExchangeClient] = None
@@ -147,5 +595,6 @@ def get_exchange_client() -> ExchangeClient:
             base_url=settings.EXCHANGE_BASE_URL,
             api_key=settings.EXCHANGE_API_KEY,
             api_secret=settings.EXCHANGE_API_SECRET,
+            venue=settings.EXCHANGE_VENUE,
         )
     return _client_singleton
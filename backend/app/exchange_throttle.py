@@ -0,0 +1,198 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .settings import settings
+
+# Prometheus metrics
+THROTTLE_WAIT = Histogram(
+    "exchange_throttle_wait_seconds",
+    "Time a request waited for rate-limit tokens before being sent",
+    ["venue", "operation"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+THROTTLE_STARVED = Counter(
+    "exchange_throttle_starved_total",
+    "Requests that found the token bucket empty and had to queue",
+    ["venue", "operation"],
+)
+THROTTLE_QUEUE_DEPTH = Gauge(
+    "exchange_throttle_queue_depth",
+    "Requests currently queued waiting for rate-limit tokens",
+    ["venue"],
+)
+THROTTLE_TOKENS = Gauge(
+    "exchange_throttle_tokens_available",
+    "Tokens currently available in the venue bucket",
+    ["venue"],
+)
+
+# Request weight per operation (venues typically charge order placement more than reads);
+# EXCHANGE_ENDPOINT_WEIGHTS overrides these per operation
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "get_ticker": 1.0,
+    "place_order": 1.0,
+}
+# Lower value is served first when the bucket is contended
+DEFAULT_PRIORITIES: Dict[str, int] = {
+    "place_order": 0,
+    "get_ticker": 10,
+}
+DEFAULT_PRIORITY = 5
+
+
+def parse_weights(spec: Optional[str]) -> Dict[str, float]:
+    """``"place_order=2,get_ticker=0.5"`` -> {operation: weight}; malformed entries are rejected."""
+    weights: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        op, sep, w = part.partition("=")
+        try:
+            value = float(w)
+        except ValueError:
+            value = -1.0
+        if not sep or not op.strip() or value <= 0:
+            raise ValueError(f"invalid endpoint weight {part!r} (expected operation=weight with weight > 0)")
+        weights[op.strip()] = value
+    return weights
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens/sec refill up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        # Monotonic timestamp until which the venue asked us to back off (429 Retry-After)
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill(time.monotonic())
+        return self._tokens
+
+    def try_take(self, weight: float) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= weight:
+            self._tokens -= weight
+            return True
+        return False
+
+    def time_until(self, weight: float) -> float:
+        """Seconds until ``weight`` tokens are available (0 when available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        pause = max(0.0, self._paused_until - now)
+        # A request heavier than the bucket can never fit; let it through on a full bucket
+        need = min(weight, self.capacity) - self._tokens
+        refill = need / self.rate if need > 0 and self.rate > 0 else 0.0
+        return max(pause, refill)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket and stop handing out tokens for ``seconds``."""
+        now = time.monotonic()
+        self._tokens = 0.0
+        self._updated = now
+        self._paused_until = max(self._paused_until, now + max(0.0, seconds))
+
+
+class RequestScheduler:
+    """Per-venue priority queue in front of a token bucket.
+
+    Requests that can be served immediately bypass the queue. Otherwise they are
+    queued by (priority, arrival order) and released by a single pump task as
+    tokens refill, so order placement overtakes queued ticker polls.
+    """
+
+    def __init__(self, venue: str, rate: float, capacity: float, weights: Optional[Dict[str, float]] = None):
+        self.venue = venue
+        self.bucket = TokenBucket(rate, capacity)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    async def acquire(self, op: str, weight: Optional[float] = None, priority: Optional[int] = None) -> float:
+        """Wait for tokens for one request of ``op``. Returns seconds waited."""
+        w = self.weights.get(op, 1.0) if weight is None else float(weight)
+        # A request heavier than the bucket can never fit; it is charged a full bucket
+        # on both the fast path and the queued path
+        w = min(w, self.bucket.capacity)
+        p = DEFAULT_PRIORITIES.get(op, DEFAULT_PRIORITY) if priority is None else int(priority)
+        start = time.monotonic()
+        if not self._queue and self.bucket.try_take(w):
+            THROTTLE_WAIT.labels(self.venue, op).observe(0.0)
+            THROTTLE_TOKENS.labels(self.venue).set(self.bucket.tokens)
+            return 0.0
+        THROTTLE_STARVED.labels(self.venue, op).inc()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (p, next(self._seq), w, fut))
+        THROTTLE_QUEUE_DEPTH.labels(self.venue).set(len(self._queue))
+        self._ensure_pump()
+        await fut
+        waited = time.monotonic() - start
+        THROTTLE_WAIT.labels(self.venue, op).observe(waited)
+        return waited
+
+    def penalize(self, retry_after: float) -> None:
+        """Back off the whole venue after a 429 (honours ``Retry-After``)."""
+        self.bucket.pause(retry_after)
+
+    def _ensure_pump(self) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+    async def _pump(self) -> None:
+        while self._queue:
+            _, _, weight, fut = self._queue[0]
+            if fut.done():
+                # caller was cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self.bucket.try_take(weight):
+                heapq.heappop(self._queue)
+                fut.set_result(None)
+                THROTTLE_QUEUE_DEPTH.labels(self.venue).set(len(self._queue))
+                THROTTLE_TOKENS.labels(self.venue).set(self.bucket.tokens)
+                continue
+            await asyncio.sleep(max(self.bucket.time_until(weight), 0.001))
+        THROTTLE_QUEUE_DEPTH.labels(self.venue).set(0)
+
+
+_schedulers: Dict[str, RequestScheduler] = {}
+
+
+def get_scheduler(venue: str) -> RequestScheduler:
+    """Return the shared scheduler for ``venue`` (one bucket per venue per process)."""
+    sched = _schedulers.get(venue)
+    if sched is None:
+        sched = RequestScheduler(
+            venue,
+            rate=settings.EXCHANGE_RATE_LIMIT_PER_SEC,
+            capacity=settings.EXCHANGE_RATE_LIMIT_BURST,
+            weights=parse_weights(settings.EXCHANGE_ENDPOINT_WEIGHTS),
+        )
+        _schedulers[venue] = sched
+    return sched
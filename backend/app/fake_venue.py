@@ -0,0 +1,170 @@
+"""Local stand-in for the exchange market-data stream.
+
+Speaks the protocol documented in ``app.market_stream`` so the client can be
+tested and benchmarked offline. Run standalone with::
+
+    python -m app.fake_venue --port 9001 --interval-ms 50 --symbols BTC-USD,ETH-USD
+
+and point the backend at it with ``EXCHANGE_STREAM_URL=ws://127.0.0.1:9001``.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+try:
+    import websockets  # type: ignore
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore
+
+
+class FakeVenueServer:
+    """Random-walk ticker feed with per-symbol sequence numbers.
+
+    ``skip_every`` > 0 drops every Nth update (the sequence still advances) to
+    exercise gap detection; ``disconnect_all()`` simulates a venue-side drop.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        interval_ms: float = 50.0,
+        symbols: Iterable[str] = ("BTC-USD", "ETH-USD"),
+        skip_every: int = 0,
+        batch: int = 1,
+    ):
+        self.host = host
+        self.port = port
+        self.interval = interval_ms / 1000.0
+        self.skip_every = skip_every
+        self.batch = max(1, batch)
+        self._prices: Dict[str, float] = {s: 100.0 + 10 * i for i, s in enumerate(symbols)}
+        self._seq: Dict[str, int] = {s: 0 for s in self._prices}
+        self._clients: Dict[Any, Set[str]] = {}
+        self._server: Any = None
+        self._ticker: Optional[asyncio.Task] = None
+        self.sent = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def _tick(self, sym: str, snapshot: bool = False) -> Dict[str, Any]:
+        if not snapshot:
+            self._seq[sym] += 1
+            self._prices[sym] *= 1 + random.uniform(-0.0005, 0.0005)
+        px = self._prices[sym]
+        msg = {
+            "type": "ticker",
+            "symbol": sym,
+            "seq": self._seq[sym],
+            "bid": round(px * 0.9999, 6),
+            "ask": round(px * 1.0001, 6),
+            "ts": int(time.time() * 1000),
+        }
+        if snapshot:
+            msg["snapshot"] = True
+        return msg
+
+    async def _handler(self, ws) -> None:
+        subs: Set[str] = set()
+        self._clients[ws] = subs
+        try:
+            async for raw in ws:
+                try:
+                    req = json.loads(raw)
+                except Exception:
+                    continue
+                op = req.get("op")
+                if op == "subscribe":
+                    syms = [s for s in req.get("symbols", []) if s in self._prices]
+                    subs.update(syms)
+                    await ws.send(json.dumps({"type": "subscribed", "symbols": syms}))
+                    for s in syms:
+                        await ws.send(json.dumps(self._tick(s, snapshot=True)))
+                elif op == "unsubscribe":
+                    syms = list(req.get("symbols", []))
+                    subs.difference_update(syms)
+                    await ws.send(json.dumps({"type": "unsubscribed", "symbols": syms}))
+                elif op == "snapshot" and req.get("symbol") in self._prices:
+                    await ws.send(json.dumps(self._tick(req["symbol"], snapshot=True)))
+        except Exception:
+            pass
+        finally:
+            self._clients.pop(ws, None)
+
+    async def _run_ticker(self) -> None:
+        while True:
+            if not self._clients:
+                await asyncio.sleep(self.interval)
+                continue
+            for _ in range(self.batch):
+                for sym in self._prices:
+                    msg = self._tick(sym)
+                    if self.skip_every and msg["seq"] % self.skip_every == 0:
+                        continue
+                    data = json.dumps(msg)
+                    for ws, subs in list(self._clients.items()):
+                        if sym in subs:
+                            with contextlib.suppress(Exception):
+                                await ws.send(data)
+                                self.sent += 1
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> "FakeVenueServer":
+        if websockets is None:  # pragma: no cover
+            raise RuntimeError("websockets package is required for the fake venue")
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = list(self._server.sockets)[0].getsockname()[1]
+        self._ticker = asyncio.get_running_loop().create_task(self._run_ticker())
+        return self
+
+    async def disconnect_all(self) -> None:
+        for ws in list(self._clients):
+            with contextlib.suppress(Exception):
+                await ws.close()
+
+    async def stop(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._ticker
+            self._ticker = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+async def _main(args: argparse.Namespace) -> None:
+    server = FakeVenueServer(
+        host=args.host,
+        port=args.port,
+        interval_ms=args.interval_ms,
+        symbols=[s.strip() for s in args.symbols.split(",") if s.strip()],
+        skip_every=args.skip_every,
+        batch=args.batch,
+    )
+    await server.start()
+    print(f"fake venue listening on {server.url}", flush=True)
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Fake exchange market-data stream")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9001)
+    p.add_argument("--interval-ms", type=float, default=50.0)
+    p.add_argument("--symbols", default="BTC-USD,ETH-USD")
+    p.add_argument("--skip-every", type=int, default=0)
+    p.add_argument("--batch", type=int, default=1, help="updates per symbol per interval")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_main(p.parse_args()))
@@ -1,17 +1,55 @@
+"""Runs the Hyperliquid bot: its Python main loop, or the Node live collector.
+
+The Node collector always writes its NDJSON files under ``HLIQ_NODE_NDJSON_DIR``.
+With ``HLIQ_NODE_QUOTE_CHANNEL`` set to ``stdout`` or ``fd`` it is also asked
+(``QUOTES_OUT`` in its environment) to write each quote as one JSON line to
+stdout, or to the pipe whose fd number is in ``QUOTES_FD``. Those lines are
+published into ``quotes.store`` as they arrive; the files stay the durable copy
+and the WS endpoint stops tailing them for quotes while this runs.
+
+The collector can run as several shards (``HLIQ_COLLECTOR_SHARDS``), each a
+process covering some venues or pairs, all publishing into the same store. The
+main loop and every shard run under ``collector_supervisor``, which restarts
+them with backoff after an exit or crash; ``health()`` reports per-shard state.
+"""
 import asyncio
+import json
 import os
+import signal
 import sys
 import logging
 import contextlib
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
 
 from .settings import settings
+from . import log_pipeline
+from . import quotes
+from .collector_supervisor import COLLECTOR_UP, Shard, Supervisor, parse_shards
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
 
 _logger = logging.getLogger("uvicorn.error")
+_collector_logger = log_pipeline.get_logger("app.collector")
+
+# Prometheus metrics
+COLLECTOR_LINES = Counter(
+    "collector_output_lines_total",
+    "Lines read from the Node collector (kind: quote | log | invalid)",
+    ["kind"],
+)
+
+QUOTE_CHANNELS = ("file", "stdout", "fd")
 
 _TASK: Optional[asyncio.Task] = None
 _RUNNING: bool = False
-_PROC: Optional[asyncio.subprocess.Process] = None  # Node collector process when enabled
+_PROCS: Dict[int, asyncio.subprocess.Process] = {}  # Node collector process per shard when enabled
+_INGESTING: Set[int] = set()  # shards whose quotes go straight into quotes.store (not only the NDJSON file)
+_SUPERVISOR: Optional[Supervisor] = None
 
 
 def _resolve_project_path() -> str:
@@ -29,20 +67,31 @@ def _ensure_import_path(project_path: str) -> None:
         sys.path.insert(0, project_path)
 
 
+async def _runner_main(shard: Shard) -> None:
+    # Import inside the task to ensure path is set
+    from main import main as hliq_main  # type: ignore
+    _logger.info("Hyperliquid live: starting main loop")
+    shard.state = "running"
+    COLLECTOR_UP.labels(shard.name).set(1)
+    await hliq_main()
+
+
 async def _runner():
-    global _RUNNING
+    global _RUNNING, _SUPERVISOR
     try:
         project_path = _resolve_project_path()
         _ensure_import_path(project_path)
-        # If configured, run Node collector instead of Python main
+        # If configured, run Node collector shards instead of Python main; either way a crash
+        # or exit is restarted with backoff until stop()
         if settings.HLIQ_NODE_COLLECTOR:
-            await _runner_node(project_path)
+            shards = parse_shards(settings.HLIQ_COLLECTOR_SHARDS, settings.HLIQ_COLLECTOR_CPUS)
+            _SUPERVISOR = Supervisor(shards, lambda shard: _runner_node(project_path, shard))
         else:
-            # Import inside the task to ensure path is set
-            from main import main as hliq_main  # type: ignore
-            _logger.info("Hyperliquid live: starting main loop")
-            _RUNNING = True
-            await hliq_main()
+            if settings.HLIQ_COLLECTOR_SHARDS:
+                _logger.warning("Hyperliquid live: HLIQ_COLLECTOR_SHARDS applies to the Node collector only; running one main loop")
+            _SUPERVISOR = Supervisor([Shard(0, 1)], _runner_main)
+        _RUNNING = True
+        await _SUPERVISOR.run()
     except asyncio.CancelledError:
         _logger.info("Hyperliquid live: cancellation requested; stopping")
         raise
@@ -53,42 +102,194 @@ async def _runner():
         _logger.info("Hyperliquid live: stopped")
 
 
-async def _runner_node(project_path: str):
-    """Spawn Node live collector (npm run -s live:collect) and await it."""
-    global _PROC, _RUNNING
+def parse_quote_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """The quote in one collector output line, or None for anything else."""
+    line = line.strip()
+    if not line.startswith(b"{"):
+        return None
+    try:
+        obj = orjson.loads(line) if orjson is not None else json.loads(line)
+    except ValueError:
+        COLLECTOR_LINES.labels("invalid").inc()
+        return None
+    if isinstance(obj, dict) and obj.get("type") == "quote":
+        return obj
+    return None
+
+
+async def _pump(
+    reader: asyncio.StreamReader,
+    *,
+    ingest: bool,
+    log_other: bool,
+    store: Optional[quotes.QuoteStore] = None,
+    shard: Optional[Shard] = None,
+) -> None:
+    """Read the collector's output until EOF; quotes are published once per read chunk.
+
+    Every shard publishes into the same store, so subscribers see one merged stream.
+    """
+    store = store or quotes.store
+    carry = b""
+    while True:
+        chunk = await reader.read(65536)
+        if not chunk:
+            break
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        batch: List[Dict[str, Any]] = []
+        for line in lines:
+            q = parse_quote_line(line) if ingest else None
+            if q is not None:
+                batch.append(q)
+            elif log_other and line.strip():
+                # high volume under quote traffic: off-loop writer, sampled per LOG_SAMPLE_RULES
+                _collector_logger.info("node| %s", line.decode(errors="ignore").rstrip())
+                COLLECTOR_LINES.labels("log").inc()
+        if batch:
+            store.publish_many(batch, source="collector")
+            COLLECTOR_LINES.labels("quote").inc(len(batch))
+            if shard is not None:
+                shard.quotes_seen(len(batch))
+    if carry.strip():
+        q = parse_quote_line(carry) if ingest else None
+        if q is not None:
+            store.publish(q, source="collector")
+            COLLECTOR_LINES.labels("quote").inc()
+            if shard is not None:
+                shard.quotes_seen(1)
+        elif log_other:
+            _collector_logger.info("node| %s", carry.decode(errors="ignore").rstrip())
+
+
+async def _open_pipe_reader(fd: int) -> Tuple[asyncio.BaseTransport, asyncio.StreamReader]:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 20)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", 0))
+    return transport, reader
+
+
+def quotes_in_process() -> bool:
+    """True while collector quotes are being published into ``quotes.store`` directly."""
+    return bool(_INGESTING)
+
+
+def health() -> List[Dict[str, Any]]:
+    """Per-shard state, restart counts and quote freshness (empty when not started)."""
+    return _SUPERVISOR.health() if _SUPERVISOR is not None else []
+
+
+def _pin_to(cpus: Set[int]):
+    # runs in the child before exec, so the shell and everything it starts inherit the mask
+    def pin() -> None:
+        os.sched_setaffinity(0, cpus)
+    return pin
+
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    # the collector runs in its own session: signal the shell and everything it started
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+    except OSError:
+        proc.send_signal(sig)
+
+
+async def _terminate(proc: asyncio.subprocess.Process, timeout: float = 2.0) -> None:
+    """SIGTERM the collector's process group, SIGKILL it after ``timeout``, and reap the shell.
+
+    ``communicate()`` reads stdout to EOF as well, so the subprocess transport has
+    closed on this loop by the time it returns.
+    """
+    if proc.returncode is None:
+        _signal_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _signal_group(proc, signal.SIGKILL)
+        await proc.communicate()
+
+
+async def _runner_node(project_path: str, shard: Optional[Shard] = None) -> Optional[int]:
+    """Spawn Node live collector (npm run -s live:collect) and await it; returns the exit code."""
+    shard = shard or Shard(0, 1)
     cmd = settings.HLIQ_NODE_COLLECTOR_CMD or "npm run -s live:collect"
     env = os.environ.copy()
     # Surface a few knobs if provided via settings; otherwise rely on Node defaults
     env.setdefault("DRY_RUN", "true")
+    env.update(shard.env())
+    preexec_fn = None
+    if shard.cpus:
+        if hasattr(os, "sched_setaffinity"):
+            preexec_fn = _pin_to(shard.cpus)
+        else:  # pragma: no cover - not Linux
+            _logger.warning("Hyperliquid live (node): CPU pinning is not supported on this platform")
+    channel = (settings.HLIQ_NODE_QUOTE_CHANNEL or "file").lower()
+    if channel not in QUOTE_CHANNELS:
+        _logger.warning("Hyperliquid live (node): unknown HLIQ_NODE_QUOTE_CHANNEL %r; using file", channel)
+        channel = "file"
+    read_fd: Optional[int] = None
+    pipe_transport: Optional[asyncio.BaseTransport] = None
+    pass_fds: tuple = ()
+    if channel == "fd":
+        # dedicated pipe: collector logs on stdout cannot interleave with quote lines
+        read_fd, write_fd = os.pipe()
+        pass_fds = (write_fd,)
+        env["QUOTES_OUT"] = "fd"
+        env["QUOTES_FD"] = str(write_fd)
+    elif channel == "stdout":
+        env["QUOTES_OUT"] = "stdout"
+    proc: Optional[asyncio.subprocess.Process] = None
     try:
-        _logger.info("Hyperliquid live (node): starting '%s' in %s", cmd, project_path)
-        _RUNNING = True
-        _PROC = await asyncio.create_subprocess_shell(
-            cmd,
-            cwd=project_path,
-            env=env,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.STDOUT,
+        _logger.info(
+            "Hyperliquid live (node): starting shard %s '%s' in %s (quotes via %s)", shard.name, cmd, project_path, channel
         )
-        assert _PROC is not None
-        # Stream output to server log
-        assert _PROC.stdout is not None
-        async for line in _PROC.stdout:
-            try:
-                _logger.info("node| %s", line.decode(errors="ignore").rstrip())
-            except Exception:
-                pass
-        rc = await _PROC.wait()
-        _logger.info("Hyperliquid live (node): exited rc=%s", rc)
+        try:
+            proc = await asyncio.create_subprocess_shell(
+                cmd,
+                cwd=project_path,
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                pass_fds=pass_fds,
+                preexec_fn=preexec_fn,
+                start_new_session=True,
+            )
+        finally:
+            for fd in pass_fds:
+                os.close(fd)  # the child holds the write end now
+        _PROCS[shard.index] = proc
+        shard.pid = proc.pid
+        shard.state = "running"
+        COLLECTOR_UP.labels(shard.name).set(1)
+        # Stream output to server log (and quotes into the quote store when they come this way)
+        assert proc.stdout is not None
+        pumps = [_pump(proc.stdout, ingest=channel == "stdout", log_other=True, shard=shard)]
+        if read_fd is not None:
+            fd, read_fd = read_fd, None
+            pipe_transport, quote_reader = await _open_pipe_reader(fd)
+            pumps.append(_pump(quote_reader, ingest=True, log_other=False, shard=shard))
+        if channel != "file":
+            _INGESTING.add(shard.index)
+        await asyncio.gather(*pumps)
+        rc = await proc.wait()
+        _logger.info("Hyperliquid live (node): shard %s exited rc=%s", shard.name, rc)
+        return rc
     except asyncio.CancelledError:
-        _logger.info("Hyperliquid live (node): cancellation requested; terminating process")
-        if _PROC and _PROC.returncode is None:
+        _logger.info("Hyperliquid live (node): cancellation requested; terminating shard %s", shard.name)
+        if proc is not None:
             with contextlib.suppress(Exception):
-                _PROC.terminate()
+                await _terminate(proc)
         raise
     finally:
-        _RUNNING = False
-        _PROC = None
+        if read_fd is not None:
+            os.close(read_fd)
+        if pipe_transport is not None:
+            pipe_transport.close()
+        _INGESTING.discard(shard.index)
+        if _PROCS.get(shard.index) is proc:
+            _PROCS.pop(shard.index, None)
 
 
 def is_running() -> bool:
@@ -108,18 +309,18 @@ def start() -> bool:
 
 async def stop(timeout: float = 5.0) -> None:
     global _TASK
-    global _PROC
     if _TASK is None:
         return
     if _TASK.done():
         _TASK = None
         return
-    # If Node process is running, request termination first
-    if _PROC and _PROC.returncode is None:
-        try:
-            _PROC.terminate()
-        except Exception:
-            pass
+    # If Node processes are running, request termination first
+    for proc in list(_PROCS.values()):
+        if proc.returncode is None:
+            try:
+                _signal_group(proc, signal.SIGTERM)
+            except Exception:
+                pass
     _TASK.cancel()
     try:
         await asyncio.wait_for(_TASK, timeout=timeout)
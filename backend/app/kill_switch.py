@@ -0,0 +1,477 @@
+"""Kill switch: a local flag in every process, pushed between processes.
+
+The order path reads ``is_engaged()``, a ``threading.Event`` check with no I/O.
+A toggle sets the local flag first and then broadcasts ``{"enabled", "version",
+"ts", "origin", "seq"}`` to every other process:
+
+``postgres`` ``NOTIFY kill_switch`` on the control pool; each process holds one
+             dedicated connection in ``LISTEN kill_switch`` (works across nodes)
+``socket``   one host: every process binds a Unix datagram socket in
+             ``KILL_SWITCH_SOCKET_DIR`` and the sender writes one datagram to
+             each peer; receipt is an event-loop reader callback
+
+``auto`` uses postgres when the DB is configured, else the socket directory.
+Toggles are ordered by ``version``, a counter the database increments in the
+persisted ``kill_switch`` row on every save (the database is the one clock all
+nodes agree on). Receivers apply a message only if its ``(version, ts)`` is not
+older than the last one applied, so the last committed toggle wins everywhere.
+Without a database the version stays 0 and the sender's ``ts`` decides, which
+is safe because the socket transport only spans one host.
+``kill_switch_propagation_seconds`` is observed from the sender's wall-clock
+timestamp, so cross-node figures include clock skew.
+
+A process that starts (or restarts) next to running peers must not come up
+disengaged while the others are engaged. ``start()`` therefore takes the state
+from a durable source: the shared-state backend when it is shared, else the
+``kill_switch`` row that ``publish()`` writes to the database. Without a
+database it asks its socket peers and waits up to
+``KILL_SWITCH_SYNC_TIMEOUT_MS`` for their answers. Until the state is known the
+switch stays engaged, so orders are refused rather than sent on a guess.
+
+With the postgres transport the persisted row is read only once ``LISTEN`` is
+in place, and again after every reconnect, so a toggle committed while the
+listener was not yet (or no longer) connected is never missed.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .settings import settings
+from . import db
+
+try:
+    import psycopg  # type: ignore
+except Exception:  # pragma: no cover
+    psycopg = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+# multiprocess: 1 if any live worker has it engaged
+KILL_SWITCH_GAUGE = Gauge("kill_switch_enabled", "1 when kill switch is enabled, else 0", multiprocess_mode="livemax")
+KILL_SWITCH_PROPAGATION = Histogram(
+    "kill_switch_propagation_seconds",
+    "Time from a kill-switch toggle in one process to its receipt in another",
+    ["transport"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+KILL_SWITCH_MESSAGES = Counter(
+    "kill_switch_messages_total",
+    "Kill-switch broadcasts sent and received",
+    ["transport", "direction"],
+)
+
+CHANNEL = "kill_switch"
+Listener = Callable[[bool], None]
+
+_engaged = threading.Event()
+_origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_seq = 0
+# (version, ts) of the newest toggle applied here
+_last: Tuple[int, float] = (0, 0.0)
+_initial = False
+_listeners: List[Listener] = []
+_transport: Optional[str] = None
+_sock: Optional[socket.socket] = None
+_sock_path: Optional[str] = None
+_listen_task: Optional[asyncio.Task] = None
+_listening: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+# False while a joining process has not learned the current state (it stays engaged)
+_known = True
+# answers to our sync request: (enabled, (version, ts), known)
+_sync_inbox: Optional["asyncio.Queue[Tuple[bool, Tuple[int, float], bool]]"] = None
+
+_LOAD_SQL = "SELECT value FROM shared_state WHERE ns = 'kill_switch' AND key = 'state'"
+# the version is assigned by the row update, so concurrent toggles get distinct, ordered versions
+_SAVE_SQL = (
+    "INSERT INTO shared_state (ns, key, value) "
+    "VALUES ('kill_switch', 'state', %s::jsonb || jsonb_build_object('version', 1)) "
+    "ON CONFLICT (ns, key) DO UPDATE SET "
+    "value = EXCLUDED.value || jsonb_build_object('version', COALESCE((shared_state.value->>'version')::bigint, 0) + 1), "
+    "updated_at = now() "
+    "RETURNING (value->>'version')::bigint"
+)
+
+
+def is_engaged() -> bool:
+    return _engaged.is_set()
+
+
+def is_known() -> bool:
+    """False while this process is still waiting to learn the cluster's state."""
+    return _known
+
+
+def apply(enabled: bool) -> bool:
+    """Set the local flag and gauge; returns True when the value changed."""
+    if enabled == _engaged.is_set():
+        return False
+    if enabled:
+        _engaged.set()
+    else:
+        _engaged.clear()
+    KILL_SWITCH_GAUGE.set(1 if enabled else 0)
+    return True
+
+
+def add_listener(fn: Listener) -> None:
+    """Call ``fn(enabled)`` (on the event loop) when a toggle arrives from another process."""
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Listener) -> None:
+    with contextlib.suppress(ValueError):
+        _listeners.remove(fn)
+
+
+def _message(enabled: bool, version: int, ts: float) -> str:
+    global _seq
+    _seq += 1
+    return json.dumps({"enabled": bool(enabled), "version": version, "ts": ts, "origin": _origin, "seq": _seq})
+
+
+def _adopt(enabled: bool, key: Tuple[int, float], notify: bool) -> None:
+    """Apply ``enabled`` unless a newer toggle has been applied already."""
+    global _last
+    if key < _last:
+        return
+    _last = key
+    if apply(enabled) and notify:
+        for fn in list(_listeners):
+            try:
+                fn(enabled)
+            except Exception as e:
+                _logger.warning("kill switch listener failed: %s", e)
+
+
+def _receive(raw: Any, transport: str) -> None:
+    global _known
+    received = time.time()
+    try:
+        msg = json.loads(raw)
+        if msg.get("origin") == _origin:
+            return
+        kind = msg.get("type")
+        if kind == "sync":
+            _answer_sync(str(msg["replyTo"]))
+            return
+        ts = float(msg["ts"])
+        version = int(msg.get("version") or 0)
+        enabled = bool(msg["enabled"])
+    except Exception:
+        _logger.warning("kill switch: ignoring malformed %s message", transport)
+        return
+    if kind == "state":
+        # a peer's answer to our sync request, not a toggle
+        if _sync_inbox is not None:
+            _sync_inbox.put_nowait((enabled, (version, ts), bool(msg.get("known"))))
+        return
+    KILL_SWITCH_MESSAGES.labels(transport, "received").inc()
+    KILL_SWITCH_PROPAGATION.labels(transport).observe(max(0.0, received - ts))
+    if (version, ts) < _last:
+        return
+    # a toggle is authoritative: a process still syncing now knows the state
+    _known = True
+    _adopt(enabled, (version, ts), notify=True)
+
+
+async def publish(enabled: bool) -> None:
+    """Persist a local toggle and broadcast it to the other processes (before ``start()``
+    there is no transport and only the database copy is written)."""
+    global _known, _last
+    _known = True
+    ts = time.time()
+    # until the database orders it, this toggle is the newest one here
+    _last = max(_last, (_last[0], ts))
+    version = await _save(enabled, ts, notify=_transport == "postgres")
+    if version is not None:
+        # re-assert: a toggle committed before ours may have arrived while we were saving
+        _adopt(enabled, (version, ts), notify=False)
+    if _transport is None:
+        return
+    if _transport == "postgres":
+        if version is None:
+            return  # not persisted, so not notified either (logged by _save)
+    else:
+        _send_datagrams(_message(enabled, _last[0] if version is None else version, ts).encode())
+    KILL_SWITCH_MESSAGES.labels(_transport, "sent").inc()
+
+
+# ----------------------------------------------------------------------
+# Durable state and join-time sync
+# ----------------------------------------------------------------------
+async def _save(enabled: bool, ts: float, notify: bool) -> Optional[int]:
+    """Persist a toggle so a process started later can read it; returns the version
+    the database assigned, or None without DB or on error. With ``notify`` the
+    NOTIFY goes out in the same transaction, so it is delivered on commit with
+    that version."""
+    if db.get_pool() is None:
+        return None
+    state = json.dumps({"enabled": bool(enabled), "ts": ts, "origin": _origin})
+    try:
+        async with db.connection("control") as conn:
+            async with conn.cursor() as cur:  # type: ignore
+                await cur.execute(_SAVE_SQL, (state,))
+                version = int((await cur.fetchone())[0])
+                if notify:
+                    await cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, _message(enabled, version, ts)))
+            await conn.commit()  # type: ignore
+    except Exception as e:
+        _logger.error("kill switch: failed to persist and publish state: %s", e)
+        return None
+    return version
+
+
+async def _load() -> Optional[Tuple[Optional[bool], int, float]]:
+    """(enabled, version, ts) of the last persisted toggle, (None, 0, 0) when there
+    has been none, or None when the database is unavailable."""
+    if db.get_pool() is None:
+        return None
+    try:
+        async with db.connection("control") as conn:
+            async with conn.cursor() as cur:  # type: ignore
+                await cur.execute(_LOAD_SQL)
+                row = await cur.fetchone()
+    except Exception as e:
+        _logger.warning("kill switch: cannot read persisted state: %s", e)
+        return None
+    if row is None:
+        return None, 0, 0.0
+    value = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+    return bool(value["enabled"]), int(value.get("version") or 0), float(value.get("ts") or 0.0)
+
+
+def _answer_sync(reply_to: str) -> None:
+    if _sock is None or not reply_to.startswith(settings.KILL_SWITCH_SOCKET_DIR):
+        return
+    answer = {
+        "type": "state",
+        "enabled": is_engaged(),
+        "version": _last[0],
+        "ts": _last[1],
+        "known": _known,
+        "origin": _origin,
+    }
+    with contextlib.suppress(OSError):
+        _sock.sendto(json.dumps(answer).encode(), reply_to)
+
+
+async def _ask_peers(initial: bool) -> bool:
+    """Ask socket peers for the state; returns True once it is known."""
+    global _sync_inbox
+    _sync_inbox = asyncio.Queue()
+    try:
+        asked = _send_datagrams(json.dumps({"type": "sync", "origin": _origin, "replyTo": _sock_path}).encode())
+        if not asked:
+            # first process on this host: nobody can have toggled it yet
+            apply(initial)
+            return True
+        answers: List[Tuple[bool, Tuple[int, float], bool]] = []
+        deadline = time.monotonic() + settings.KILL_SWITCH_SYNC_TIMEOUT_MS / 1000.0
+        while len(answers) < asked:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                answers.append(await asyncio.wait_for(_sync_inbox.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+    finally:
+        _sync_inbox = None
+    known = [a for a in answers if a[2]]
+    if known:
+        enabled, key, _ = max(known, key=lambda a: a[1])
+        _adopt(enabled, key, notify=False)
+        return True
+    if answers and len(answers) == asked:
+        # every peer is starting too (full restart): the configured value is all there is
+        apply(initial)
+        return True
+    return False
+
+
+async def _resync(notify: bool) -> bool:
+    """Take the persisted state (unless a newer toggle was applied meanwhile); False without DB."""
+    global _known
+    persisted = await _load()
+    if persisted is None:
+        return False
+    enabled, version, ts = persisted
+    if enabled is None:
+        # never toggled anywhere: the configured value stands
+        if not _known:
+            apply(_initial)
+    else:
+        _adopt(enabled, (version, ts), notify=notify)
+    _known = True
+    return True
+
+
+async def _sync(initial: bool) -> None:
+    global _known
+    if await _resync(notify=False):
+        return
+    if _transport == "socket":
+        _known = await _ask_peers(initial) or _known
+    elif _transport is None:
+        # no other process can have toggled it
+        apply(initial)
+        _known = True
+    if not _known:
+        _logger.error("kill switch: state unknown (nothing persisted, no peer answered); staying engaged until toggled")
+
+
+# ----------------------------------------------------------------------
+# Unix datagram socket transport (one host)
+# ----------------------------------------------------------------------
+def _send_datagrams(data: bytes) -> int:
+    """Send ``data`` to every peer socket; returns how many peers it reached."""
+    if _sock is None:
+        return 0
+    sent = 0
+    for path in glob.glob(os.path.join(settings.KILL_SWITCH_SOCKET_DIR, "ks-*.sock")):
+        if path == _sock_path:
+            continue
+        try:
+            _sock.sendto(data, path)
+            sent += 1
+        except (ConnectionRefusedError, FileNotFoundError):
+            # the process that bound it is gone
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+        except OSError as e:
+            _logger.warning("kill switch: send to %s failed: %s", path, e)
+    return sent
+
+
+def _on_readable() -> None:
+    assert _sock is not None
+    while True:
+        try:
+            data = _sock.recv(4096)
+        except BlockingIOError:
+            return
+        _receive(data, "socket")
+
+
+def _start_socket(loop: asyncio.AbstractEventLoop) -> None:
+    global _sock, _sock_path
+    os.makedirs(settings.KILL_SWITCH_SOCKET_DIR, mode=0o700, exist_ok=True)
+    path = os.path.join(settings.KILL_SWITCH_SOCKET_DIR, f"ks-{os.getpid()}.sock")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.bind(path)
+    _sock, _sock_path = sock, path
+    loop.add_reader(sock.fileno(), _on_readable)
+
+
+def _stop_socket() -> None:
+    global _sock, _sock_path
+    sock, path, _sock, _sock_path = _sock, _sock_path, None, None
+    if sock is not None:
+        if _loop is not None and not _loop.is_closed():
+            with contextlib.suppress(Exception):
+                _loop.remove_reader(sock.fileno())
+        sock.close()
+    if path:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+# ----------------------------------------------------------------------
+# Postgres LISTEN/NOTIFY transport
+# ----------------------------------------------------------------------
+async def _listen(listening: asyncio.Event) -> None:
+    delay = 0.5
+    while True:
+        try:
+            conn = await psycopg.AsyncConnection.connect(settings.DATABASE_URL, autocommit=True)  # type: ignore
+            async with conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                # anything committed before LISTEN (startup, or while reconnecting) comes from the row
+                if not await _resync(notify=True):
+                    raise RuntimeError("cannot read persisted state")
+                listening.set()
+                delay = 0.5
+                async for n in conn.notifies():
+                    _receive(n.payload, "postgres")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _logger.warning("kill switch: LISTEN connection lost (%s); retrying in %.1fs", e, delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 10.0)
+
+
+def _choose_transport() -> Optional[str]:
+    kind = (settings.KILL_SWITCH_TRANSPORT or "auto").lower()
+    if kind == "auto":
+        kind = "postgres" if db.get_pool() is not None and psycopg is not None else "socket"
+    if kind == "socket" and not settings.KILL_SWITCH_SOCKET_DIR:
+        return None
+    return None if kind == "none" else kind
+
+
+async def start(initial: bool = False, *, durable: bool = False) -> None:
+    """Start receiving toggles from other processes and settle the local flag.
+
+    ``initial`` is the configured or shared value. With ``durable`` (it came from
+    a shared-state backend every process reads) it is used as is. Otherwise the
+    switch stays engaged until the state is learned (see module docstring).
+    """
+    global _transport, _listen_task, _listening, _loop, _known, _initial
+    if _transport is not None:
+        apply(initial)
+        return
+    _initial = bool(initial)
+    if not durable:
+        _known = False
+        apply(True)
+    else:
+        apply(initial)
+    _loop = asyncio.get_running_loop()
+    kind = _choose_transport()
+    try:
+        if kind == "postgres":
+            _listening = asyncio.Event()
+            _listen_task = _loop.create_task(_listen(_listening))
+        elif kind == "socket":
+            _start_socket(_loop)
+    except Exception as e:
+        _logger.warning("kill switch: %s transport unavailable: %s", kind, e)
+        kind = None
+    _transport = kind
+    if kind:
+        _logger.info("kill switch: %s transport (%s)", kind, _origin)
+    if _listening is not None:
+        # the listener reads the persisted state right after LISTEN; give it the sync budget
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_listening.wait(), settings.KILL_SWITCH_SYNC_TIMEOUT_MS / 1000.0)
+    if not durable and not _known:
+        await _sync(initial)
+
+
+async def stop() -> None:
+    global _transport, _listen_task, _listening
+    task, _listen_task, _listening = _listen_task, None, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
+    _stop_socket()
+    _transport = None
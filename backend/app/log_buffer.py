@@ -0,0 +1,226 @@
+"""Fixed-capacity ring buffer for bot log entries.
+
+Entries get monotonically increasing sequence ids (``LogEntry.id`` is the
+sequence number as a string). Each level keeps a sorted list of its sequence
+ids, so a filtered page costs a bisect plus the page size no matter how sparse
+the level is; stale ids at the front of a level list are trimmed in bulk.
+
+Pages are keyset-paginated on the sequence id: ``before`` returns the newest
+``limit`` entries older than a cursor, ``after`` returns entries newer than it
+(used by the live tail to catch up after a reconnect). Live subscribers get each
+new entry through a bounded ``asyncio.Queue``.
+
+With ``BOT_LOG_SPILL_TO_DB`` set, entries evicted from the ring are written to
+``bot_logs`` through a write-behind batch writer and pages older than the ring
+are read from there (for the current process: sequence ids restart with it,
+so rows carry a per-process ``boot_id``).
+"""
+from __future__ import annotations
+import asyncio
+import bisect
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+from .schemas import LogEntry
+from .settings import settings
+from .batch_writer import BatchWriter
+from . import db
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+LOG_ENTRIES = Counter("bot_log_entries_total", "Entries appended to the bot log ring", ["level"])
+LOG_TAIL_DROPPED = Counter("bot_log_tail_dropped_total", "Entries not delivered to a slow live-tail subscriber")
+
+SpillRow = Tuple[Any, ...]
+
+
+class LogRing:
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = max(1, capacity)
+        self._buf: List[Optional[LogEntry]] = [None] * self.capacity
+        self._seq = 0  # last assigned sequence id
+        self._levels: Dict[str, List[int]] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.on_evict: Optional[Any] = None  # callable(LogEntry), e.g. the DB spill
+
+    def __len__(self) -> int:
+        return min(self._seq, self.capacity)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence id still held (last_seq + 1 when empty)."""
+        return max(1, self._seq - self.capacity + 1)
+
+    def add(
+        self,
+        level: str,
+        message: str,
+        *,
+        context: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
+    ) -> LogEntry:
+        self._seq += 1
+        seq = self._seq
+        entry = LogEntry(id=str(seq), level=level, message=message, timestamp=timestamp or datetime.utcnow().isoformat() + "Z", context=context)
+        slot = seq % self.capacity
+        evicted = self._buf[slot]
+        self._buf[slot] = entry
+        self._levels.setdefault(level, []).append(seq)
+        if evicted is not None:
+            self._trim(evicted.level)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+        LOG_ENTRIES.labels(level).inc()
+        for q in self._subscribers:
+            try:
+                q.put_nowait(entry)
+            except asyncio.QueueFull:
+                LOG_TAIL_DROPPED.inc()
+        return entry
+
+    def _trim(self, level: str) -> None:
+        ids = self._levels.get(level)
+        if not ids:
+            return
+        stale = bisect.bisect_left(ids, self.first_seq)
+        # amortized: drop the stale prefix in one slice once it is worth it
+        if stale > 1024 or stale * 2 > len(ids):
+            del ids[:stale]
+
+    def get(self, seq: int) -> Optional[LogEntry]:
+        if seq < self.first_seq or seq > self._seq:
+            return None
+        return self._buf[seq % self.capacity]
+
+    def page(
+        self,
+        limit: int = 100,
+        *,
+        level: Optional[str] = None,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Tuple[List[LogEntry], Optional[int]]:
+        """Entries in ascending order plus the cursor for the next (older) page.
+
+        ``after`` pages forward (entries with seq > after, oldest first); otherwise
+        the newest ``limit`` entries below ``before`` are returned and the cursor is
+        the smallest seq returned when older entries exist in the ring.
+        """
+        limit = max(1, limit)
+        lo = self.first_seq
+        hi = self._seq + 1 if before is None else min(before, self._seq + 1)
+        if level is None:
+            if after is not None:
+                start = max(lo, after + 1)
+                seqs = list(range(start, min(start + limit, self._seq + 1)))
+                return [self._buf[s % self.capacity] for s in seqs], None  # type: ignore[misc]
+            start = max(lo, hi - limit)
+            seqs = list(range(start, hi))
+            cursor = start if start > lo and seqs else None
+            return [self._buf[s % self.capacity] for s in seqs], cursor  # type: ignore[misc]
+        ids = self._levels.get(level, [])
+        first = bisect.bisect_left(ids, lo)
+        if after is not None:
+            i = bisect.bisect_right(ids, after, lo=first)
+            return [self._buf[s % self.capacity] for s in ids[i:i + limit]], None  # type: ignore[misc]
+        end = bisect.bisect_left(ids, hi, lo=first)
+        start = max(first, end - limit)
+        seqs = ids[start:end]
+        cursor = seqs[0] if seqs and start > first else None
+        return [self._buf[s % self.capacity] for s in seqs], cursor  # type: ignore[misc]
+
+    def subscribe(self, maxsize: int = 1000) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subscribers.discard(q)
+
+
+# ----------------------------------------------------------------------
+# Optional spill of evicted entries to Postgres
+# ----------------------------------------------------------------------
+BOOT_ID = uuid.uuid4().hex[:12]
+_SPILL_COLUMNS = ("boot_id", "seq", "level", "message", "context", "at")
+_spill_writer: Optional[BatchWriter[SpillRow]] = None
+
+
+async def _flush_spill(rows: List[SpillRow]) -> None:
+    async with db.connection("bulk") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            async with cur.copy(f"COPY bot_logs ({', '.join(_SPILL_COLUMNS)}) FROM STDIN") as copy:
+                for row in rows:
+                    await copy.write_row(row)
+
+
+def _spill(entry: LogEntry) -> None:
+    if _spill_writer is None:
+        return
+    at = datetime.fromisoformat(entry.timestamp.rstrip("Z")).replace(tzinfo=timezone.utc)
+    context = json.dumps(entry.context) if entry.context else None
+    _spill_writer.enqueue((BOOT_ID, int(entry.id), entry.level, entry.message, context, at))
+
+
+async def fetch_spilled(
+    limit: int, *, level: Optional[str] = None, before: int
+) -> Tuple[List[LogEntry], Optional[int]]:
+    """Entries older than ``before`` from ``bot_logs`` (this process's boot only)."""
+    where = ["boot_id = %s", "seq < %s"]
+    params: List[Any] = [BOOT_ID, before]
+    if level:
+        where.append("level = %s")
+        params.append(level)
+    sql = (
+        "SELECT seq, level, message, context, at FROM bot_logs "
+        f"WHERE {' AND '.join(where)} ORDER BY seq DESC LIMIT %s"
+    )
+    params.append(limit + 1)
+    async with db.connection("read") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [
+        LogEntry(
+            id=str(r[0]), level=r[1], message=r[2], context=r[3],
+            timestamp=r[4].astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z",
+        )
+        for r in reversed(rows)
+    ]
+    return items, (int(rows[-1][0]) if more and rows else None)
+
+
+def start_spill(ring: LogRing) -> None:
+    """Spill entries evicted from ``ring`` to ``bot_logs`` (no-op without DB or when disabled)."""
+    global _spill_writer
+    if not settings.BOT_LOG_SPILL_TO_DB or db.get_pool() is None:
+        return
+    if _spill_writer is None:
+        # evictions arrive at the append rate once the ring is full; one ring's worth is plenty of slack
+        _spill_writer = BatchWriter("bot_logs", _flush_spill, max_queue=ring.capacity, batch_size=500, flush_interval=1.0)
+    _spill_writer.start()
+    ring.on_evict = _spill
+
+
+async def stop_spill(ring: LogRing) -> None:
+    global _spill_writer
+    ring.on_evict = None
+    writer, _spill_writer = _spill_writer, None
+    if writer is not None:
+        await writer.stop()
+
+
+def spill_enabled() -> bool:
+    return _spill_writer is not None
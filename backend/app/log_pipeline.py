@@ -0,0 +1,209 @@
+"""Non-blocking log output for high-volume loggers.
+
+Loggers obtained from ``get_logger`` hand records to a bounded in-memory queue
+and return; a single writer thread drains it, formats records and writes them
+in batches (one ``write`` + ``flush`` per batch). Formatting, JSON encoding and
+stream I/O therefore never run on the event loop.
+
+Records whose ``msg`` is a dict are emitted as one JSON line (``orjson`` when
+installed, else ``json``); other records are plain ``%(message)s`` lines.
+
+``LOG_SAMPLE_RULES`` keeps 1 record in N per logger for INFO and below
+(``app.collector=10``); warnings and errors always pass. Records dropped by
+sampling or because the queue is full are counted in
+``log_records_dropped_total``.
+"""
+from __future__ import annotations
+import atexit
+import itertools
+import json
+import logging
+import queue
+import sys
+import threading
+from typing import Any, Dict, IO, List, Optional
+
+from prometheus_client import Counter
+
+from .settings import settings
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+# Prometheus metrics
+LOG_RECORDS_WRITTEN = Counter("log_records_written_total", "Log records written by the background writer", ["logger"])
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records not written (reason: sampled | queue_full | format_error)",
+    ["logger", "reason"],
+)
+LOG_WRITE_BATCHES = Counter("log_write_batches_total", "Batched writes to the log stream")
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str)
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            line = dumps(record.msg)
+        else:
+            line = record.getMessage()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def parse_sample_rules(spec: str) -> Dict[str, int]:
+    """``"app.collector=10,app.exchange.trace=2"`` -> {logger: keep 1 in N}."""
+    rules: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, sep, n = part.partition("=")
+        if sep and name.strip() and n.strip().isdigit() and int(n) > 1:
+            rules[name.strip()] = int(n)
+    return rules
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every Nth INFO/DEBUG record per logger; WARNING and above always pass."""
+
+    def __init__(self, rules: Dict[str, int]):
+        super().__init__()
+        self.rules = rules
+        self._counters: Dict[str, "itertools.count[int]"] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        n = self.rules.get(record.name)
+        if not n or record.levelno >= logging.WARNING:
+            return True
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters[record.name] = itertools.count()
+        if next(counter) % n == 0:
+            return True
+        LOG_RECORDS_DROPPED.labels(record.name, "sampled").inc()
+        return False
+
+
+class QueueingHandler(logging.Handler):
+    """Enqueue the record as-is; unlike ``logging.handlers.QueueHandler`` it does
+    not format in the caller's thread."""
+
+    def __init__(self, q: "queue.Queue[Optional[logging.LogRecord]]"):
+        super().__init__()
+        self.queue = q
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.name, "queue_full").inc()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # skip Handler.handle's lock: put_nowait is already thread-safe
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return bool(rv)
+
+
+class LogWriter:
+    """Background thread draining the queue in batches to one stream."""
+
+    def __init__(self, stream: Optional[IO[str]] = None, *, max_queue: int = 10_000, batch_size: int = 256):
+        self.stream = stream
+        self.batch_size = max(1, batch_size)
+        self.queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(maxsize=max(1, max_queue))
+        self.formatter = JsonLineFormatter()
+        self.handler = QueueingHandler(self.queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Write everything queued so far, then end the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self.queue.put(None)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            batch: List[logging.LogRecord] = []
+            stop = record is None
+            if record is not None:
+                batch.append(record)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                else:
+                    batch.append(record)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+                LOG_RECORDS_WRITTEN.labels(record.name).inc()
+            except Exception:
+                LOG_RECORDS_DROPPED.labels(record.name, "format_error").inc()
+        stream = self.stream or sys.stderr
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+            LOG_WRITE_BATCHES.inc()
+        except Exception:
+            pass
+
+
+_writer: Optional[LogWriter] = None
+_sampler = SamplingFilter({})
+
+
+def writer() -> LogWriter:
+    global _writer
+    if _writer is None:
+        _writer = LogWriter(max_queue=settings.LOG_QUEUE_MAX, batch_size=settings.LOG_BATCH_SIZE)
+        _writer.handler.addFilter(_sampler)
+        _sampler.rules = parse_sample_rules(settings.LOG_SAMPLE_RULES)
+        _writer.start()
+        atexit.register(_writer.stop)
+    return _writer
+
+
+def get_logger(name: str) -> logging.Logger:
+    """A non-propagating logger whose records go through the background writer."""
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = writer().handler
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+def flush() -> None:
+    """Block until everything queued so far is written (the writer keeps running)."""
+    if _writer is not None:
+        _writer.stop()
+        _writer.start()
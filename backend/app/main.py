@@ -1,15 +1,12 @@
-from fastapi import FastAPI, Depends, Request, Response
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 import logging
-import time
-import uuid
 import os
-import json
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 from .settings import settings
+from .middleware import RequestMetricsMiddleware, SecurityHeadersMiddleware
 from .routes import bot as bot_routes
 from .routes import strategies as strategies_routes
 from .routes import activity as activity_routes
@@ -19,82 +16,24 @@ from .routes import backtests as backtests_routes
 from .routes import live as live_routes
 from .routes import risk as risk_routes
 from .routes import orders as orders_routes
+from .routes import rollups as rollups_routes
+from .routes import audit as audit_routes
 from . import ws as ws_module
 from . import db
 from .auth import require_auth
+from . import auth
 from . import hyperliquid_live
-
-# Prometheus metrics
-REQUEST_COUNT = Counter(
-    "http_requests_total",
-    "Total HTTP requests",
-    ["method", "path", "status"],
-)
-REQUEST_LATENCY = Histogram(
-    "http_request_duration_seconds",
-    "HTTP request latency in seconds",
-    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
-    labelnames=["method", "path"],
-)
-
-# Dedicated request logger (avoid uvicorn's AccessFormatter expectations)
-REQUEST_LOGGER = logging.getLogger("app.request")
-REQUEST_LOGGER.propagate = False
-if not REQUEST_LOGGER.handlers:
-    _h = logging.StreamHandler()
-    _h.setFormatter(logging.Formatter("%(message)s"))
-    REQUEST_LOGGER.addHandler(_h)
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        if not settings.DEBUG:
-            response.headers.setdefault("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload")
-            response.headers.setdefault("X-Content-Type-Options", "nosniff")
-            response.headers.setdefault("X-Frame-Options", "DENY")
-            response.headers.setdefault("Referrer-Policy", "no-referrer")
-            response.headers.setdefault("Cross-Origin-Opener-Policy", "same-origin")
-            response.headers.setdefault("Cross-Origin-Resource-Policy", "same-origin")
-        return response
-
-
-class RequestMetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start = time.time()
-        req_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-        # attach request id
-        request.state.request_id = req_id
-        try:
-            response: Response = await call_next(request)
-        except Exception as e:
-            duration = time.time() - start
-            REQUEST_LATENCY.labels(request.method, request.url.path).observe(duration)
-            REQUEST_COUNT.labels(request.method, request.url.path, "500").inc()
-            logger = logging.getLogger("uvicorn.error")
-            logger.error("%s", {
-                "event": "request_error",
-                "request_id": req_id,
-                "method": request.method,
-                "path": request.url.path,
-                "duration_ms": int(duration * 1000),
-                "error": str(e),
-            })
-            raise
-        duration = time.time() - start
-        # metrics
-        REQUEST_LATENCY.labels(request.method, request.url.path).observe(duration)
-        REQUEST_COUNT.labels(request.method, request.url.path, str(response.status_code)).inc()
-        # response headers and access log
-        response.headers.setdefault("X-Request-Id", req_id)
-        REQUEST_LOGGER.info(json.dumps({
-            "event": "request",
-            "request_id": req_id,
-            "method": request.method,
-            "path": request.url.path,
-            "status": response.status_code,
-            "duration_ms": int(duration * 1000),
-        }))
-        return response
+from . import market_stream
+from . import order_store
+from . import pnl
+from . import rollups
+from . import partitions
+from . import shared_state
+from . import kill_switch
+from . import log_pipeline
+from . import log_buffer
+from . import quote_ingest
+from . import trade_stream
 
 app = FastAPI(title="Trading Dashboard API", version="0.1.0")
 
@@ -128,6 +67,8 @@ app.include_router(backtests_routes.router, dependencies=[Depends(require_auth)]
 app.include_router(live_routes.router, dependencies=[Depends(require_auth)])
 app.include_router(risk_routes.router, dependencies=[Depends(require_auth)])
 app.include_router(orders_routes.router, dependencies=[Depends(require_auth)])
+app.include_router(rollups_routes.router, dependencies=[Depends(require_auth)])
+app.include_router(audit_routes.router, dependencies=[Depends(require_auth)])
 app.include_router(ws_module.router)
 
 # ---------------------------------------------------------------------------
@@ -145,28 +86,25 @@ for _r in [
     live_routes,
     risk_routes,
     orders_routes,
+    rollups_routes,
+    audit_routes,
 ]:
     app.include_router(_r.router, prefix="/api/v1", dependencies=[Depends(require_auth)])
 
-# Startup: show parsed CORS origins; load auth tokens from file; validate config
+# Startup: show parsed CORS origins; load auth tokens; validate config
 @app.on_event("startup")
 async def _log_settings():
     logger = logging.getLogger("uvicorn.error")
     logger.info("Parsed CORS_ORIGINS: %s", settings.CORS_ORIGINS)
-    # Load tokens from file if provided
-    if settings.AUTH_TOKENS_FILE:
-        try:
-            if os.path.isfile(settings.AUTH_TOKENS_FILE):
-                with open(settings.AUTH_TOKENS_FILE, "r", encoding="utf-8") as f:
-                    toks = [ln.strip() for ln in f.readlines() if ln.strip()]
-                if toks:
-                    settings.AUTH_TOKENS = toks
-                    logger.info("Loaded %d auth tokens from file", len(toks))
-        except Exception as e:
-            logger.warning("Failed to load AUTH_TOKENS_FILE: %s", str(e))
+    # Auth: build the token index (AUTH_TOKENS_FILE is then watched for rotation) and fetch JWKS
+    try:
+        await auth.start()
+    except ValueError as e:
+        logger.error("Invalid JWT auth settings: %s; failing startup", e)
+        raise SystemExit(1)
     # Validate auth config in non-dev
-    if settings.REQUIRE_AUTH and settings.STAGE != "dev" and not settings.AUTH_TOKENS:
-        logger.error("REQUIRE_AUTH=1 but no AUTH_TOKENS configured; failing startup")
+    if settings.REQUIRE_AUTH and settings.STAGE != "dev" and not auth.has_credentials():
+        logger.error("REQUIRE_AUTH=1 but no AUTH_TOKENS or JWT verifier configured; failing startup")
         raise SystemExit(1)
     # Load exchange secrets from files if provided
     try:
@@ -183,7 +121,14 @@ async def _log_settings():
         if not settings.EXCHANGE_API_KEY or not settings.EXCHANGE_API_SECRET:
             logger.error("Missing EXCHANGE_API_KEY/SECRET in stage=%s; failing startup", settings.STAGE)
             raise SystemExit(1)
-    # Stage-based risk defaults (basic example)
+    # Shared control state (bot state, risk limits, strategies, rate limits) across workers
+    try:
+        shared_state.start()
+    except Exception as e:
+        logging.getLogger("uvicorn.error").warning("shared state backend unavailable, using per-process state: %s", e)
+        shared_state.start(shared_state.MemoryBackend())
+    # Stage-based risk defaults (basic example). Applied after binding so the clamps
+    # act on the shared values (binding reloads them and would undo earlier edits).
     if settings.STAGE == "staging":
         # more conservative defaults
         from .routes.risk import RISK_LIMITS
@@ -199,6 +144,25 @@ async def _log_settings():
     except Exception as e:
         logger = logging.getLogger("uvicorn.error")
         logger.warning("DB pool init error: %s", e)
+    # Kill switch: local flag, pushed between processes (LISTEN/NOTIFY or local sockets)
+    # (a worker joining with per-process state learns it from the DB or its peers first)
+    await kill_switch.start(bool(bot_routes.STATE.get("killSwitch")), durable=shared_state.get_backend().shared)
+    # Keep monthly partitions ahead of the writers and retire expired ones
+    partitions.start()
+    # Bot log ring: spill evicted entries to bot_logs (if enabled)
+    log_buffer.start_spill(bot_routes.LOGS)
+    # Order persistence: start the write-behind writer and restore open orders
+    await order_store.start()
+    # PnL: rebuild books from executions, then follow fills and quotes
+    await pnl.start()
+    # Fills fan out to /api/activity/trades/stream subscribers
+    trade_stream.start()
+    # Incremental minute/hour/day rollups for charts
+    rollups.start()
+    # Streaming market data into the in-process quote store (if configured)
+    market_stream.start()
+    # Batched quote ingestion over a local Unix socket (if configured)
+    await quote_ingest.start()
 
 @app.on_event("shutdown")
 async def _shutdown():
@@ -208,7 +172,23 @@ async def _shutdown():
             await hyperliquid_live.stop()
         except Exception:
             pass
+        await market_stream.stop()
+        await quote_ingest.stop()
+        await kill_switch.stop()
+        await auth.stop()
+        await pnl.stop()
+        trade_stream.stop()
+        await rollups.stop()
+        await partitions.stop()
+        # Drain pending order and log writes before the pool goes away
+        await order_store.stop()
+        await log_buffer.stop_spill(bot_routes.LOGS)
         await db.close_pool()
+        shared_state.stop()
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            # drop this worker's live-gauge files so they stop counting toward live* aggregates
+            multiprocess.mark_process_dead(os.getpid())
+        log_pipeline.flush()
     except Exception:
         pass
 
@@ -217,8 +197,15 @@ async def _shutdown():
 async def health():
     return {"ok": True}
 
-# Prometheus metrics endpoint
+# Prometheus metrics endpoint. With several workers, set PROMETHEUS_MULTIPROC_DIR (a real
+# environment variable, read by prometheus_client at import) so each scrape aggregates all
+# workers' metric files instead of reporting whichever worker answered.
 @app.get("/metrics")
 async def metrics():
-    data = generate_latest()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,259 @@
+"""Streaming market-data client for the exchange.
+
+Replaces REST polling of ``GET /ticker`` with one persistent WebSocket. The wire
+protocol is small and JSON based (the fake venue in ``app.fake_venue`` speaks it):
+
+client -> venue
+    ``{"op": "subscribe", "symbols": [...]}``
+    ``{"op": "unsubscribe", "symbols": [...]}``
+    ``{"op": "snapshot", "symbol": "..."}``  (resync one symbol after a gap)
+
+venue -> client
+    ``{"type": "ticker", "symbol", "seq", "bid", "ask", "ts", "snapshot"?}``
+    ``{"type": "subscribed" | "unsubscribed", "symbols": [...]}``
+
+``seq`` increases by one per symbol. A jump means we missed updates; we count it
+and ask for a snapshot, which resets the expected sequence. A message that does
+not parse, or a ticker with a non-numeric price or ``ts``, is counted and
+skipped; its ``seq`` is not recorded, so the next update for that symbol resyncs.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .settings import settings
+from . import quotes
+
+try:
+    import websockets  # type: ignore
+except Exception:  # pragma: no cover
+    websockets = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+STREAM_MESSAGES = Counter(
+    "exchange_stream_messages_total",
+    "Market-data messages received from the exchange stream",
+    ["venue", "type"],
+)
+STREAM_GAPS = Counter(
+    "exchange_stream_sequence_gaps_total",
+    "Sequence gaps detected on the exchange stream",
+    ["venue"],
+)
+STREAM_MALFORMED = Counter(
+    "exchange_stream_malformed_total",
+    "Exchange stream messages skipped because they did not parse or had non-numeric fields",
+    ["venue"],
+)
+STREAM_RECONNECTS = Counter(
+    "exchange_stream_reconnects_total",
+    "Reconnect attempts to the exchange stream",
+    ["venue"],
+)
+STREAM_CONNECTED = Gauge(
+    "exchange_stream_connected",
+    "1 while the exchange stream is connected",
+    ["venue"],
+)
+STREAM_LAG = Histogram(
+    "exchange_stream_lag_seconds",
+    "Venue timestamp to local receive time for streamed tickers",
+    ["venue"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2),
+)
+
+
+class MarketDataStream:
+    def __init__(
+        self,
+        url: str,
+        venue: str = "default",
+        symbols: Iterable[str] = (),
+        store: Optional[quotes.QuoteStore] = None,
+        backoff_base_ms: Optional[int] = None,
+        backoff_max_ms: Optional[int] = None,
+    ):
+        self.url = url
+        self.venue = venue
+        self.store = store or quotes.store
+        self.backoff_base = (backoff_base_ms if backoff_base_ms is not None else settings.WS_BACKOFF_BASE_MS) / 1000.0
+        self.backoff_max = (backoff_max_ms if backoff_max_ms is not None else settings.WS_BACKOFF_MAX_MS) / 1000.0
+        self._symbols: Set[str] = set(symbols)
+        self._last_seq: Dict[str, int] = {}
+        self._ws: Any = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self.gaps = 0
+        self.reconnects = 0
+        self.malformed = 0
+
+    @property
+    def symbols(self) -> Set[str]:
+        return set(self._symbols)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> None:
+        await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+
+    async def _send(self, msg: Dict[str, Any]) -> None:
+        ws = self._ws
+        if ws is not None:
+            with contextlib.suppress(Exception):
+                await ws.send(json.dumps(msg))
+
+    async def subscribe(self, symbols: Iterable[str]) -> None:
+        new = [s for s in symbols if s not in self._symbols]
+        if not new:
+            return
+        self._symbols.update(new)
+        await self._send({"op": "subscribe", "symbols": new})
+
+    async def unsubscribe(self, symbols: Iterable[str]) -> None:
+        gone = [s for s in symbols if s in self._symbols]
+        if not gone:
+            return
+        self._symbols.difference_update(gone)
+        for s in gone:
+            self._last_seq.pop(s, None)
+        await self._send({"op": "unsubscribe", "symbols": gone})
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # full jitter, same knobs as the frontend WS client
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _skip_malformed(self) -> None:
+        self.malformed += 1
+        STREAM_MALFORMED.labels(self.venue).inc()
+
+    async def _handle_ticker(self, msg: Dict[str, Any]) -> None:
+        sym = msg.get("symbol")
+        if sym not in self._symbols:
+            return
+        try:
+            bid = float(msg.get("bid") or 0)
+            ask = float(msg.get("ask") or 0)
+            ts = msg.get("ts") or int(time.time() * 1000)
+            lag = time.time() - float(ts) / 1000.0
+        except (TypeError, ValueError):
+            # one bad field must not tear down the session for every symbol
+            self._skip_malformed()
+            return
+        seq = msg.get("seq")
+        if isinstance(seq, int):
+            prev = self._last_seq.get(sym)
+            if prev is not None and not msg.get("snapshot"):
+                if seq <= prev:
+                    return  # duplicate / replay
+                if seq != prev + 1:
+                    self.gaps += 1
+                    STREAM_GAPS.labels(self.venue).inc()
+                    _logger.info("market stream %s: gap on %s (%s -> %s); resyncing", self.venue, sym, prev, seq)
+                    await self._send({"op": "snapshot", "symbol": sym})
+            self._last_seq[sym] = seq
+        STREAM_LAG.labels(self.venue).observe(max(0.0, lag))
+        self.store.publish({
+            "type": "quote",
+            "venue": self.venue,
+            "pair": sym,
+            "bid": bid,
+            "ask": ask,
+            "mid": (bid + ask) / 2 if bid and ask else (bid or ask),
+            "ts": ts,
+            "seq": seq,
+        }, source="exchange_stream")
+
+    async def _session(self) -> None:
+        async with websockets.connect(self.url) as ws:  # type: ignore[union-attr]
+            self._ws = ws
+            # sequence state is per connection; the venue restarts or resumes on resubscribe
+            self._last_seq.clear()
+            if self._symbols:
+                await ws.send(json.dumps({"op": "subscribe", "symbols": sorted(self._symbols)}))
+            self._connected.set()
+            STREAM_CONNECTED.labels(self.venue).set(1)
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    self._skip_malformed()
+                    continue
+                typ = msg.get("type") if isinstance(msg, dict) else None
+                STREAM_MESSAGES.labels(self.venue, str(typ)).inc()
+                if typ == "ticker":
+                    await self._handle_ticker(msg)
+
+    async def run(self) -> None:
+        if websockets is None:
+            _logger.warning("websockets not available; market stream disabled")
+            return
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._session()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.info("market stream %s: disconnected: %s", self.venue, e)
+            finally:
+                self._ws = None
+                self._connected.clear()
+                STREAM_CONNECTED.labels(self.venue).set(0)
+            # a session that stayed up for a while resets the backoff
+            attempt = 0 if time.monotonic() - started > self.backoff_max else attempt + 1
+            self.reconnects += 1
+            STREAM_RECONNECTS.labels(self.venue).inc()
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    def start(self) -> bool:
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return True
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
+
+
+_stream: Optional[MarketDataStream] = None
+
+
+def get_stream() -> Optional[MarketDataStream]:
+    return _stream
+
+
+def start() -> Optional[MarketDataStream]:
+    """Start the configured stream (no-op when ``EXCHANGE_STREAM_URL`` is unset)."""
+    global _stream
+    if not settings.EXCHANGE_STREAM_URL:
+        return None
+    if _stream is None:
+        symbols = [s.strip() for s in (settings.EXCHANGE_STREAM_SYMBOLS or "").split(",") if s.strip()]
+        _stream = MarketDataStream(settings.EXCHANGE_STREAM_URL, venue=settings.EXCHANGE_VENUE, symbols=symbols)
+    _stream.start()
+    return _stream
+
+
+async def stop() -> None:
+    global _stream
+    if _stream is not None:
+        await _stream.stop()
+        _stream = None
@@ -0,0 +1,184 @@
+"""Pure ASGI middleware for request metrics, request ids and security headers.
+
+Both wrap only the ``send`` callable: headers are added to the
+``http.response.start`` message and nothing is buffered, so streaming responses
+(SSE, exports) pass through untouched and no extra task is spawned per request
+as with ``BaseHTTPMiddleware``.
+
+Metrics are labelled with the matched route template (``/api/backtests/{pair}``),
+never the raw path; anything the router did not match is ``UNMATCHED_PATH``, so
+the number of series is bounded by the route table.
+"""
+from __future__ import annotations
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+from prometheus_client import Counter, Histogram
+from starlette.routing import Match
+
+from .settings import settings
+from . import log_pipeline
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+ASGIApp = Callable[..., Any]
+
+# Prometheus metrics
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Total HTTP requests (path is the route template)",
+    ["method", "path", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds (until response headers are sent)",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+    labelnames=["method", "path"],
+)
+
+# Dedicated request logger (avoid uvicorn's AccessFormatter expectations); dict messages are
+# JSON-encoded and written by the log pipeline's background thread
+REQUEST_LOGGER = log_pipeline.get_logger("app.request")
+
+UNMATCHED_PATH = "<unmatched>"
+
+SECURITY_HEADERS: Tuple[Tuple[str, str], ...] = (
+    ("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload"),
+    ("X-Content-Type-Options", "nosniff"),
+    ("X-Frame-Options", "DENY"),
+    ("Referrer-Policy", "no-referrer"),
+    ("Cross-Origin-Opener-Policy", "same-origin"),
+    ("Cross-Origin-Resource-Policy", "same-origin"),
+)
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._headers: List[Tuple[bytes, bytes]] = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in SECURITY_HEADERS
+        ]
+
+    async def __call__(self, scope: Scope, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or settings.DEBUG:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                raw = list(message.get("headers") or [])
+                present = {k.lower() for k, _ in raw}
+                raw.extend(h for h in self._headers if h[0] not in present)
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def _request_id(scope: Scope) -> str:
+    for k, v in scope.get("headers") or ():
+        if k == b"x-request-id":
+            return v.decode("latin-1")
+    return str(uuid.uuid4())
+
+
+_route_index: Dict[int, Tuple[int, Dict[Any, List[Any]]]] = {}
+
+
+def _routes_by_endpoint(router: Any) -> Dict[Any, List[Any]]:
+    # rebuilt only when the route table changes (routes are added at import time)
+    cached = _route_index.get(id(router))
+    if cached is None or cached[0] != len(router.routes):
+        index: Dict[Any, List[Any]] = {}
+        for route in router.routes:
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is not None:
+                index.setdefault(endpoint, []).append(route)
+        cached = _route_index[id(router)] = (len(router.routes), index)
+    return cached[1]
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that handled ``scope`` (after routing), else ``UNMATCHED_PATH``.
+
+    The router leaves the matched endpoint in the scope; only the routes sharing
+    that endpoint (e.g. the /api and legacy /api/v1 copies) are re-matched.
+    """
+    endpoint = scope.get("endpoint")
+    router = getattr(scope.get("app"), "router", None)
+    if endpoint is None or router is None:
+        return UNMATCHED_PATH
+    partial = None
+    for route in _routes_by_endpoint(router).get(endpoint, ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # method not allowed
+    return partial or UNMATCHED_PATH
+
+
+class RequestMetricsMiddleware:
+    """Latency/count metrics, ``X-Request-Id`` and a JSON access log line per request.
+
+    Latency is measured with ``perf_counter`` up to ``http.response.start`` so a
+    long-lived stream counts its time to first byte, not its lifetime.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        req_id = _request_id(scope)
+        # request.state.request_id
+        scope.setdefault("state", {})["request_id"] = req_id
+        method = scope["method"]
+        started = False
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start" and not started:
+                started = True
+                duration = time.perf_counter() - start
+                status_code = message["status"]
+                raw = list(message.get("headers") or [])
+                if not any(k.lower() == b"x-request-id" for k, _ in raw):
+                    raw.append((b"x-request-id", req_id.encode("latin-1")))
+                message["headers"] = raw
+                route = route_template(scope)
+                REQUEST_LATENCY.labels(method, route).observe(duration)
+                REQUEST_COUNT.labels(method, route, str(status_code)).inc()
+                REQUEST_LOGGER.info({
+                    "event": "request",
+                    "request_id": req_id,
+                    "method": method,
+                    "path": scope["path"],
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": int(duration * 1000),
+                })
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception as e:
+            if not started:
+                duration = time.perf_counter() - start
+                route = route_template(scope)
+                REQUEST_LATENCY.labels(method, route).observe(duration)
+                REQUEST_COUNT.labels(method, route, "500").inc()
+                logging.getLogger("uvicorn.error").error("%s", {
+                    "event": "request_error",
+                    "request_id": req_id,
+                    "method": method,
+                    "path": scope["path"],
+                    "duration_ms": int(duration * 1000),
+                    "error": str(e),
+                })
+            raise
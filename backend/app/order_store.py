@@ -0,0 +1,334 @@
+from __future__ import annotations
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .settings import settings
+from . import db
+from .batch_writer import BatchWriter
+
+_logger = logging.getLogger("uvicorn.error")
+
+# "unknown": the send's outcome was lost (e.g. read timeouts), so the order may be live
+# on the venue; it stays open until an ack, a fill or a reconcile settles it
+OPEN_STATUSES = ("new", "partially_filled", "unknown")
+TERMINAL_STATUSES = ("filled", "canceled", "rejected", "expired")
+_STATUS_ALIASES = {
+    "open": "new",
+    "accepted": "new",
+    "pending": "new",
+    "partial": "partially_filled",
+    "partially-filled": "partially_filled",
+    "cancelled": "canceled",
+}
+
+# Orders by client_order_id. Open orders stay; terminal ones are trimmed oldest-first.
+ORDERS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_MAX_TERMINAL = 5_000
+
+# Write-behind ops: ("order", client_order_id, row) | ("execution", client_order_id, row)
+Op = Tuple[str, str, Dict[str, Any]]
+_writer: Optional[BatchWriter[Op]] = None
+
+# Called with (order, execution row) for every recorded fill, e.g. PnL accounting
+FillListener = Callable[[Dict[str, Any], Dict[str, Any]], None]
+_fill_listeners: List[FillListener] = []
+
+_UPSERT_ORDER_SQL = (
+    "INSERT INTO orders (client_order_id, symbol, side, quantity, price, notional_usd, strategy, status, "
+    "exchange_order_id, error, created_at) "
+    "VALUES (%(client_order_id)s, %(symbol)s, %(side)s, %(quantity)s, %(price)s, %(notional_usd)s, %(strategy)s, "
+    "%(status)s, %(exchange_order_id)s, %(error)s, %(created_at)s) "
+    "ON CONFLICT (client_order_id) DO UPDATE SET "
+    "status = EXCLUDED.status, "
+    "exchange_order_id = COALESCE(EXCLUDED.exchange_order_id, orders.exchange_order_id), "
+    "error = COALESCE(EXCLUDED.error, orders.error)"
+)
+# symbol/side/strategy are copied from the order so trade history pages never join.
+# An execution id is claimed in execution_ids (unique per order) first; a fill whose
+# id is already claimed is a redelivery and inserts nothing.
+_INSERT_EXECUTION_SQL = (
+    "WITH o AS (SELECT id, symbol, side, strategy FROM orders WHERE client_order_id = %(client_order_id)s), "
+    "claimed AS (INSERT INTO execution_ids (order_id, execution_id) "
+    "SELECT o.id, %(execution_id)s::text FROM o WHERE %(execution_id)s::text IS NOT NULL "
+    "ON CONFLICT DO NOTHING RETURNING order_id) "
+    "INSERT INTO executions (order_id, symbol, side, strategy, execution_id, trade_id, price, quantity, "
+    "fee_currency, fee_amount, liquidity, executed_at) "
+    "SELECT o.id, o.symbol, o.side, o.strategy, %(execution_id)s, %(trade_id)s, %(price)s, %(quantity)s, "
+    "%(fee_currency)s, %(fee_amount)s, %(liquidity)s, %(executed_at)s "
+    "FROM o WHERE %(execution_id)s::text IS NULL OR EXISTS (SELECT 1 FROM claimed)"
+)
+
+
+def normalize_status(raw: Any, default: str = "new") -> str:
+    s = str(raw or "").strip().lower()
+    s = _STATUS_ALIASES.get(s, s)
+    return s if s in OPEN_STATUSES or s in TERMINAL_STATUSES else default
+
+
+def coalesce(ops: List[Op]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Collapse a batch into one order row per client_order_id (last write wins)
+    plus every execution, in arrival order."""
+    orders: Dict[str, Dict[str, Any]] = {}
+    executions: List[Dict[str, Any]] = []
+    for kind, cid, row in ops:
+        if kind == "order":
+            orders[cid] = row
+        else:
+            executions.append(row)
+    return list(orders.values()), executions
+
+
+async def _flush(ops: List[Op]) -> None:
+    order_rows, exec_rows = coalesce(ops)
+    async with db.connection("bulk") as conn:
+        async with conn.transaction():  # type: ignore
+            async with conn.cursor() as cur:  # type: ignore
+                # Orders first so executions in the same batch can resolve order_id
+                if order_rows:
+                    await cur.executemany(_UPSERT_ORDER_SQL, order_rows)
+                if exec_rows:
+                    await cur.executemany(_INSERT_EXECUTION_SQL, exec_rows)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _trim() -> None:
+    terminal = [cid for cid, o in ORDERS.items() if o["status"] in TERMINAL_STATUSES]
+    for cid in terminal[: max(0, len(terminal) - _MAX_TERMINAL)]:
+        ORDERS.pop(cid, None)
+
+
+def add_fill_listener(fn: FillListener) -> None:
+    if fn not in _fill_listeners:
+        _fill_listeners.append(fn)
+
+
+def remove_fill_listener(fn: FillListener) -> None:
+    if fn in _fill_listeners:
+        _fill_listeners.remove(fn)
+
+
+def _persist(kind: str, cid: str, row: Dict[str, Any]) -> None:
+    if _writer is not None:
+        _writer.enqueue((kind, cid, dict(row)))
+
+
+def record_new(
+    client_order_id: str,
+    *,
+    symbol: str,
+    side: str,
+    quantity: float,
+    price: Optional[float] = None,
+    notional_usd: Optional[float] = None,
+    strategy: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Register an order before it is sent. In-memory only on the hot path.
+
+    A caller retrying with the same client_order_id keeps the existing record
+    (the exchange dedupes the send); only a rejected attempt is reset.
+    """
+    existing = ORDERS.get(client_order_id)
+    if existing is not None and existing["status"] != "rejected":
+        return existing
+    order = {
+        "client_order_id": client_order_id,
+        "symbol": symbol,
+        "side": side,
+        "quantity": quantity,
+        "price": price,
+        "notional_usd": notional_usd,
+        "strategy": strategy,
+        "status": "new",
+        "exchange_order_id": None,
+        "error": None,
+        "created_at": _now(),
+        "filled_qty": 0.0,
+        "execution_ids": set(),
+        "acked": False,
+    }
+    ORDERS[client_order_id] = order
+    _persist("order", client_order_id, _order_row(order))
+    return order
+
+
+def _order_row(order: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: order.get(k) for k in (
+        "client_order_id", "symbol", "side", "quantity", "price", "notional_usd", "strategy",
+        "status", "exchange_order_id", "error", "created_at",
+    )}
+
+
+def update_status(
+    client_order_id: str,
+    status: str,
+    *,
+    exchange_order_id: Optional[str] = None,
+    error: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    order = ORDERS.get(client_order_id)
+    if order is None:
+        return None
+    order["status"] = normalize_status(status, default=order["status"])
+    if exchange_order_id:
+        order["exchange_order_id"] = str(exchange_order_id)
+    if error:
+        order["error"] = error
+    _persist("order", client_order_id, _order_row(order))
+    if order["status"] in TERMINAL_STATUSES:
+        _trim()
+    return order
+
+
+def record_fill(client_order_id: str, fill: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Record one execution for a known order and advance its fill status.
+
+    Idempotent on the venue's execution id: a fill seen before (in an ack and again
+    on the stream, or in a replayed ack) returns None and changes nothing.
+    """
+    order = ORDERS.get(client_order_id)
+    if order is None:
+        return None
+    qty = float(fill.get("qty", fill.get("quantity", 0)) or 0)
+    price = float(fill.get("price", 0) or 0)
+    if qty <= 0 or price <= 0:
+        return None
+    execution_id = fill.get("executionId") or fill.get("id")
+    if execution_id is not None:
+        execution_id = str(execution_id)
+        seen = order.setdefault("execution_ids", set())
+        if execution_id in seen:
+            return None
+        seen.add(execution_id)
+    row = {
+        "client_order_id": client_order_id,
+        "execution_id": execution_id,
+        "trade_id": fill.get("tradeId"),
+        "price": price,
+        "quantity": qty,
+        "fee_currency": fill.get("feeCurrency"),
+        "fee_amount": fill.get("fee"),
+        "liquidity": fill.get("liquidity") if fill.get("liquidity") in ("maker", "taker") else None,
+        "executed_at": _parse_ts(fill.get("timestamp")) or _now(),
+    }
+    order["filled_qty"] = float(order.get("filled_qty") or 0) + qty
+    _persist("execution", client_order_id, row)
+    for fn in list(_fill_listeners):
+        try:
+            fn(order, row)
+        except Exception as e:
+            _logger.warning("order store: fill listener failed: %s", e)
+    filled = order["filled_qty"] >= float(order["quantity"]) - 1e-12
+    update_status(client_order_id, "filled" if filled else "partially_filled")
+    return row
+
+
+def record_ack(client_order_id: str, result: Dict[str, Any]) -> None:
+    """Apply an exchange acknowledgement: status, exchange id and any inline fills.
+
+    Applied once per order: a retried or deduplicated ``place_order`` gets the same
+    ack back, and an order that already reached a terminal status (e.g. via the
+    fill stream) is left alone.
+    """
+    if not isinstance(result, dict):
+        return
+    order = ORDERS.get(client_order_id)
+    if order is None or order.get("acked") or order["status"] in TERMINAL_STATUSES:
+        return
+    order["acked"] = True
+    status = result.get("status")
+    if status is None:
+        # an ack without a status still settles an order whose send outcome was lost
+        status = "new" if order["status"] == "unknown" else order["status"]
+    update_status(
+        client_order_id,
+        status,
+        exchange_order_id=result.get("id") or result.get("orderId"),
+    )
+    for fill in result.get("fills") or []:
+        if isinstance(fill, dict):
+            record_fill(client_order_id, fill)
+
+
+def _parse_ts(raw: Any) -> Optional[datetime]:
+    if raw is None:
+        return None
+    try:
+        if isinstance(raw, (int, float)):
+            # venues send epoch ms
+            return datetime.fromtimestamp(float(raw) / 1000.0, tz=timezone.utc)
+        return datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def open_orders() -> List[Dict[str, Any]]:
+    return [o for o in ORDERS.values() if o["status"] in OPEN_STATUSES]
+
+
+async def load_state() -> int:
+    """Rebuild the open-order cache from the database (called at startup)."""
+    if db.get_pool() is None:
+        return 0
+    sql = (
+        "SELECT o.client_order_id, o.symbol, o.side, o.quantity, o.price, o.notional_usd, o.strategy, o.status, "
+        "o.exchange_order_id, o.error, o.created_at, "
+        "COALESCE((SELECT sum(e.quantity) FROM executions e WHERE e.order_id = o.id), 0), "
+        "ARRAY(SELECT x.execution_id FROM execution_ids x WHERE x.order_id = o.id) "
+        "FROM orders o WHERE o.status = ANY(%s) AND o.client_order_id IS NOT NULL ORDER BY o.created_at"
+    )
+    async with db.connection("control") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, (list(OPEN_STATUSES),))
+            rows = await cur.fetchall()
+    for r in rows:
+        ORDERS[r[0]] = {
+            "client_order_id": r[0],
+            "symbol": r[1],
+            "side": r[2],
+            "quantity": float(r[3]),
+            "price": float(r[4]) if r[4] is not None else None,
+            "notional_usd": float(r[5]) if r[5] is not None else None,
+            "strategy": r[6],
+            "status": r[7],
+            "exchange_order_id": r[8],
+            "error": r[9],
+            "created_at": r[10],
+            "filled_qty": float(r[11]),
+            "execution_ids": set(r[12] or ()),
+            # an order with a venue id has had its ack applied before the restart
+            "acked": r[8] is not None,
+        }
+    _logger.info("order store: restored %d open orders", len(rows))
+    return len(rows)
+
+
+async def start() -> None:
+    """Start the write-behind writer and restore open orders (no-op without DB)."""
+    global _writer
+    if db.get_pool() is None:
+        return
+    if _writer is None:
+        _writer = BatchWriter(
+            "orders",
+            _flush,
+            max_queue=settings.ORDERS_QUEUE_MAX,
+            batch_size=settings.ORDERS_BATCH_SIZE,
+            flush_interval=settings.ORDERS_FLUSH_INTERVAL_MS / 1000.0,
+        )
+    _writer.start()
+    try:
+        await load_state()
+    except Exception as e:
+        _logger.warning("order store: failed to restore state: %s", e)
+
+
+async def stop() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
@@ -0,0 +1,26 @@
+from __future__ import annotations
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(at: datetime, row_id: Any) -> str:
+    """Opaque keyset cursor for an ``(timestamp, id)`` position."""
+    raw = json.dumps([at.isoformat(), str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """``(timestamp, id)`` from a cursor; the id must be a UUID (it is bound as ``%s::uuid``)."""
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        at, row_id = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        return datetime.fromisoformat(at), str(uuid.UUID(str(row_id)))
+    except Exception as e:
+        raise InvalidCursor("invalid cursor") from e
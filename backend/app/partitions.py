@@ -0,0 +1,192 @@
+"""Monthly partition maintenance for ``executions`` and ``audit_log``.
+
+Both tables are ``PARTITION BY RANGE`` on their timestamp with one partition per
+UTC month named ``<table>_pYYYY_MM``. A background task keeps
+``PARTITION_PREMAKE_MONTHS`` future partitions in place (there is no default
+partition, so an insert for a month without one fails) and retires partitions
+older than the table's retention: detached concurrently, then either moved to
+the ``archive`` schema (kept for dump/export) or dropped.
+
+``time_range`` builds the half-open predicate queries should use so the planner
+can prune partitions.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from .settings import settings
+from . import db
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+PARTITIONS_CREATED = Counter("db_partitions_created_total", "Partitions created ahead of time", ["table"])
+PARTITIONS_RETIRED = Counter(
+    "db_partitions_retired_total",
+    "Partitions detached past retention (action: archive | drop)",
+    ["table", "action"],
+)
+PARTITION_MAINTENANCE_FAILURES = Counter(
+    "db_partition_maintenance_failures_total",
+    "Failed partition maintenance runs",
+)
+PARTITIONS_ATTACHED = Gauge("db_partitions_attached", "Partitions currently attached", ["table"])
+
+# Partitioned table -> partition key column
+PARTITIONED: Dict[str, str] = {"executions": "executed_at", "audit_log": "at"}
+
+ARCHIVE_SCHEMA = "archive"
+_NAME_RE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+_task: Optional[asyncio.Task] = None
+
+
+def month_start(at: datetime) -> datetime:
+    at = at.astimezone(timezone.utc) if at.tzinfo else at.replace(tzinfo=timezone.utc)
+    return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    idx = month.year * 12 + (month.month - 1) + n
+    return month.replace(year=idx // 12, month=idx % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    m = _NAME_RE.search(name)
+    if not m:
+        return None
+    return datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=timezone.utc)
+
+
+def time_range(column: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[List[str], List[Any]]:
+    """Half-open ``[start, end)`` predicates on a partition key.
+
+    Plain comparisons on the bare column (no functions or casts around it) are
+    what lets Postgres prune partitions, at plan time or, with parameters, at
+    execution time.
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    if start is not None:
+        where.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        where.append(f"{column} < %s")
+        params.append(end)
+    return where, params
+
+
+def retention_months(table: str) -> int:
+    if table == "executions":
+        return settings.PARTITION_RETENTION_MONTHS_EXECUTIONS
+    return settings.PARTITION_RETENTION_MONTHS_AUDIT
+
+
+def plan(table: str, attached: List[str], now: datetime) -> Tuple[List[datetime], List[str]]:
+    """Months to create and partitions to retire for one table."""
+    current = month_start(now)
+    existing = {partition_month(n) for n in attached}
+    create = [
+        m for m in (add_months(current, i) for i in range(-1, settings.PARTITION_PREMAKE_MONTHS + 1))
+        if m not in existing
+    ]
+    retire: List[str] = []
+    keep = retention_months(table)
+    if keep > 0:
+        cutoff = add_months(current, -keep)
+        retire = sorted(n for n in attached if (partition_month(n) or cutoff) < cutoff)
+    return create, retire
+
+
+async def _attached(cur: Any, table: str) -> List[str]:
+    await cur.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s",
+        (table,),
+    )
+    return [r[0] for r in await cur.fetchall()]
+
+
+async def maintain(now: Optional[datetime] = None) -> Dict[str, Dict[str, List[str]]]:
+    """Create missing partitions and retire expired ones; returns what changed per table."""
+    if db.get_pool() is None:
+        return {}
+    now = now or datetime.now(timezone.utc)
+    report: Dict[str, Dict[str, List[str]]] = {}
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    async with db.connection("bulk") as conn:
+        await conn.set_autocommit(True)  # type: ignore
+        try:
+            async with conn.cursor() as cur:  # type: ignore
+                for table in PARTITIONED:
+                    attached = await _attached(cur, table)
+                    create, retire = plan(table, attached, now)
+                    created: List[str] = []
+                    for month in create:
+                        name = partition_name(table, month)
+                        # DDL takes no bind parameters; bounds are our own UTC month starts
+                        await cur.execute(
+                            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                        )
+                        created.append(name)
+                        PARTITIONS_CREATED.labels(table).inc()
+                    retired: List[str] = []
+                    action = settings.PARTITION_RETENTION_ACTION
+                    for name in retire:
+                        await cur.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" CONCURRENTLY')
+                        if action == "drop":
+                            await cur.execute(f'DROP TABLE "{name}"')
+                        else:
+                            await cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"')
+                            await cur.execute(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"')
+                        retired.append(name)
+                        PARTITIONS_RETIRED.labels(table, action).inc()
+                    PARTITIONS_ATTACHED.labels(table).set(len(attached) + len(created) - len(retired))
+                    report[table] = {"created": created, "retired": retired}
+                    if created or retired:
+                        _logger.info("partitions %s: created %s, retired %s (%s)", table, created, retired, action)
+        finally:
+            await conn.set_autocommit(False)  # type: ignore
+    return report
+
+
+async def _run() -> None:
+    while True:
+        try:
+            await maintain()
+        except Exception as e:
+            PARTITION_MAINTENANCE_FAILURES.inc()
+            # an interrupted concurrent detach leaves the partition "detach pending";
+            # it needs ALTER TABLE ... DETACH PARTITION ... FINALIZE
+            _logger.warning("partition maintenance failed: %s", e)
+        await asyncio.sleep(max(60.0, float(settings.PARTITION_MAINTENANCE_INTERVAL_SEC)))
+
+
+def start() -> None:
+    """Run maintenance now and then periodically (no-op without DB)."""
+    global _task
+    if db.get_pool() is None or settings.PARTITION_MAINTENANCE_INTERVAL_SEC <= 0:
+        return
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
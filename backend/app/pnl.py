@@ -0,0 +1,317 @@
+"""Position and PnL accounting from order executions.
+
+Each fill is applied to a per-symbol book as it arrives: FIFO lots in a deque
+(or a single average-cost lot), so an execution costs O(1) amortized per lot it
+closes. Realized PnL, trade counts and win rate are kept as running totals;
+unrealized PnL is marked against the latest quotes in ``quotes.store`` on a
+short refresh tick. Order symbols and quote pairs are matched on their
+canonical spelling (``quote_ingest.canonical_symbol``, with ``-``/``_`` read as
+``/``), so ``hype/usdc`` or ``ETH-USD`` positions are marked by ``HYPE/USDC`` or
+``ETH/USD`` quotes. ``/api/bot/status`` and ``bot_pnl_usd`` read the cached
+summary and never walk the history.
+
+At startup the books are rebuilt from the ``executions`` table with a
+vectorized FIFO pass (numpy), falling back to replaying fills through the
+incremental engine for symbols whose position crosses zero.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from prometheus_client import Gauge
+
+from .settings import settings
+from . import db
+from . import quotes
+from . import order_store
+from .quote_ingest import canonical_symbol
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+PNL_REALIZED_GAUGE = Gauge("pnl_realized_usd", "Realized PnL in USD (net of quote-currency fees)")
+PNL_UNREALIZED_GAUGE = Gauge("pnl_unrealized_usd", "Unrealized PnL in USD marked to latest quotes")
+
+# Fees in these currencies are deducted from realized PnL; others are ignored
+_QUOTE_FEE_CURRENCIES = {"", "USD", "USDC", "USDT"}
+_EPS = 1e-12
+
+
+@dataclass
+class Book:
+    """Open position for one symbol. Lots are [signed qty, price]; all lots share a sign."""
+
+    lots: Deque[List[float]] = field(default_factory=deque)
+    qty: float = 0.0
+    cost: float = 0.0  # signed sum(qty * price) over open lots
+    realized: float = 0.0
+
+    @property
+    def avg_price(self) -> float:
+        return self.cost / self.qty if abs(self.qty) > _EPS else 0.0
+
+
+class PnlEngine:
+    def __init__(self, method: str = "fifo"):
+        if method not in ("fifo", "avg"):
+            raise ValueError(f"unknown PnL method: {method}")
+        self.method = method
+        self.books: Dict[str, Book] = {}
+        self.realized = 0.0
+        self.fees = 0.0
+        self.trades = 0
+        self.wins = 0
+        self.unrealized = 0.0
+        self.marked_at: Optional[float] = None
+
+    def reset(self) -> None:
+        self.books.clear()
+        self.realized = self.fees = self.unrealized = 0.0
+        self.trades = self.wins = 0
+        self.marked_at = None
+
+    def apply(self, symbol: str, side: str, qty: float, price: float, fee: float = 0.0) -> float:
+        """Apply one execution; returns the realized PnL it produced (before fees)."""
+        book = self.books.setdefault(symbol, Book())
+        signed = qty if side == "buy" else -qty
+        realized = 0.0
+        closed = False
+        remaining = signed
+        # Close against open lots of the opposite sign
+        while abs(remaining) > _EPS and book.lots and (book.lots[0][0] > 0) != (remaining > 0):
+            lot = book.lots[0]
+            take = min(abs(remaining), abs(lot[0]))
+            direction = 1.0 if lot[0] > 0 else -1.0
+            realized += direction * take * (price - lot[1])
+            lot[0] -= direction * take
+            book.qty -= direction * take
+            book.cost -= direction * take * lot[1]
+            remaining += direction * take
+            closed = True
+            if abs(lot[0]) <= _EPS:
+                book.lots.popleft()
+        # Whatever is left opens (or extends) the position
+        if abs(remaining) > _EPS:
+            if self.method == "avg" and book.lots:
+                lot = book.lots[0]
+                lot[1] = (lot[0] * lot[1] + remaining * price) / (lot[0] + remaining)
+                lot[0] += remaining
+            else:
+                book.lots.append([remaining, price])
+            book.qty += remaining
+            book.cost += remaining * price
+        if not book.lots:
+            book.qty = book.cost = 0.0
+        book.realized += realized - fee
+        self.realized += realized - fee
+        self.fees += fee
+        if closed:
+            self.trades += 1
+            if realized - fee > 0:
+                self.wins += 1
+        PNL_REALIZED_GAUGE.set(self.realized)
+        return realized
+
+    def mark(self, marks: Dict[str, float]) -> float:
+        """Recompute unrealized PnL from a symbol -> mid price map."""
+        total = 0.0
+        for sym, book in self.books.items():
+            px = marks.get(sym)
+            if px and abs(book.qty) > _EPS:
+                total += book.qty * px - book.cost
+        self.unrealized = total
+        self.marked_at = time.time()
+        PNL_UNREALIZED_GAUGE.set(total)
+        return total
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "realized": self.realized,
+            "unrealized": self.unrealized,
+            "total": self.realized + self.unrealized,
+            "fees": self.fees,
+            "tradesCount": self.trades,
+            "winRate": (self.wins / self.trades) if self.trades else 0.0,
+            "positions": {s: b.qty for s, b in self.books.items() if abs(b.qty) > _EPS},
+        }
+
+    # ------------------------------------------------------------------
+    # Full recompute from history
+    # ------------------------------------------------------------------
+    def recompute(self, fills: pd.DataFrame) -> None:
+        """Rebuild all books from an execution history.
+
+        ``fills`` has columns symbol, side, qty, price and optionally fee, in
+        execution order. FIFO books whose position never changes sign are
+        computed in one vectorized pass; everything else is replayed.
+        """
+        self.reset()
+        if fills.empty:
+            return
+        if "fee" not in fills:
+            fills = fills.assign(fee=0.0)
+        for sym, g in fills.groupby("symbol", sort=False):
+            signed = np.where(g["side"].to_numpy() == "buy", 1.0, -1.0) * g["qty"].to_numpy(dtype=float)
+            pos = np.cumsum(signed)
+            one_sided = bool(np.all(pos >= -_EPS)) or bool(np.all(pos <= _EPS))
+            if self.method == "fifo" and one_sided:
+                self._recompute_one_sided(str(sym), signed, g["price"].to_numpy(dtype=float),
+                                          g["fee"].fillna(0).to_numpy(dtype=float))
+            else:
+                for side, qty, price, fee in zip(g["side"], g["qty"], g["price"], g["fee"].fillna(0)):
+                    self.apply(str(sym), side, float(qty), float(price), float(fee))
+        PNL_REALIZED_GAUGE.set(self.realized)
+
+    def _recompute_one_sided(self, sym: str, signed: np.ndarray, price: np.ndarray, fee: np.ndarray) -> None:
+        # Orient so opening fills are positive (long book, or a short book mirrored)
+        direction = 1.0 if signed[np.flatnonzero(np.abs(signed) > _EPS)[0]] > 0 else -1.0
+        q = signed * direction
+        opening = q > 0
+        open_qty = np.where(opening, q, 0.0)
+        close_qty = np.where(opening, 0.0, -q)
+        # FIFO cost of the first x opened units is piecewise linear in x
+        cum_open = np.concatenate(([0.0], np.cumsum(open_qty[opening])))
+        cum_cost = np.concatenate(([0.0], np.cumsum((open_qty * price)[opening])))
+        cum_closed = np.cumsum(close_qty)
+        before = cum_closed - close_qty
+        basis = np.interp(cum_closed, cum_open, cum_cost) - np.interp(before, cum_open, cum_cost)
+        pnl = np.where(opening, 0.0, direction * (close_qty * price - basis))
+        closing = ~opening
+        net = pnl[closing] - fee[closing]
+        book = Book()
+        book.realized = float(pnl.sum() - fee.sum())
+        # Remaining lots: opened units beyond the total closed quantity
+        closed_total = float(cum_closed[-1])
+        lot_end = cum_open[1:]
+        lot_qty = open_qty[opening]
+        lot_px = price[opening]
+        for end, lq, lp in zip(lot_end, lot_qty, lot_px):
+            left = min(lq, end - closed_total)
+            if left > _EPS:
+                book.lots.append([direction * left, float(lp)])
+                book.qty += direction * left
+                book.cost += direction * left * float(lp)
+        self.books[sym] = book
+        self.realized += book.realized
+        self.fees += float(fee.sum())
+        self.trades += int(closing.sum())
+        self.wins += int((net > 0).sum())
+
+
+engine = PnlEngine(settings.PNL_METHOD)
+_task: Optional[asyncio.Task] = None
+
+
+def pair_key(symbol: str) -> str:
+    """Key matching an order symbol to a quote pair, whatever case or separator each uses."""
+    return canonical_symbol(symbol).replace("-", "/").replace("_", "/")
+
+
+def _marks() -> Dict[str, float]:
+    """Latest mid per ``pair_key``."""
+    out: Dict[str, float] = {}
+    for (venue, pair), q in quotes.store.latest.items():
+        mid = q.get("mid")
+        if not mid:
+            continue
+        key = pair_key(pair)
+        # prefer the venue we trade on when several publish the same pair
+        if key not in out or venue == settings.EXCHANGE_VENUE:
+            out[key] = float(mid)
+    return out
+
+
+def refresh() -> Dict[str, Any]:
+    marks = _marks()
+    # books stay keyed by the symbol as ordered; only the lookup is canonical
+    by_symbol: Dict[str, float] = {}
+    for sym in engine.books:
+        px = marks.get(pair_key(sym))
+        if px:
+            by_symbol[sym] = px
+    engine.mark(by_symbol)
+    return engine.summary()
+
+
+def _on_fill(order: Dict[str, Any], row: Dict[str, Any]) -> None:
+    fee = 0.0
+    if row.get("fee_amount") and str(row.get("fee_currency") or "").upper() in _QUOTE_FEE_CURRENCIES:
+        fee = float(row["fee_amount"])
+    engine.apply(order["symbol"], order["side"], float(row["quantity"]), float(row["price"]), fee)
+
+
+async def load_history() -> int:
+    """Recompute books from the executions table (no-op without DB)."""
+    if db.get_pool() is None:
+        return 0
+    # primary, not the replica: the books must agree with the order store
+    sql = (
+        "SELECT e.symbol, e.side, e.quantity, e.price, "
+        "CASE WHEN upper(coalesce(e.fee_currency, '')) = ANY(%s) THEN coalesce(e.fee_amount, 0) ELSE 0 END "
+        "FROM executions e ORDER BY e.executed_at, e.id"
+    )
+    async with db.connection("control") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, (sorted(_QUOTE_FEE_CURRENCIES),))
+            rows = await cur.fetchall()
+    df = pd.DataFrame(rows, columns=["symbol", "side", "qty", "price", "fee"])
+    if not df.empty:
+        df[["qty", "price", "fee"]] = df[["qty", "price", "fee"]].astype(float)
+    engine.recompute(df)
+    _logger.info("pnl: rebuilt %d symbols from %d executions", len(engine.books), len(rows))
+    return len(rows)
+
+
+async def _write_snapshot(summary: Dict[str, Any]) -> None:
+    if db.get_pool() is None:
+        return
+    equity = settings.PNL_STARTING_EQUITY_USD + summary["total"] if settings.PNL_STARTING_EQUITY_USD else None
+    async with db.connection("bulk") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(
+                "INSERT INTO pnl_snapshots (realized_pnl_usd, unrealized_pnl_usd, equity_usd) VALUES (%s, %s, %s)",
+                (summary["realized"], summary["unrealized"], equity),
+            )
+
+
+async def _run() -> None:
+    interval = max(0.05, settings.PNL_REFRESH_MS / 1000.0)
+    last_snapshot = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        summary = refresh()
+        if settings.PNL_SNAPSHOT_INTERVAL_SEC > 0 and time.monotonic() - last_snapshot >= settings.PNL_SNAPSHOT_INTERVAL_SEC:
+            last_snapshot = time.monotonic()
+            try:
+                await _write_snapshot(summary)
+            except Exception as e:
+                _logger.warning("pnl: snapshot write failed: %s", e)
+
+
+async def start() -> None:
+    """Rebuild from history, subscribe to fills and start the mark/snapshot loop."""
+    global _task
+    try:
+        await load_history()
+    except Exception as e:
+        _logger.warning("pnl: failed to load execution history: %s", e)
+    order_store.add_fill_listener(_on_fill)
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _task
+    order_store.remove_fill_listener(_on_fill)
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
@@ -0,0 +1,304 @@
+"""Batched quote ingestion into the in-process quote store.
+
+Producers push quotes as NDJSON (one object per line) or msgpack (a stream of
+maps, or arrays of maps) either to ``POST /api/live/quotes`` or to the Unix
+socket at ``QUOTE_INGEST_SOCKET``. On the socket the format is chosen per
+connection from the first byte: ``{`` or whitespace means NDJSON, anything else
+msgpack.
+
+Each row needs ``venue``, ``pair`` and a positive ``mid`` (or ``bid`` and
+``ask``); ``ts`` (epoch ms) defaults to the receive time. Rows are normalized to
+the collector quote shape. Venue and pair names are upper-cased and interned
+through a bounded table (``QUOTE_INGEST_MAX_SYMBOLS``), so the store's keys share
+one string object per name and a producer cannot grow the table without bound.
+Each decoded batch is handed to ``QuoteStore.publish_many`` in one call.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .settings import settings
+from . import quotes
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+try:
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+INGEST_BATCHES = Counter("quote_ingest_batches_total", "Quote batches ingested", ["transport", "format"])
+INGEST_REJECTED = Counter(
+    "quote_ingest_rejected_total",
+    "Ingested rows rejected (reason: decode | not_object | bad_symbol | too_many_symbols | bad_price | bad_ts)",
+    ["reason"],
+)
+
+NDJSON = "ndjson"
+MSGPACK = "msgpack"
+CONTENT_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def canonical_symbol(name: str) -> str:
+    """The canonical spelling of a venue or pair name (stripped, upper-cased)."""
+    return name.strip().upper()
+
+
+class SymbolTable:
+    """Bounded intern table of canonical (stripped, upper-cased) names.
+
+    Spellings that normalize to the same name share one entry, so only distinct
+    canonical names count toward ``max_size``.
+    """
+
+    def __init__(self, max_size: int = 10_000):
+        self.max_size = max_size
+        self._names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, name: str) -> Optional[str]:
+        key = canonical_symbol(name)
+        canonical = self._names.get(key)
+        if canonical is None:
+            if not key or len(key) > 64 or len(self._names) >= self.max_size:
+                return None
+            canonical = self._names[key] = sys.intern(key)
+        return canonical
+
+
+symbols = SymbolTable(settings.QUOTE_INGEST_MAX_SYMBOLS)
+
+
+def normalize(rows: Iterable[Any], table: Optional[SymbolTable] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Valid rows in the collector quote shape, plus the number rejected."""
+    table = symbols if table is None else table
+    intern = table.intern
+    isfinite = math.isfinite
+    now_ms = int(time.time() * 1000)
+    out: List[Dict[str, Any]] = []
+    append = out.append
+    rejected: Dict[str, int] = {}
+    for row in rows:
+        if type(row) is not dict:
+            reason = "not_object"
+        else:
+            venue = row.get("venue")
+            pair = row.get("pair")
+            if type(venue) is not str or type(pair) is not str:
+                reason = "bad_symbol"
+            else:
+                venue = intern(venue)
+                pair = intern(pair)
+                if venue is None or pair is None:
+                    reason = "too_many_symbols" if len(table) >= table.max_size else "bad_symbol"
+                else:
+                    bid = row.get("bid")
+                    ask = row.get("ask")
+                    mid = row.get("mid")
+                    try:
+                        if mid is None:
+                            mid = (bid + ask) / 2
+                        ok = isfinite(mid) and mid > 0 and (bid is None or isfinite(bid)) and (ask is None or isfinite(ask))
+                    except TypeError:
+                        ok = False
+                    if not ok:
+                        reason = "bad_price"
+                    else:
+                        ts = row.get("ts", now_ms)
+                        if type(ts) is not int:
+                            if type(ts) is float and isfinite(ts):
+                                ts = int(ts)
+                            else:
+                                reason = "bad_ts"
+                                rejected[reason] = rejected.get(reason, 0) + 1
+                                continue
+                        append({"type": "quote", "venue": venue, "pair": pair, "bid": bid, "ask": ask, "mid": mid, "ts": ts})
+                        continue
+        rejected[reason] = rejected.get(reason, 0) + 1
+    for reason, n in rejected.items():
+        INGEST_REJECTED.labels(reason).inc(n)
+    return out, sum(rejected.values())
+
+
+def decode_ndjson(data: bytes) -> Tuple[List[Any], int]:
+    """Objects from NDJSON bytes, plus the number of lines that failed to parse."""
+    lines = [ln for ln in data.split(b"\n") if ln and not ln.isspace()]
+    if not lines:
+        return [], 0
+    try:
+        # fast path: the whole batch in one parser call
+        return _loads(b"[" + b",".join(lines) + b"]"), 0
+    except ValueError:
+        pass
+    rows: List[Any] = []
+    bad = 0
+    for ln in lines:
+        try:
+            rows.append(_loads(ln))
+        except ValueError:
+            bad += 1
+    return rows, bad
+
+
+def _flatten(objs: Iterable[Any]) -> List[Any]:
+    rows: List[Any] = []
+    for obj in objs:
+        if type(obj) is list:
+            rows.extend(obj)
+        else:
+            rows.append(obj)
+    return rows
+
+
+def decode_msgpack(data: bytes) -> Tuple[List[Any], int]:
+    """Maps from a msgpack stream (top-level arrays are flattened), plus 1 if decoding failed part way."""
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    objs: List[Any] = []
+    try:
+        for obj in unpacker:
+            objs.append(obj)
+    except Exception:
+        return _flatten(objs), 1
+    return _flatten(objs), 0
+
+
+def ingest(rows: List[Any], *, transport: str, fmt: str, decode_errors: int = 0,
+           store: Optional[quotes.QuoteStore] = None) -> Tuple[int, int]:
+    """Validate decoded rows and publish them; returns (accepted, rejected)."""
+    if decode_errors:
+        INGEST_REJECTED.labels("decode").inc(decode_errors)
+    valid, rejected = normalize(rows)
+    if valid:
+        (store or quotes.store).publish_many(valid, source=f"ingest_{transport}")
+    INGEST_BATCHES.labels(transport, fmt).inc()
+    return len(valid), rejected + decode_errors
+
+
+def ingest_body(body: bytes, fmt: str, *, transport: str = "http",
+                store: Optional[quotes.QuoteStore] = None) -> Tuple[int, int]:
+    rows, bad = decode_msgpack(body) if fmt == MSGPACK else decode_ndjson(body)
+    return ingest(rows, transport=transport, fmt=fmt, decode_errors=bad, store=store)
+
+
+# ----------------------------------------------------------------------
+# Unix domain socket listener
+# ----------------------------------------------------------------------
+_server: Optional[asyncio.AbstractServer] = None
+_socket_path: Optional[str] = None
+
+
+async def _handle_ndjson(reader: asyncio.StreamReader, first: bytes) -> None:
+    carry = first
+    while True:
+        head, sep, carry = carry.rpartition(b"\n")
+        if sep:
+            rows, bad = decode_ndjson(head)
+            ingest(rows, transport="socket", fmt=NDJSON, decode_errors=bad)
+        if len(carry) > settings.QUOTE_INGEST_MAX_BYTES:
+            INGEST_REJECTED.labels("decode").inc()
+            return
+        chunk = await reader.read(1 << 18)
+        if not chunk:
+            break
+        carry += chunk
+    if carry.strip():
+        rows, bad = decode_ndjson(carry)
+        ingest(rows, transport="socket", fmt=NDJSON, decode_errors=bad)
+
+
+async def _handle_msgpack(reader: asyncio.StreamReader, first: bytes) -> None:
+    unpacker = msgpack.Unpacker(raw=False, max_buffer_size=settings.QUOTE_INGEST_MAX_BYTES)
+    chunk = first
+    while chunk:
+        unpacker.feed(chunk)
+        try:
+            objs = list(unpacker)
+        except Exception:
+            INGEST_REJECTED.labels("decode").inc()
+            return
+        if objs:
+            ingest(_flatten(objs), transport="socket", fmt=MSGPACK)
+        chunk = await reader.read(1 << 18)
+
+
+async def _handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        first = await reader.read(1 << 18)
+        if not first:
+            return
+        if first[:1] == b"{" or first[:1].isspace():
+            await _handle_ndjson(reader, first)
+        elif msgpack is None:
+            _logger.warning("quote ingest: msgpack client on %s but msgpack is not installed", _socket_path)
+        else:
+            await _handle_msgpack(reader, first)
+    except Exception as e:
+        _logger.debug("quote ingest: socket client error: %s", e)
+    finally:
+        writer.close()
+
+
+async def start() -> None:
+    """Listen on ``QUOTE_INGEST_SOCKET`` (``{pid}`` is replaced, for one socket per worker); no-op when unset."""
+    global _server, _socket_path
+    if not settings.QUOTE_INGEST_SOCKET or _server is not None:
+        return
+    path = settings.QUOTE_INGEST_SOCKET.replace("{pid}", str(os.getpid()))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)  # stale socket from a previous run
+    try:
+        _server = await asyncio.start_unix_server(_handle_client, path=path, limit=1 << 20)
+    except OSError as e:
+        _logger.warning("quote ingest: cannot listen on %s: %s", path, e)
+        return
+    os.chmod(path, 0o660)
+    _socket_path = path
+    _logger.info("quote ingest: listening on %s", path)
+
+
+async def stop() -> None:
+    global _server, _socket_path
+    server, _server = _server, None
+    if server is None:
+        return
+    server.close()
+    with contextlib.suppress(Exception):
+        await asyncio.wait_for(server.wait_closed(), timeout=2.0)
+    if _socket_path:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(_socket_path)
+    _socket_path = None
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+# Prometheus metrics
+QUOTES_PUBLISHED = Counter(
+    "quotes_published_total",
+    "Quotes published into the in-process quote store",
+    ["source"],
+)
+QUOTES_DROPPED = Counter(
+    "quotes_subscriber_dropped_total",
+    "Quote batches dropped because a subscriber queue was full",
+)
+
+
+class QuoteStore:
+    """In-process quote path: latest quote per (venue, pair), a bounded recent
+    history, and fan-out to subscribers.
+
+    Quotes use the same row shape as the collector NDJSON
+    (``{"type": "quote", "venue", "pair", "mid", "ts", ...}``). Subscribers get
+    lists of quotes so a burst costs one queue operation per subscriber.
+    """
+
+    def __init__(self, history: int = 5000):
+        self.latest: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, quote: Dict[str, Any], source: str = "unknown") -> None:
+        self.publish_many((quote,), source=source)
+
+    def publish_many(self, quotes: Iterable[Dict[str, Any]], source: str = "unknown") -> int:
+        batch = list(quotes)
+        if not batch:
+            return 0
+        latest = self.latest
+        for q in batch:
+            latest[(q.get("venue", ""), q.get("pair", ""))] = q
+        self._recent.extend(batch)
+        QUOTES_PUBLISHED.labels(source).inc(len(batch))
+        for sub in self._subscribers:
+            try:
+                sub.put_nowait(batch)
+            except asyncio.QueueFull:
+                # slow consumer: drop its oldest batch rather than block the producer
+                QUOTES_DROPPED.inc()
+                try:
+                    sub.get_nowait()
+                    sub.put_nowait(batch)
+                except (asyncio.QueueEmpty, asyncio.QueueFull):
+                    pass
+        return len(batch)
+
+    def subscribe(self, maxsize: int = 256) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subscribers.discard(q)
+
+    def recent(self, limit: int = 200, venues: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        rows = list(self._recent)
+        if venues:
+            rows = [r for r in rows if str(r.get("venue", "")).upper() in venues]
+        return rows[-limit:]
+
+    def clear(self) -> None:
+        self.latest.clear()
+        self._recent.clear()
+
+
+def drain(q: asyncio.Queue, max_rows: int = 100) -> List[Dict[str, Any]]:
+    """Pop every pending batch from a subscriber queue, keeping the newest ``max_rows``."""
+    rows: List[Dict[str, Any]] = []
+    while True:
+        try:
+            rows.extend(q.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return rows[-max_rows:]
+
+
+# Process-wide store used by the streaming client, the WS endpoint and the REST routes
+store = QuoteStore()
@@ -1,42 +1,161 @@
 from __future__ import annotations
-from fastapi import Request, HTTPException, status
-from typing import Dict, Tuple
+import hashlib
+import logging
+import math
 import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request, HTTPException, status
+from prometheus_client import Counter, Gauge
+
 from .settings import settings
+from . import shared_state
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+RATE_LIMIT_ALLOWED = Counter("rate_limit_allowed_total", "Requests admitted by the rate limiter", ["limit_class"])
+RATE_LIMIT_THROTTLED = Counter("rate_limit_throttled_total", "Requests rejected with 429", ["limit_class"])
+RATE_LIMIT_KEYS = Gauge(
+    "rate_limit_tracked_keys", "Identities currently tracked", ["limit_class"], multiprocess_mode="livesum"
+)
+RATE_LIMIT_EVICTIONS = Counter(
+    "rate_limit_evictions_total",
+    "Tracked identities evicted because the key cap was reached",
+    ["limit_class"],
+)
+RATE_LIMIT_FALLBACKS = Counter(
+    "rate_limit_backend_fallbacks_total",
+    "Checks decided by the per-process limiter because the shared backend failed",
+    ["limit_class"],
+)
+
+
+class GcraLimiter:
+    """Generic cell rate algorithm: one float per key.
+
+    Each key stores its theoretical arrival time (TAT). A request at ``now`` is
+    admitted when ``TAT - now <= tolerance`` and pushes TAT forward by one
+    emission interval. A key whose TAT is in the past is indistinguishable from
+    a new key, so it can be forgotten for free; keys are kept in LRU order and
+    expired ones are swept from the cold end. Past ``max_keys`` the least
+    recently used key is evicted even if not expired, which bounds memory no
+    matter how many identities (spoofed or not) show up.
+    """
+
+    def __init__(self, name: str, max_keys: int = 10_000):
+        self.name = name
+        self.max_keys = max(1, max_keys)
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
 
-# naive in-memory sliding window per identity
-_window_counters: Dict[str, Tuple[float, int]] = {}
+    def check(self, key: str, per_min: float, burst: int, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Admit or reject one request; returns (allowed, retry_after_seconds)."""
+        now = time.monotonic() if now is None else now
+        interval = 60.0 / per_min
+        tolerance = interval * (max(1, burst) - 1)
+        tat = max(self._tat.get(key, now), now)
+        if tat - now > tolerance:
+            self._tat.move_to_end(key)
+            return False, tat - now - tolerance
+        self._tat[key] = tat + interval
+        self._tat.move_to_end(key)
+        self._sweep(now)
+        return True, 0.0
+
+    def _sweep(self, now: float) -> None:
+        tats = self._tat
+        # expired keys at the cold end cost nothing to drop
+        while tats:
+            key, tat = next(iter(tats.items()))
+            if tat > now:
+                break
+            tats.popitem(last=False)
+        while len(tats) > self.max_keys:
+            tats.popitem(last=False)
+            RATE_LIMIT_EVICTIONS.labels(self.name).inc()
+        RATE_LIMIT_KEYS.labels(self.name).set(len(tats))
+
+    def clear(self) -> None:
+        self._tat.clear()
+        RATE_LIMIT_KEYS.labels(self.name).set(0)
+
+
+# Limit classes: name -> (per-minute setting, burst setting or None = same as rate)
+LIMIT_CLASSES: Dict[str, Tuple[str, Optional[str]]] = {
+    "control": ("RATE_LIMIT_CONTROL_PER_MIN", None),
+    "orders": ("RATE_LIMIT_ORDERS_PER_MIN", "RATE_LIMIT_ORDERS_BURST"),
+    "export": ("RATE_LIMIT_EXPORT_PER_MIN", None),
+}
+_limiters: Dict[str, GcraLimiter] = {}
+
+
+def _limiter(name: str) -> GcraLimiter:
+    lim = _limiters.get(name)
+    if lim is None:
+        lim = _limiters[name] = GcraLimiter(name, max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    return lim
 
 
 def _identity_from_request(request: Request) -> str:
-    # Prefer auth token when auth is enabled
+    # Prefer auth token when auth is enabled (hashed: raw tokens are never kept as keys)
     auth = request.headers.get("authorization")
     if settings.REQUIRE_AUTH and auth:
-        return auth
+        return "tok:" + hashlib.sha256(auth.encode()).hexdigest()[:32]
     # Else use forwarded-for or client host
     fwd = request.headers.get("x-forwarded-for")
     if fwd:
-        return f"ip:{fwd.split(',')[0].strip()}"
+        return f"ip:{fwd.split(',')[0].strip()[:64]}"
     client = request.client.host if request.client else "unknown"
     return f"ip:{client}"
 
 
-async def rate_limit_control(request: Request):
-    limit = int(getattr(settings, "RATE_LIMIT_CONTROL_PER_MIN", 0) or 0)
-    if limit <= 0:
-        return
-    ident = _identity_from_request(request)
-    now = time.time()
-    window_start, count = _window_counters.get(ident, (now, 0))
-    # reset window every 60s
-    if now - window_start >= 60:
-        window_start, count = now, 0
-    count += 1
-    _window_counters[ident] = (window_start, count)
-    if count > limit:
-        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="rate limit exceeded")
+def rate_limit(limit_class: str) -> Callable:
+    """FastAPI dependency enforcing one limit class (settings are read per request)."""
+    rate_setting, burst_setting = LIMIT_CLASSES[limit_class]
+
+    async def _dependency(request: Request) -> None:
+        per_min = float(getattr(settings, rate_setting, 0) or 0)
+        if per_min <= 0:
+            return
+        burst = int(getattr(settings, burst_setting, 0) or 0) if burst_setting else 0
+        burst = burst or max(1, int(per_min))
+        ident = _identity_from_request(request)
+        backend = shared_state.get_backend()
+        checked = False
+        if backend is not None and backend.shared:
+            # one limit across all workers/nodes: the GCRA step runs atomically in the backend
+            interval = 60.0 / per_min
+            try:
+                allowed, retry_after = await backend.gcra(f"{limit_class}:{ident}", interval, interval * (burst - 1))
+                checked = True
+            except Exception as e:
+                # a database error must not fail the request: this worker's own limit still applies
+                RATE_LIMIT_FALLBACKS.labels(limit_class).inc()
+                _logger.warning("rate limit: shared %s check failed, using the local limiter: %s", backend.name, e)
+        if not checked:
+            allowed, retry_after = _limiter(limit_class).check(ident, per_min, burst)
+        if not allowed:
+            RATE_LIMIT_THROTTLED.labels(limit_class).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+        RATE_LIMIT_ALLOWED.labels(limit_class).inc()
+
+    return _dependency
+
+
+rate_limit_control = rate_limit("control")
+rate_limit_orders = rate_limit("orders")
+rate_limit_export = rate_limit("export")
 
 
 def _reset_rate_limits_for_tests():
     """Testing helper to reset counters between tests."""
-    _window_counters.clear()
+    for lim in _limiters.values():
+        lim.clear()
@@ -0,0 +1,246 @@
+"""Minute / hour / day rollups of executions and PnL snapshots.
+
+Charts read ``exec_rollup`` and ``pnl_rollup`` instead of aggregating raw rows.
+A background task folds new rows into all three bucket widths: each refresh
+takes the rows whose ``ingested_at`` falls in ``[watermark, now() - ROLLUP_LAG_SEC)``
+and advances the watermark in the same transaction, so every raw row is counted
+exactly once. The watermark is on ingest time, not event time, so a fill that
+the write-behind queue lands late still reaches its (older) bucket; the lag
+covers transactions that were still open when the window closed.
+
+Fees are summed for USD-denominated currencies only (``USD_FEE_CURRENCIES``; a
+missing currency counts as USD); other fees would need a conversion rate.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from .settings import settings
+from . import db
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+ROLLUP_REFRESH_SECONDS = Histogram(
+    "rollup_refresh_seconds",
+    "Time to fold new rows into a rollup table",
+    ["rollup"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+ROLLUP_REFRESH_FAILURES = Counter(
+    "rollup_refresh_failures_total",
+    "Failed rollup refreshes",
+    ["rollup"],
+)
+
+# Bucket widths, finest first: (name, postgres date_trunc unit, width)
+BUCKETS: Tuple[Tuple[str, str, timedelta], ...] = (
+    ("1m", "minute", timedelta(minutes=1)),
+    ("1h", "hour", timedelta(hours=1)),
+    ("1d", "day", timedelta(days=1)),
+)
+# Fee currencies summed into exec_rollup.fees (feesUsd), taken at par
+USD_FEE_CURRENCIES: Tuple[str, ...] = ("USD", "USDC", "USDT")
+_USD_FEES_SQL = ", ".join(f"'{c}'" for c in USD_FEE_CURRENCIES)
+_WIDTHS_SQL = "(VALUES " + ", ".join(f"('{n}', '{u}')" for n, u, _ in BUCKETS) + ") AS w(width, unit)"
+
+_EXEC_REFRESH_SQL = f"""
+INSERT INTO exec_rollup (bucket_width, bucket, symbol, trades, buy_qty, sell_qty, buy_notional, sell_notional, fees)
+SELECT w.width, date_trunc(w.unit, e.executed_at), e.symbol, count(*),
+       coalesce(sum(e.quantity) FILTER (WHERE e.side = 'buy'), 0),
+       coalesce(sum(e.quantity) FILTER (WHERE e.side = 'sell'), 0),
+       coalesce(sum(e.quantity * e.price) FILTER (WHERE e.side = 'buy'), 0),
+       coalesce(sum(e.quantity * e.price) FILTER (WHERE e.side = 'sell'), 0),
+       coalesce(sum(e.fee_amount) FILTER (WHERE upper(coalesce(e.fee_currency, 'USD')) IN ({_USD_FEES_SQL})), 0)
+FROM executions e CROSS JOIN {_WIDTHS_SQL}
+WHERE e.ingested_at >= %(lo)s AND e.ingested_at < %(hi)s
+GROUP BY 1, 2, 3
+ON CONFLICT (bucket_width, symbol, bucket) DO UPDATE SET
+  trades = exec_rollup.trades + EXCLUDED.trades,
+  buy_qty = exec_rollup.buy_qty + EXCLUDED.buy_qty,
+  sell_qty = exec_rollup.sell_qty + EXCLUDED.sell_qty,
+  buy_notional = exec_rollup.buy_notional + EXCLUDED.buy_notional,
+  sell_notional = exec_rollup.sell_notional + EXCLUDED.sell_notional,
+  fees = exec_rollup.fees + EXCLUDED.fees
+"""
+
+# Snapshots are levels, not flows: keep the last value per bucket plus the range.
+# A late snapshot only replaces the bucket's values when it is newer than the kept one.
+_PNL_REFRESH_SQL = f"""
+INSERT INTO pnl_rollup (bucket_width, bucket, realized_pnl_usd, unrealized_pnl_usd, equity_usd, last_at,
+                        total_min_usd, total_max_usd, samples)
+SELECT w.width, date_trunc(w.unit, p.at),
+       (array_agg(p.realized_pnl_usd ORDER BY p.at DESC))[1],
+       (array_agg(p.unrealized_pnl_usd ORDER BY p.at DESC))[1],
+       (array_agg(p.equity_usd ORDER BY p.at DESC))[1],
+       max(p.at),
+       min(p.realized_pnl_usd + p.unrealized_pnl_usd),
+       max(p.realized_pnl_usd + p.unrealized_pnl_usd),
+       count(*)
+FROM pnl_snapshots p CROSS JOIN {_WIDTHS_SQL}
+WHERE p.ingested_at >= %(lo)s AND p.ingested_at < %(hi)s
+GROUP BY 1, 2
+ON CONFLICT (bucket_width, bucket) DO UPDATE SET
+  realized_pnl_usd = CASE WHEN (EXCLUDED.last_at >= pnl_rollup.last_at) IS NOT FALSE
+                          THEN EXCLUDED.realized_pnl_usd ELSE pnl_rollup.realized_pnl_usd END,
+  unrealized_pnl_usd = CASE WHEN (EXCLUDED.last_at >= pnl_rollup.last_at) IS NOT FALSE
+                            THEN EXCLUDED.unrealized_pnl_usd ELSE pnl_rollup.unrealized_pnl_usd END,
+  equity_usd = CASE WHEN (EXCLUDED.last_at >= pnl_rollup.last_at) IS NOT FALSE
+                    THEN EXCLUDED.equity_usd ELSE pnl_rollup.equity_usd END,
+  last_at = GREATEST(pnl_rollup.last_at, EXCLUDED.last_at),
+  total_min_usd = LEAST(pnl_rollup.total_min_usd, EXCLUDED.total_min_usd),
+  total_max_usd = GREATEST(pnl_rollup.total_max_usd, EXCLUDED.total_max_usd),
+  samples = pnl_rollup.samples + EXCLUDED.samples
+"""
+
+ROLLUPS: Dict[str, str] = {"exec_rollup": _EXEC_REFRESH_SQL, "pnl_rollup": _PNL_REFRESH_SQL}
+
+_task: Optional[asyncio.Task] = None
+
+
+def pick_bucket(start: datetime, end: datetime, max_points: int) -> str:
+    """Coarsest bucket width that fits ``[start, end)`` (no wider than the range)
+    and whose point count stays within ``max_points``.
+
+    Ranges shorter than a minute get the minute rollup; anything else that no
+    width fits gets the day rollup.
+    """
+    span = end - start
+    fitting = [name for name, _, width in BUCKETS if width <= span and span / width <= max_points]
+    if fitting:
+        return fitting[-1]
+    return BUCKETS[0][0] if span < BUCKETS[0][2] else BUCKETS[-1][0]
+
+
+def floor_bucket(at: datetime, bucket: str) -> datetime:
+    """Start of the UTC bucket containing ``at`` (naive datetimes are taken as UTC)."""
+    at = at.astimezone(timezone.utc) if at.tzinfo else at.replace(tzinfo=timezone.utc)
+    if bucket == "1m":
+        return at.replace(second=0, microsecond=0)
+    if bucket == "1h":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def refresh(name: str) -> Optional[Tuple[datetime, datetime]]:
+    """Fold rows newer than the watermark into one rollup; returns the processed window."""
+    if db.get_pool() is None:
+        return None
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    async with db.connection("bulk") as conn:
+        async with conn.transaction():  # type: ignore
+            async with conn.cursor() as cur:  # type: ignore
+                # buckets are UTC regardless of the server/session time zone
+                await cur.execute("SET LOCAL TIME ZONE 'UTC'")
+                await cur.execute(
+                    "INSERT INTO rollup_watermarks (name, processed_to) VALUES (%s, '-infinity') "
+                    "ON CONFLICT (name) DO NOTHING",
+                    (name,),
+                )
+                # row lock serializes refreshes across workers
+                await cur.execute(
+                    "SELECT processed_to, now() - make_interval(secs => %s) FROM rollup_watermarks "
+                    "WHERE name = %s FOR UPDATE",
+                    (settings.ROLLUP_LAG_SEC, name),
+                )
+                lo, hi = await cur.fetchone()
+                if hi <= lo:
+                    return None
+                await cur.execute(ROLLUPS[name], {"lo": lo, "hi": hi})
+                await cur.execute(
+                    "UPDATE rollup_watermarks SET processed_to = %s WHERE name = %s", (hi, name)
+                )
+    ROLLUP_REFRESH_SECONDS.labels(name).observe(loop.time() - started)
+    return lo, hi
+
+
+async def refresh_all() -> None:
+    for name in ROLLUPS:
+        try:
+            await refresh(name)
+        except Exception as e:
+            ROLLUP_REFRESH_FAILURES.labels(name).inc()
+            _logger.warning("rollups: %s refresh failed: %s", name, e)
+
+
+async def volume(
+    start: datetime, end: datetime, bucket: str, symbol: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    where = "bucket_width = %s AND bucket >= %s AND bucket < %s"
+    params: List[Any] = [bucket, floor_bucket(start, bucket), end]
+    if symbol:
+        where += " AND symbol = %s"
+        params.append(symbol)
+    sql = (
+        "SELECT bucket, sum(trades), sum(buy_qty), sum(sell_qty), sum(buy_notional), sum(sell_notional), sum(fees) "
+        f"FROM exec_rollup WHERE {where} GROUP BY bucket ORDER BY bucket"
+    )
+    async with db.connection("read") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+    return [
+        {
+            "bucket": r[0].astimezone(timezone.utc).isoformat(),
+            "trades": int(r[1]),
+            "buyQty": float(r[2]),
+            "sellQty": float(r[3]),
+            "buyNotionalUsd": float(r[4]),
+            "sellNotionalUsd": float(r[5]),
+            "feesUsd": float(r[6]),
+        }
+        for r in rows
+    ]
+
+
+async def pnl_series(start: datetime, end: datetime, bucket: str) -> List[Dict[str, Any]]:
+    sql = (
+        "SELECT bucket, realized_pnl_usd, unrealized_pnl_usd, equity_usd, total_min_usd, total_max_usd "
+        "FROM pnl_rollup WHERE bucket_width = %s AND bucket >= %s AND bucket < %s "
+        "ORDER BY bucket"
+    )
+    async with db.connection("read") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, (bucket, floor_bucket(start, bucket), end))
+            rows = await cur.fetchall()
+    return [
+        {
+            "bucket": r[0].astimezone(timezone.utc).isoformat(),
+            "realizedUsd": float(r[1] or 0),
+            "unrealizedUsd": float(r[2] or 0),
+            "equityUsd": float(r[3]) if r[3] is not None else None,
+            "totalMinUsd": float(r[4] or 0),
+            "totalMaxUsd": float(r[5] or 0),
+        }
+        for r in rows
+    ]
+
+
+async def _run() -> None:
+    while True:
+        await refresh_all()
+        await asyncio.sleep(max(1.0, float(settings.ROLLUP_REFRESH_SEC)))
+
+
+def start() -> None:
+    """Start the periodic refresh (no-op without DB or when ROLLUP_REFRESH_SEC is 0)."""
+    global _task
+    if db.get_pool() is None or settings.ROLLUP_REFRESH_SEC <= 0:
+        return
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
@@ -1,15 +1,35 @@
-from fastapi import APIRouter
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from typing import List, Optional
 from datetime import datetime, timedelta
 from ..schemas import Trade
+from .. import db
+from .. import trades as trades_store
+from .. import trade_stream
+from ..pagination import InvalidCursor
 from fastapi.responses import StreamingResponse
-import json
-import asyncio
 
 router = APIRouter(prefix="/api/activity", tags=["activity"])
 
 @router.get("/trades", response_model=List[Trade])
-def get_trades(limit: int = 10):
+async def get_trades(
+    response: Response,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    strategy: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    # Executions from the DB, newest first; the next page cursor goes in X-Next-Cursor
+    if db.get_pool() is not None:
+        try:
+            items, next_cursor = await trades_store.fetch_page(limit, cursor, symbol, strategy, start, end)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return items
+    # Demo data when no DB is configured
     now = datetime.utcnow()
     items = []
     for i in range(limit):
@@ -23,17 +43,10 @@ def get_trades(limit: int = 10):
     return items
 
 @router.get("/trades/stream")
-def stream_trades():
-    async def gen():
-        i = 0
-        while True:
-            payload = {
-                "id": f"sse-{i}", "strategy": "strat-1", "pair": "BTC-USD", "side": "buy",
-                "amount": 0.01, "price": 60000 + i, "value": 600 + i,
-                "fee": 0.1, "feeCurrency": "USD", "timestamp": datetime.utcnow().isoformat() + "Z", "status": "closed",
-                "tags": ["live"],
-            }
-            yield f"data: {json.dumps(payload)}\n\n"
-            i += 1
-            await asyncio.sleep(2)
-    return StreamingResponse(gen(), media_type="text/event-stream")
+async def stream_trades(request: Request, last_event_id: Optional[str] = Header(default=None)):
+    # Fills as server-sent events from the shared broadcaster; reconnects resume after Last-Event-ID
+    return StreamingResponse(
+        trade_stream.broadcaster.stream(last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,78 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from .. import audit
+from .. import db
+from ..pagination import InvalidCursor
+from ..ratelimit import rate_limit_export
+from ..schemas import AuditEntry
+
+router = APIRouter(prefix="/api/audit", tags=["audit"])
+
+
+def _require_db() -> None:
+    if db.get_pool() is None:
+        raise HTTPException(status_code=503, detail="database not configured")
+
+
+@router.get("", response_model=List[AuditEntry])
+async def list_audit(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    resource: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    _require_db()
+    try:
+        items, next_cursor = await audit.fetch_page(
+            limit, cursor, actor=actor, action=action, resource=resource, start=start, end=end
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+@router.get("/export")
+async def export_audit(
+    format: str = "ndjson",
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    resource: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    authorization: Optional[str] = Header(default=None),
+    rate=Depends(rate_limit_export),
+):
+    _require_db()
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    filters = {"actor": actor, "action": action, "resource": resource, "start": start, "end": end}
+    # Exports are themselves audited
+    await db.audit_log(
+        actor=db.mask_token(authorization),
+        actor_type=("token" if authorization else None),
+        action="audit_export",
+        resource="audit_log",
+        details={"format": format, **{k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in filters.items()}},
+    )
+    if format == "csv":
+        return StreamingResponse(
+            audit.export_csv(**filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=audit.csv"},
+        )
+    return StreamingResponse(
+        audit.export_ndjson(**filters),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=audit.ndjson"},
+    )
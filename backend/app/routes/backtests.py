@@ -1,9 +1,12 @@
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 from ..settings import settings
 from ..schemas import Trade
+from .. import db
+from .. import trades as trades_store
+from ..pagination import InvalidCursor
 
 router = APIRouter(prefix="/api/backtests", tags=["backtests"])
 
@@ -114,10 +117,27 @@ def export_backtest_csv(backtest_id: str):
 
 
 # ---------------------------------------------------------------------------
-# Backtest trades (mock/demo): return Trade[] to integrate with Recent Trades
+# Trades for a pair: executions from the DB (keyset paged like /api/activity/trades),
+# or mock/demo Trade[] when no DB is configured
 # ---------------------------------------------------------------------------
 @router.get("/{pair}/trades", response_model=List[Trade])
-def get_backtest_trades_for_pair(pair: str, limit: int = 10) -> List[Trade]:
+async def get_backtest_trades_for_pair(
+    pair: str,
+    response: Response,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    strategy: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    if db.get_pool() is not None:
+        try:
+            items, next_cursor = await trades_store.fetch_page(limit, cursor, pair, strategy, start, end)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return items
     now = datetime.utcnow()
     items: List[Trade] = []
     for i in range(limit):
@@ -1,34 +1,56 @@
-from fastapi import APIRouter, Depends, Header
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from ..schemas import BotStatus, SimpleResult, LogEntry
 from .. import db
+from .. import log_buffer
 from prometheus_client import Gauge
 from ..ratelimit import rate_limit_control
 from .. import hyperliquid_live
+from .. import pnl
+from .. import kill_switch
+from ..kill_switch import KILL_SWITCH_GAUGE
+from ..settings import settings
+from ..shared_state import SharedDict
 
 router = APIRouter(prefix="/api/bot", tags=["bot"])
 
-# In-memory state for demo
-STATE: Dict[str, Any] = {
+# Bot control state, shared across workers (see shared_state)
+STATE = SharedDict("bot", {
     "isRunning": False,
     "currentStrategy": None,
     "strategyParams": {},
     "config": {},
     "startTime": None,
     "killSwitch": False,
-}
+})
 
-LOGS: List[LogEntry] = []
+# Bounded, indexed by level; ids are sequence numbers (see log_buffer)
+LOGS = log_buffer.LogRing(settings.BOT_LOG_CAPACITY)
 
-# Prometheus gauges for operational state
-KILL_SWITCH_GAUGE = Gauge("kill_switch_enabled", "1 when kill switch is enabled, else 0")
-BOT_PNL_USD_GAUGE = Gauge("bot_pnl_usd", "Latest reported PnL in USD (demo value)")
+# Prometheus gauges for operational state (kill_switch_enabled lives in kill_switch)
+BOT_PNL_USD_GAUGE = Gauge("bot_pnl_usd", "Latest reported PnL in USD (realized + unrealized)")
 # initialize
 KILL_SWITCH_GAUGE.set(1 if STATE.get("killSwitch") else 0)
 BOT_PNL_USD_GAUGE.set(0)
 
 
+# Any write to STATE["killSwitch"] (route, shared-state reload, tests) drives the local flag
+STATE.on_change(lambda key, value: kill_switch.apply(bool(value)) if key == "killSwitch" else None)
+
+
+def _on_remote_kill_switch(enabled: bool) -> None:
+    # Engaged from another process: halt the live controller if it runs here
+    if enabled:
+        asyncio.get_running_loop().create_task(hyperliquid_live.stop())
+        LOGS.add("warn", "kill switch enabled remotely; bot stopped")
+
+
+kill_switch.add_listener(_on_remote_kill_switch)
+
+
 def get_auth(authorization: Optional[str] = Header(default=None)):
     # Accept Bearer and cookies (no validation for demo)
     return authorization
@@ -36,9 +58,11 @@ def get_auth(authorization: Optional[str] = Header(default=None)):
 
 @router.get("/status", response_model=BotStatus)
 def get_status(auth=Depends(get_auth)):
-    # demo PnL remains 0 for now; export to metrics as well
-    pnl_val = 0
+    # Cached aggregates from the PnL engine (marked on its refresh tick)
+    summary = pnl.engine.summary()
+    pnl_val = summary["total"]
     BOT_PNL_USD_GAUGE.set(pnl_val)
+    equity = settings.PNL_STARTING_EQUITY_USD
     return BotStatus(
         isRunning=bool(STATE["isRunning"]) or hyperliquid_live.is_running(),
         currentStrategy=STATE.get("currentStrategy"),
@@ -46,10 +70,10 @@ def get_status(auth=Depends(get_auth)):
         startTime=STATE.get("startTime"),
         tradingEnabled=STATE.get("config", {}).get("tradingEnabled", True),
         pnl=pnl_val,
-        pnlPercentage=0,
-        tradesCount=0,
-        winRate=0,
-        assets={},
+        pnlPercentage=(pnl_val / equity * 100.0) if equity else 0,
+        tradesCount=summary["tradesCount"],
+        winRate=summary["winRate"],
+        assets=summary["positions"],
         lastUpdated=datetime.utcnow().isoformat() + "Z",
         version="test",
         exchange="TEST",
@@ -71,7 +95,7 @@ def set_config(cfg: Dict[str, Any], auth=Depends(get_auth), rate=Depends(rate_li
 @router.post("/start", response_model=SimpleResult)
 async def start_bot(payload: Dict[str, Any], auth=Depends(get_auth), rate=Depends(rate_limit_control)):
     # Enforce kill switch
-    if STATE.get("killSwitch"):
+    if kill_switch.is_engaged():
         return SimpleResult(success=False, message="kill switch enabled; cannot start")
     # Attempt to start live controller (no-op if already running)
     started = False
@@ -85,7 +109,7 @@ async def start_bot(payload: Dict[str, Any], auth=Depends(get_auth), rate=Depend
     STATE["currentStrategy"] = payload.get("strategy")
     STATE["strategyParams"] = payload.get("params", {})
     STATE["startTime"] = datetime.utcnow().isoformat() + "Z"
-    LOGS.append(LogEntry(id=str(len(LOGS)+1), level="info", message="bot started", timestamp=datetime.utcnow().isoformat()+"Z"))
+    LOGS.add("info", "bot started")
     return SimpleResult(success=True, message=("bot started" if started else "bot already running"))
 
 
@@ -95,7 +119,7 @@ async def stop_bot(auth=Depends(get_auth), rate=Depends(rate_limit_control)):
         await hyperliquid_live.stop()
     finally:
         STATE["isRunning"] = False
-        LOGS.append(LogEntry(id=str(len(LOGS)+1), level="info", message="bot stopped", timestamp=datetime.utcnow().isoformat()+"Z"))
+        LOGS.add("info", "bot stopped")
     return SimpleResult(success=True, message="bot stopped")
 
 
@@ -111,13 +135,13 @@ async def emergency_stop(auth=Depends(get_auth), rate=Depends(rate_limit_control
         await hyperliquid_live.stop()
     finally:
         STATE["isRunning"] = False
-        LOGS.append(LogEntry(id=str(len(LOGS)+1), level="warn", message="EMERGENCY STOP invoked; live controller halted", timestamp=datetime.utcnow().isoformat()+"Z"))
+        LOGS.add("warn", "EMERGENCY STOP invoked; live controller halted")
     return SimpleResult(success=True, message="emergency stop executed")
 
 
 @router.get("/kill-switch")
 def get_kill_switch(auth=Depends(get_auth)):
-    return {"enabled": bool(STATE.get("killSwitch", False))}
+    return {"enabled": kill_switch.is_engaged()}
 
 
 @router.post("/kill-switch", response_model=SimpleResult)
@@ -129,7 +153,8 @@ async def set_kill_switch(
 ):
     enabled = bool(payload.get("enabled", False))
     STATE["killSwitch"] = enabled
-    KILL_SWITCH_GAUGE.set(1 if enabled else 0)
+    # Other workers/nodes flip their local flag on push
+    await kill_switch.publish(enabled)
     if enabled:
         # Stop live controller and mark state
         try:
@@ -137,7 +162,7 @@ async def set_kill_switch(
         except Exception:
             pass
         STATE["isRunning"] = False
-        LOGS.append(LogEntry(id=str(len(LOGS)+1), level="warn", message="kill switch enabled; bot stopped", timestamp=datetime.utcnow().isoformat()+"Z"))
+        LOGS.add("warn", "kill switch enabled; bot stopped")
     # Audit (best-effort)
     await db.audit_log(
         actor=db.mask_token(authorization),
@@ -149,9 +174,85 @@ async def set_kill_switch(
     return SimpleResult(success=True, message=f"kill switch {'enabled' if enabled else 'disabled'}")
 
 
+def _parse_seq(value: Optional[str]) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        seq = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return seq
+
+
 @router.get("/logs", response_model=List[LogEntry])
-def get_logs(limit: int = 100, level: Optional[str] = None, auth=Depends(get_auth)):
-    items = LOGS[-limit:]
-    if level:
-        items = [l for l in items if l.level == level]
+async def get_logs(
+    response: Response,
+    limit: int = 100,
+    level: Optional[str] = None,
+    cursor: Optional[str] = None,
+    after: Optional[str] = None,
+    auth=Depends(get_auth),
+):
+    # Newest `limit` entries (of `level`) older than `cursor`, oldest first; the cursor for the
+    # next older page goes in X-Next-Cursor. `after` pages forward from a seen id instead.
+    before = _parse_seq(cursor)
+    since = _parse_seq(after)
+    limit = max(1, min(limit, 1000))
+    if since is None and before is not None and before <= LOGS.first_seq and log_buffer.spill_enabled():
+        items, next_cursor = await log_buffer.fetch_spilled(limit, level=level, before=before)
+    else:
+        items, next_cursor = LOGS.page(limit, level=level, before=before, after=since)
+        if next_cursor is None and since is None and log_buffer.spill_enabled() and LOGS.first_seq > 1:
+            # the ring is exhausted but older entries were spilled to the DB
+            next_cursor = int(items[0].id) if items else LOGS.first_seq
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     return items
+
+
+def _sse_event(entry: LogEntry) -> str:
+    return f"id: {entry.id}\nevent: log\ndata: {entry.model_dump_json(exclude_none=True)}\n\n"
+
+
+@router.get("/logs/stream")
+async def stream_logs(
+    request: Request,
+    level: Optional[str] = None,
+    after: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None),
+    auth=Depends(get_auth),
+):
+    # Live tail as server-sent events; a reconnect with Last-Event-ID (or ?after=) first
+    # replays what the ring still holds after that id
+    since = _parse_seq(last_event_id if last_event_id is not None else after)
+    # subscribe before snapshotting: the queue then holds exactly the entries after `last`
+    queue = LOGS.subscribe()
+    last = LOGS.last_seq
+
+    async def gen():
+        try:
+            cursor = since
+            while cursor is not None and cursor < last:
+                items, _ = LOGS.page(500, level=level, after=cursor)
+                items = [e for e in items if int(e.id) <= last]
+                for entry in items:
+                    yield _sse_event(entry)
+                if len(items) < 500:
+                    break
+                cursor = int(items[-1].id)
+            while True:
+                try:
+                    entry = await asyncio.wait_for(queue.get(), timeout=settings.SSE_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if level is None or entry.level == level:
+                    yield _sse_event(entry)
+        finally:
+            LOGS.unsubscribe(queue)
+
+    return StreamingResponse(gen(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List, Dict, Any, Optional
 import os
 import json
@@ -6,6 +6,8 @@ import glob
 import time
 from ..settings import settings
 from ..auth import require_auth
+from .. import hyperliquid_live
+from .. import quote_ingest
 
 router = APIRouter(prefix="/api/live", tags=["live"], dependencies=[Depends(require_auth)])
 
@@ -74,6 +76,25 @@ async def get_quotes(limit: int = Query(default=200, ge=1, le=5000), venues: Opt
     return {"items": rows, "file": os.path.basename(fp)}
 
 
+@router.post("/quotes")
+async def ingest_quotes(request: Request):
+    # Batched quotes (NDJSON or msgpack) straight into the in-process quote store
+    ctype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = quote_ingest.CONTENT_TYPES.get(ctype)
+    if fmt is None or (fmt == quote_ingest.MSGPACK and not quote_ingest.msgpack_available()):
+        raise HTTPException(status_code=415, detail="send application/x-ndjson or application/msgpack")
+    limit = settings.QUOTE_INGEST_MAX_BYTES
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise HTTPException(status_code=413, detail="batch too large")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail="batch too large")
+    accepted, rejected = quote_ingest.ingest_body(bytes(body), fmt)
+    return {"accepted": accepted, "rejected": rejected}
+
+
 @router.get("/top-spread")
 async def get_top_spread(lookback_ms: int = Query(default=5000, ge=500), pairs: Optional[str] = None):
     fp = _latest_ndjson_path()
@@ -145,3 +166,9 @@ async def get_status():
         return {"status": data, "file": os.path.basename(sp)}
     except Exception:
         return {"status": None, "file": os.path.basename(sp)}
+
+
+@router.get("/collectors")
+async def get_collectors():
+    # Supervised collector shards: state, pid, restarts, quote freshness
+    return {"running": hyperliquid_live.is_running(), "shards": hyperliquid_live.health()}
@@ -4,16 +4,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from ..auth import require_auth
 from .. import exchange_client
+from .. import order_store
+from ..ratelimit import rate_limit_orders
 from .risk import enforce_order_risk
-from .bot import STATE  # reuse kill switch state
+from .. import kill_switch
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])  
 
 
 @router.post("/place")
-async def place_order(payload: Dict[str, Any], auth=Depends(require_auth)):
+async def place_order(payload: Dict[str, Any], auth=Depends(require_auth), rate=Depends(rate_limit_orders)):
     # Kill switch enforcement
-    if bool(STATE.get("killSwitch")):
+    if kill_switch.is_engaged():
         raise HTTPException(status_code=status.HTTP_423_LOCKED, detail="kill switch enabled")
 
     # Extract inputs
@@ -22,6 +24,9 @@ async def place_order(payload: Dict[str, Any], auth=Depends(require_auth)):
     qty: float = float(payload.get("qty", 0))
     price: Optional[float] = payload.get("price")
     order_type: str = str(payload.get("type", "market"))
+    strategy: Optional[str] = str(payload.get("strategy") or "").strip() or None
+    # Idempotency key: callers may supply one to make their own retries safe
+    client_order_id: str = str(payload.get("clientOrderId") or "").strip() or exchange_client.new_client_order_id()
 
     # Risk inputs (should be provided by pre-trade checks)
     notional_usd: float = float(payload.get("notionalUsd", 0))
@@ -36,6 +41,17 @@ async def place_order(payload: Dict[str, Any], auth=Depends(require_auth)):
     if not ok:
         raise HTTPException(status_code=400, detail=f"risk check failed: {reason}")
 
+    # Record locally; persistence happens in the background write-behind queue
+    order_store.record_new(
+        client_order_id,
+        symbol=symbol,
+        side=side,
+        quantity=qty,
+        price=float(price) if price is not None else None,
+        notional_usd=notional_usd or None,
+        strategy=strategy,
+    )
+
     # Place via exchange client
     client = exchange_client.get_exchange_client()
     try:
@@ -45,8 +61,15 @@ async def place_order(payload: Dict[str, Any], auth=Depends(require_auth)):
             qty=qty,
             price=float(price) if price is not None else None,
             type_=order_type,
+            client_order_id=client_order_id,
         )
-        return {"success": True, "order": result}
+        order_store.record_ack(client_order_id, result)
+        return {"success": True, "clientOrderId": client_order_id, "order": result}
+    except exchange_client.OutcomeUnknown as e:
+        # The venue may hold the order: keep it open for reconciliation, never "rejected"
+        order_store.update_status(client_order_id, "unknown", error=str(e))
+        raise HTTPException(status_code=504, detail=str(e))
     except RuntimeError as e:
         # Circuit open / retries exhausted
+        order_store.update_status(client_order_id, "rejected", error=str(e))
         raise HTTPException(status_code=503, detail=str(e))
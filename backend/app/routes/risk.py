@@ -2,22 +2,23 @@ from typing import Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Header
 from ..settings import settings
 from .. import db
+from ..shared_state import SharedDict
 
 router = APIRouter(prefix="/api/trading", tags=["risk"]) 
 
-# In-memory risk limits; in production, persist in DB or config service
-RISK_LIMITS: Dict[str, Any] = {
+# Risk limits, shared across workers (see shared_state)
+RISK_LIMITS = SharedDict("risk", {
     "maxNotionalPerTradeUsd": settings.MAX_NOTIONAL_PER_TRADE_USD,
     "maxOpenPositions": settings.MAX_OPEN_POSITIONS,
     "maxDailyPnlDrawdownUsd": settings.MAX_DAILY_PNL_DRAWDOWN_USD,
     "maxSlippageBps": settings.MAX_SLIPPAGE_BPS,
     "minOrderbookLiquidityUsd": settings.MIN_ORDERBOOK_LIQUIDITY_USD,
-}
+})
 
 
 @router.get("/risk/limits")
 async def get_risk_limits():
-    return RISK_LIMITS
+    return dict(RISK_LIMITS)
 
 
 @router.post("/risk/limits")
@@ -42,7 +43,7 @@ async def update_risk_limits(payload: Dict[str, Any], authorization: Optional[st
         resource="risk_limits",
         details={"updated": payload},
     )
-    return {"success": True, "message": "risk limits updated", "limits": RISK_LIMITS}
+    return {"success": True, "message": "risk limits updated", "limits": dict(RISK_LIMITS)}
 
 
 # Example enforcement helper (to be used in order placement path)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from .. import db
+from .. import rollups
+from ..settings import settings
+
+router = APIRouter(prefix="/api/rollups", tags=["rollups"])
+
+
+def _utc(at: datetime) -> datetime:
+    return at.astimezone(timezone.utc) if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+def _window(start: Optional[datetime], end: Optional[datetime], max_points: Optional[int]):
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    points = max_points or settings.ROLLUP_MAX_POINTS
+    if points <= 0:
+        raise HTTPException(status_code=400, detail="maxPoints must be positive")
+    return start, end, rollups.pick_bucket(start, end, points)
+
+
+def _require_db() -> None:
+    if db.get_pool() is None:
+        raise HTTPException(status_code=503, detail="database not configured")
+
+
+@router.get("/volume")
+async def get_volume(
+    symbol: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    maxPoints: Optional[int] = None,
+) -> Dict[str, Any]:
+    _require_db()
+    start, end, bucket = _window(start, end, maxPoints)
+    points = await rollups.volume(start, end, bucket, symbol)
+    return {"bucket": bucket, "symbol": symbol, "points": points}
+
+
+@router.get("/pnl")
+async def get_pnl(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    maxPoints: Optional[int] = None,
+) -> Dict[str, Any]:
+    _require_db()
+    start, end, bucket = _window(start, end, maxPoints)
+    points = await rollups.pnl_series(start, end, bucket)
+    return {"bucket": bucket, "points": points}
@@ -2,11 +2,18 @@ from fastapi import APIRouter, HTTPException
 from typing import Dict, List, Any
 from datetime import datetime
 from ..schemas import Strategy, StrategyParameter
+from ..shared_state import SharedDict
 
 router = APIRouter(prefix="/api/strategies", tags=["strategies"])
 
-# In-memory strategy store
-STRATS: Dict[str, Strategy] = {}
+# Strategy store, shared across workers (see shared_state); the seed below is only
+# written to the backend when the namespace is empty, so deleting it sticks
+STRATS = SharedDict(
+    "strategies",
+    encode=lambda s: s.model_dump(),
+    decode=lambda d: Strategy(**d),
+    seed_per_key=False,
+)
 
 # Seed one
 if not STRATS:
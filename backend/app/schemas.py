@@ -72,3 +72,15 @@ class LogEntry(BaseModel):
     context: Optional[Dict[str, Any]] = None
     stack: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+
+class AuditEntry(BaseModel):
+    id: str
+    at: str
+    actor: Optional[str] = None
+    actorType: Optional[str] = None
+    action: str
+    resource: Optional[str] = None
+    resourceId: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
+    ip: Optional[str] = None
+    userAgent: Optional[str] = None
@@ -0,0 +1,564 @@
+"""Control state shared between uvicorn workers (and nodes).
+
+``SharedDict`` is a ``MutableMapping`` used for ``bot.STATE``,
+``risk.RISK_LIMITS`` and ``strategies.STRATS``. Reads always come from an
+in-process cache; writes go to the cache and through to a backend, which tells
+the other processes to reload the namespace:
+
+``memory``   one process only (the default, same behaviour as a plain dict)
+``sqlite``   one host: a WAL-mode SQLite file; a watcher thread notices commits
+             from other processes via ``PRAGMA data_version`` (no I/O when idle)
+``postgres`` several nodes: a ``shared_state`` table and ``LISTEN/NOTIFY``
+
+Shared backends also implement the GCRA rate-limit step atomically so limits
+hold across workers, on connections of their own so limiter checks never queue
+behind state writes. Values are stored as JSON; a dict can pass an encode/decode
+pair for non-JSON values (e.g. pydantic models).
+
+With an event loop running, writes to a shared backend are handed to one writer
+thread (in order) instead of blocking the loop. Change notifications arrive on
+the backend's watcher thread, which reads the namespace there and hands the
+new contents to the loop, so caches and ``on_change`` hooks only ever change on
+the loop thread.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .settings import settings
+
+try:
+    import psycopg  # type: ignore
+except Exception:  # pragma: no cover
+    psycopg = None  # type: ignore
+
+try:
+    from psycopg_pool import ConnectionPool  # type: ignore
+except Exception:  # pragma: no cover
+    ConnectionPool = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+SHARED_STATE_RELOADS = Counter(
+    "shared_state_reloads_total",
+    "Namespace reloads triggered by change notifications from other processes",
+    ["namespace"],
+)
+SHARED_STATE_WRITES = Counter("shared_state_writes_total", "Writes through to the shared-state backend", ["namespace"])
+
+ChangeCallback = Callable[[str], None]
+_NOTIFY_CHANNEL = "shared_state"
+_STOP_PAYLOAD = "__stop__"
+ALL_NAMESPACES = "*"
+
+
+class MemoryBackend:
+    name = "memory"
+    shared = False
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Dict[str, str]] = {}
+
+    def load(self, ns: str) -> Dict[str, str]:
+        return dict(self._data.get(ns, {}))
+
+    def put(self, ns: str, key: str, raw: str) -> None:
+        self._data.setdefault(ns, {})[key] = raw
+
+    def put_default(self, ns: str, key: str, raw: str) -> None:
+        self._data.setdefault(ns, {}).setdefault(key, raw)
+
+    def delete(self, ns: str, key: str) -> None:
+        self._data.get(ns, {}).pop(key, None)
+
+    def watch(self, on_change: ChangeCallback) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteBackend:
+    """Single-host backend: one WAL-mode SQLite file shared by every worker."""
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str, poll_ms: int = 20):
+        self.path = path
+        self.poll = max(1, poll_ms) / 1000.0
+        self._conn = self._connect()
+        self._lock = threading.Lock()
+        # the rate limiter has its own connection so checks do not wait on state writes
+        self._rl_conn = self._connect()
+        self._rl_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._gcra_calls = 0
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS kv (
+                  ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (ns, key)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS ns_version (ns TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID;
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, ns: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM kv WHERE ns = ?", (ns,)).fetchall()
+        return {k: v for k, v in rows}
+
+    def _write(self, ns: str, sql: str, params: Tuple[Any, ...]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(sql, params)
+                if cur.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO ns_version (ns, version) VALUES (?, 1) "
+                        "ON CONFLICT (ns) DO UPDATE SET version = version + 1",
+                        (ns,),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put(self, ns: str, key: str, raw: str) -> None:
+        self._write(ns, "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value", (ns, key, raw))
+
+    def put_default(self, ns: str, key: str, raw: str) -> None:
+        self._write(ns, "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) ON CONFLICT DO NOTHING", (ns, key, raw))
+
+    def delete(self, ns: str, key: str) -> None:
+        self._write(ns, "DELETE FROM kv WHERE ns = ? AND key = ?", (ns, key))
+
+    def watch(self, on_change: ChangeCallback) -> None:
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(on_change,), name="shared-state-sqlite", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, on_change: ChangeCallback) -> None:
+        conn = self._connect()
+        # start from nothing seen: one reload of every namespace covers writes made before the thread ran
+        seen: Dict[str, int] = {}
+        data_version = None
+        try:
+            while not self._stop.wait(self.poll):
+                # data_version only moves when another connection commits; reading it is a shared-memory check
+                dv = conn.execute("PRAGMA data_version").fetchone()[0]
+                if dv == data_version:
+                    continue
+                data_version = dv
+                for ns, version in conn.execute("SELECT ns, version FROM ns_version").fetchall():
+                    if seen.get(ns) != version:
+                        seen[ns] = version
+                        on_change(ns)
+        except Exception as e:  # pragma: no cover
+            _logger.warning("shared state: sqlite watcher stopped: %s", e)
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=2)
+            self._watcher = None
+        with self._lock:
+            self._conn.close()
+        with self._rl_lock:
+            self._rl_conn.close()
+
+    def _gcra_sync(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        now = time.time()
+        with self._rl_lock:
+            row = self._rl_conn.execute(
+                "INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tat = max(tat, ?) + ? WHERE max(tat, ?) - ? <= ? "
+                "RETURNING tat",
+                (key, now + interval, now, interval, now, now, tolerance),
+            ).fetchone()
+            if row is None:
+                tat = self._rl_conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+                return False, max(0.0, tat - now - tolerance)
+            self._gcra_calls += 1
+            if self._gcra_calls % 1000 == 0:
+                # a key whose TAT has passed is the same as no key
+                self._rl_conn.execute("DELETE FROM rate_limits WHERE tat < ?", (now,))
+        return True, 0.0
+
+    async def gcra(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        return await asyncio.to_thread(self._gcra_sync, key, interval, tolerance)
+
+
+class PostgresBackend:
+    """Multi-node backend: ``shared_state`` rows plus ``NOTIFY shared_state, '<namespace>'``.
+
+    State reads and writes share one pooled connection, checked before each use
+    and replaced when the database has dropped it. The LISTEN connection is
+    re-established with backoff after an error, followed by a reload of every
+    namespace, since notifications sent while it was down are lost.
+    """
+
+    name = "postgres"
+    shared = True
+
+    def __init__(self, url: str, limiter_pool_size: int = 4):
+        if psycopg is None or ConnectionPool is None:  # pragma: no cover
+            raise RuntimeError("psycopg and psycopg-pool are required for the postgres shared-state backend")
+        self.url = url
+        # a pool of one: writes stay serialized, and a dead connection is replaced on checkout
+        self._state = ConnectionPool(
+            url, min_size=1, max_size=1, kwargs={"autocommit": True}, check=ConnectionPool.check_connection, open=True
+        )
+        # limiter checks run concurrently on their own pool, never on the state connection
+        self._limiter = ConnectionPool(
+            url, min_size=1, max_size=max(1, limiter_pool_size), kwargs={"autocommit": True}, open=True
+        )
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._gcra_calls = 0
+        with self._state.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                " ns text NOT NULL, key text NOT NULL, value jsonb NOT NULL,"
+                " updated_at timestamptz NOT NULL DEFAULT now(), PRIMARY KEY (ns, key))"
+            )
+            conn.execute(
+                "CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (key text PRIMARY KEY, tat double precision NOT NULL)"
+            )
+
+    def load(self, ns: str) -> Dict[str, str]:
+        with self._state.connection() as conn:
+            rows = conn.execute("SELECT key, value::text FROM shared_state WHERE ns = %s", (ns,)).fetchall()
+        return {k: v for k, v in rows}
+
+    def _write(self, ns: str, sql: str, params: Tuple[Any, ...]) -> None:
+        with self._state.connection() as conn:
+            # NOTIFY is delivered at commit, together with the write
+            with conn.transaction():
+                cur = conn.execute(sql, params)
+                if cur.rowcount:
+                    conn.execute("SELECT pg_notify(%s, %s)", (_NOTIFY_CHANNEL, ns))
+
+    def put(self, ns: str, key: str, raw: str) -> None:
+        self._write(ns, "INSERT INTO shared_state (ns, key, value) VALUES (%s, %s, %s::jsonb) "
+                        "ON CONFLICT (ns, key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()",
+                    (ns, key, raw))
+
+    def put_default(self, ns: str, key: str, raw: str) -> None:
+        self._write(ns, "INSERT INTO shared_state (ns, key, value) VALUES (%s, %s, %s::jsonb) "
+                        "ON CONFLICT DO NOTHING", (ns, key, raw))
+
+    def delete(self, ns: str, key: str) -> None:
+        self._write(ns, "DELETE FROM shared_state WHERE ns = %s AND key = %s", (ns, key))
+
+    def watch(self, on_change: ChangeCallback) -> None:
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(on_change,), name="shared-state-pg", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, on_change: ChangeCallback) -> None:
+        delay = 0.5
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.url, autocommit=True) as conn:  # type: ignore[union-attr]
+                    conn.execute(f"LISTEN {_NOTIFY_CHANNEL}")
+                    # anything written before LISTEN (at bind, or while reconnecting) would otherwise be missed
+                    on_change(ALL_NAMESPACES)
+                    delay = 0.5
+                    for n in conn.notifies():
+                        if n.payload == _STOP_PAYLOAD:
+                            if self._stop.is_set():
+                                return
+                            continue  # another process shutting down
+                        on_change(n.payload)
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                _logger.warning("shared state: LISTEN connection lost (%s); reconnecting in %.1fs", e, delay)
+            if self._stop.wait(delay):
+                return
+            delay = min(delay * 2, 10.0)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            # wake the blocking notifies() loop
+            try:
+                with self._state.connection(timeout=2) as conn:
+                    conn.execute("SELECT pg_notify(%s, %s)", (_NOTIFY_CHANNEL, _STOP_PAYLOAD))
+            except Exception as e:
+                _logger.warning("shared state: cannot wake the LISTEN watcher: %s", e)
+            self._watcher.join(timeout=2)
+            self._watcher = None
+        self._limiter.close()
+        self._state.close()
+
+    def _gcra_sync(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        # the database clock is the only clock all nodes agree on
+        sql = (
+            "WITH n AS (SELECT extract(epoch FROM clock_timestamp())::float8 AS now) "
+            "INSERT INTO rate_limits AS r (key, tat) SELECT %(k)s, n.now + %(i)s FROM n "
+            "ON CONFLICT (key) DO UPDATE SET tat = greatest(r.tat, (SELECT now FROM n)) + %(i)s "
+            "WHERE greatest(r.tat, (SELECT now FROM n)) - (SELECT now FROM n) <= %(t)s "
+            "RETURNING tat"
+        )
+        with self._limiter.connection() as conn:
+            row = conn.execute(sql, {"k": key, "i": interval, "t": tolerance}).fetchone()
+            if row is None:
+                tat, now = conn.execute(
+                    "SELECT tat, extract(epoch FROM clock_timestamp())::float8 FROM rate_limits WHERE key = %s", (key,)
+                ).fetchone()
+                return False, max(0.0, tat - now - tolerance)
+            self._gcra_calls += 1
+            if self._gcra_calls % 1000 == 0:
+                conn.execute("DELETE FROM rate_limits WHERE tat < extract(epoch FROM clock_timestamp())")
+        return True, 0.0
+
+    async def gcra(self, key: str, interval: float, tolerance: float) -> Tuple[bool, float]:
+        return await asyncio.to_thread(self._gcra_sync, key, interval, tolerance)
+
+
+class SharedDict(MutableMapping):
+    """Dict-like view of one namespace: local cache, write-through, reload on change.
+
+    Until ``shared_state.start()`` binds it, it behaves as a plain dict; at bind
+    time its current contents are seeded into the backend (per key, or only when
+    the namespace is empty with ``seed_per_key=False``) and the cache is reloaded.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        initial: Optional[Dict[str, Any]] = None,
+        *,
+        encode: Callable[[Any], Any] = lambda v: v,
+        decode: Callable[[Any], Any] = lambda v: v,
+        seed_per_key: bool = True,
+    ):
+        self.namespace = namespace
+        self._encode = encode
+        self._decode = decode
+        self._seed_per_key = seed_per_key
+        self._cache: Dict[str, Any] = dict(initial or {})
+        self._backend: Optional[Any] = None
+        self._hooks: List[Callable[[str, Any], None]] = []
+        # writes handed to the writer thread and not yet landed; a reload read while any
+        # are pending may predate them, so it is deferred until they land
+        self._pending = 0
+        self._stale = False
+        _dicts[namespace] = self
+
+    # hot path: plain dict reads
+    def __getitem__(self, key: str) -> Any:
+        return self._cache[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._cache))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._cache
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._cache[key] = value
+        if self._backend is not None:
+            self._write_through(self._backend.put, key, json.dumps(self._encode(value)))
+            SHARED_STATE_WRITES.labels(self.namespace).inc()
+        self._fire(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        del self._cache[key]
+        if self._backend is not None:
+            self._write_through(self._backend.delete, key)
+            SHARED_STATE_WRITES.labels(self.namespace).inc()
+        self._fire(key, None)
+
+    def __repr__(self) -> str:
+        return f"SharedDict({self.namespace!r}, {self._cache!r})"
+
+    def _write_through(self, op: Callable[..., None], *args: Any) -> None:
+        fut = _write(self._backend, op, self.namespace, *args)
+        if fut is not None:
+            self._pending += 1
+            loop = asyncio.get_running_loop()
+            fut.add_done_callback(lambda f: loop.call_soon_threadsafe(self._write_landed, f))
+
+    def _write_landed(self, fut: "Future[None]") -> None:
+        self._pending -= 1
+        e = fut.exception()
+        if e is not None:
+            _logger.warning("shared state: %s write failed: %s", self.namespace, e)
+        if self._pending == 0 and self._stale:
+            self._stale = False
+            if _writer is not None:
+                _writer.submit(_on_change, self.namespace)
+            else:
+                self.reload()
+
+    def on_change(self, fn: Callable[[str, Any], None]) -> None:
+        """Call ``fn(key, value)`` on every local write and every remote change seen on reload."""
+        self._hooks.append(fn)
+
+    def _fire(self, key: str, value: Any) -> None:
+        for fn in self._hooks:
+            try:
+                fn(key, value)
+            except Exception as e:
+                _logger.warning("shared state: %s hook failed: %s", self.namespace, e)
+
+    def bind(self, backend: Any) -> None:
+        self._backend = backend
+        if self._seed_per_key or not backend.load(self.namespace):
+            for key, value in self._cache.items():
+                backend.put_default(self.namespace, key, json.dumps(self._encode(value)))
+        self.reload()
+
+    def reload(self) -> None:
+        """Replace the cache from the backend (atomic swap) and fire hooks for changed keys."""
+        fresh = self._load()
+        if fresh is not None:
+            self._apply(fresh)
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        backend = self._backend
+        if backend is None:
+            return None
+        return {k: self._decode(json.loads(v)) for k, v in backend.load(self.namespace).items()}
+
+    def _apply(self, fresh: Dict[str, Any]) -> None:
+        if self._backend is None:
+            return
+        if self._pending:
+            self._stale = True
+            return
+        old, self._cache = self._cache, fresh
+        for key in set(old) | set(fresh):
+            if old.get(key) != fresh.get(key):
+                self._fire(key, fresh.get(key))
+
+
+_dicts: Dict[str, SharedDict] = {}
+_backend: Optional[Any] = None
+# one thread, so writes reach the backend in the order they were made
+_writer: Optional[ThreadPoolExecutor] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _write(backend: Any, op: Callable[..., None], *args: Any) -> "Optional[Future[None]]":
+    """Hand a backend write to the writer thread when called on a running loop (returns
+    its future); run it inline otherwise."""
+    if backend.shared and _writer is not None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            return _writer.submit(op, *args)
+    op(*args)
+    return None
+
+
+def _create_backend() -> Any:
+    kind = (settings.SHARED_STATE_BACKEND or "memory").lower()
+    if kind == "sqlite":
+        return SqliteBackend(settings.SHARED_STATE_SQLITE_PATH, poll_ms=settings.SHARED_STATE_POLL_MS)
+    if kind == "postgres":
+        url = settings.SHARED_STATE_URL or settings.DATABASE_URL
+        if not url:
+            raise RuntimeError("SHARED_STATE_BACKEND=postgres needs SHARED_STATE_URL or DATABASE_URL")
+        return PostgresBackend(url, limiter_pool_size=settings.SHARED_STATE_LIMITER_POOL_SIZE)
+    return MemoryBackend()
+
+
+def get_backend() -> Optional[Any]:
+    """The started backend, or None before ``start()``."""
+    return _backend
+
+
+def _on_change(ns: str) -> None:
+    """Watcher-thread callback: read the namespace here, swap it in on the loop thread."""
+    targets = list(_dicts.values()) if ns == ALL_NAMESPACES else [d for d in (_dicts.get(ns),) if d is not None]
+    for d in targets:
+        SHARED_STATE_RELOADS.labels(d.namespace).inc()
+        try:
+            fresh = d._load()
+        except Exception as e:
+            _logger.warning("shared state: reload of %s failed: %s", d.namespace, e)
+            continue
+        if fresh is None:
+            continue
+        loop = _loop
+        if loop is None:
+            d._apply(fresh)
+            continue
+        try:
+            loop.call_soon_threadsafe(d._apply, fresh)
+        except RuntimeError:
+            return  # loop closed: shutting down
+
+
+def start(backend: Optional[Any] = None) -> Any:
+    """Bind every SharedDict to the configured backend and start change notifications.
+
+    Called on the event loop, reloads and hooks from the watcher run on that loop.
+    """
+    global _backend, _writer, _loop
+    if _backend is None:
+        _backend = backend or _create_backend()
+        try:
+            _loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _loop = None
+        if _backend.shared:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state-writer")
+        for d in list(_dicts.values()):
+            d.bind(_backend)
+        _backend.watch(_on_change)
+        _logger.info("shared state: %s backend", _backend.name)
+    return _backend
+
+
+def stop() -> None:
+    global _backend, _writer, _loop
+    if _writer is not None:
+        # pending writes land before the backend closes
+        _writer.shutdown(wait=True)
+        _writer = None
+    _loop = None
+    if _backend is not None:
+        try:
+            _backend.close()
+        finally:
+            for d in _dicts.values():
+                d._backend = None
+            _backend = None
@@ -0,0 +1,190 @@
+"""One producer fanning trade events out to every SSE subscriber.
+
+Each fill recorded by ``order_store`` becomes one trade event. It is encoded
+once, as a complete SSE frame, and the same bytes are queued to every
+subscriber. Events carry ids ``<boot>-<seq>``, and the last
+``TRADE_STREAM_REPLAY`` frames are kept. A client reconnecting with
+``Last-Event-ID`` (browsers send it automatically) first gets what it missed
+from that window. If the gap is older than the window, or the id is from
+another process run, it gets an ``event: reset`` frame and should refetch
+``/api/activity/trades``.
+
+A subscriber whose queue fills up (``TRADE_STREAM_QUEUE`` frames) is
+disconnected rather than allowed to slow the producer; it resumes from the
+replay window when it reconnects. Idle streams get a comment every
+``SSE_HEARTBEAT_SEC``.
+
+Fills are per process. With several workers, a stream only sees fills for
+orders placed through its own worker.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from datetime import timezone
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from .settings import settings
+from . import order_store
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+_logger = logging.getLogger("uvicorn.error")
+
+# Prometheus metrics
+TRADE_EVENTS = Counter("trade_stream_events_total", "Trade events published to SSE subscribers")
+TRADE_SUBSCRIBERS = Gauge(
+    "trade_stream_subscribers",
+    "Connected trade SSE subscribers",
+    multiprocess_mode="livesum",
+)
+TRADE_SUBSCRIBERS_DROPPED = Counter(
+    "trade_stream_subscribers_dropped_total",
+    "Trade SSE subscribers disconnected because their queue was full",
+)
+
+HEARTBEAT = b": keep-alive\n\n"
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+
+class _Subscriber:
+    __slots__ = ("queue", "lagged")
+
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+
+
+class TradeBroadcaster:
+    def __init__(self, replay: int = 1000, queue_size: int = 256):
+        self.boot = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self._seq = 0
+        self._window: Deque[Tuple[int, bytes]] = deque(maxlen=max(1, replay))
+        self._subscribers: Set[_Subscriber] = set()
+
+    @property
+    def last_id(self) -> str:
+        return f"{self.boot}-{self._seq}"
+
+    def publish(self, event: Dict[str, Any]) -> str:
+        """Encode one event once and queue it to every subscriber; returns its id."""
+        self._seq += 1
+        event_id = f"{self.boot}-{self._seq}"
+        frame = b"id: " + event_id.encode() + b"\ndata: " + _dumps(event) + b"\n\n"
+        self._window.append((self._seq, frame))
+        TRADE_EVENTS.inc()
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                sub.lagged = True
+                self._subscribers.discard(sub)
+                TRADE_SUBSCRIBERS_DROPPED.inc()
+        return event_id
+
+    def replay(self, last_event_id: Optional[str]) -> Tuple[List[bytes], bool]:
+        """Frames after ``last_event_id`` and whether the window covered the whole gap."""
+        if not last_event_id:
+            return [], True
+        boot, _, seq_s = last_event_id.rpartition("-")
+        if boot != self.boot or not seq_s.isdigit():
+            return [frame for _, frame in self._window], False
+        seq = int(seq_s)
+        if seq >= self._seq:
+            return [], True
+        oldest = self._window[0][0] if self._window else self._seq + 1
+        frames = [frame for s, frame in self._window if s > seq]
+        return frames, seq >= oldest - 1
+
+    def subscribe(self) -> _Subscriber:
+        sub = _Subscriber(self.queue_size)
+        self._subscribers.add(sub)
+        TRADE_SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber) -> None:
+        self._subscribers.discard(sub)
+        TRADE_SUBSCRIBERS.dec()
+
+    async def stream(
+        self,
+        last_event_id: Optional[str] = None,
+        is_disconnected: Optional[Callable[[], Any]] = None,
+    ) -> AsyncIterator[bytes]:
+        """SSE frames for one client: the missed events, then live ones and heartbeats."""
+        # subscribe and snapshot the window with no await in between: the queue then
+        # holds exactly the events published after the replayed ones
+        sub = self.subscribe()
+        frames, complete = self.replay(last_event_id)
+        try:
+            yield b"retry: 2000\n\n"
+            if not complete:
+                yield RESET
+            for frame in frames:
+                yield frame
+            while not sub.lagged:
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), timeout=settings.SSE_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+                    yield HEARTBEAT
+                    continue
+                yield frame
+            # too slow: drain what was queued, then end so the client resumes via Last-Event-ID
+            while not sub.queue.empty():
+                yield sub.queue.get_nowait()
+        finally:
+            self.unsubscribe(sub)
+
+
+def fill_to_trade(order: Dict[str, Any], row: Dict[str, Any]) -> Dict[str, Any]:
+    """The ``Trade`` shape served by ``/api/activity/trades`` for one recorded fill."""
+    price, qty = float(row["price"]), float(row["quantity"])
+    at = row["executed_at"]
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return {
+        "id": str(row.get("execution_id") or f"{order['client_order_id']}-{order.get('filled_qty')}"),
+        "strategy": order.get("strategy") or "manual",
+        "pair": order["symbol"],
+        "side": order["side"],
+        "amount": qty,
+        "price": price,
+        "value": qty * price,
+        "fee": float(row.get("fee_amount") or 0),
+        "feeCurrency": row.get("fee_currency") or "USD",
+        "timestamp": at.astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z",
+        "status": "closed",
+        "tags": ["live"],
+    }
+
+
+broadcaster = TradeBroadcaster(settings.TRADE_STREAM_REPLAY, settings.TRADE_STREAM_QUEUE)
+
+
+def _on_fill(order: Dict[str, Any], row: Dict[str, Any]) -> None:
+    broadcaster.publish(fill_to_trade(order, row))
+
+
+def start() -> None:
+    """Publish every fill recorded by the order store."""
+    order_store.add_fill_listener(_on_fill)
+
+
+def stop() -> None:
+    order_store.remove_fill_listener(_on_fill)
@@ -0,0 +1,96 @@
+"""Trade history read path over ``executions``.
+
+Pages are keyset ordered by ``(executed_at, id)`` descending: the cursor is the
+last row of the previous page, so page N costs the same as page 1. Filters map
+onto the covering indexes in ``db/init/01_schema.sql`` (symbol / strategy
+prefix, then the keyset columns, with the Trade fields INCLUDEd) so a page is an
+index-only range scan.
+"""
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import db
+from .pagination import decode_cursor, encode_cursor
+from .partitions import time_range
+
+MAX_PAGE = 500
+
+_COLUMNS = "e.id, e.executed_at, e.symbol, e.side, e.strategy, e.price, e.quantity, e.fee_amount, e.fee_currency"
+
+
+def build_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    strategy: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[str, List[Any]]:
+    """SQL and params for one page. Only the filters in use appear in the WHERE
+    clause so the planner can pick the matching index."""
+    where: List[str] = []
+    params: List[Any] = []
+    if symbol:
+        where.append("e.symbol = %s")
+        params.append(symbol)
+    if strategy:
+        where.append("e.strategy = %s")
+        params.append(strategy)
+    # bare range predicates on the partition key so old months are pruned
+    range_where, range_params = time_range("e.executed_at", start, end)
+    where.extend(range_where)
+    params.extend(range_params)
+    if cursor:
+        at, row_id = decode_cursor(cursor)
+        where.append("(e.executed_at, e.id) < (%s, %s::uuid)")
+        params.extend([at, row_id])
+    sql = f"SELECT {_COLUMNS} FROM executions e"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # one extra row tells us whether there is a next page
+    sql += " ORDER BY e.executed_at DESC, e.id DESC LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def _to_trade(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    row_id, at, symbol, side, strategy, price, qty, fee, fee_ccy = row
+    price_f, qty_f = float(price), float(qty)
+    ts = at.astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+    return {
+        "id": str(row_id),
+        "strategy": strategy or "manual",
+        "pair": symbol,
+        "side": side,
+        "amount": qty_f,
+        "price": price_f,
+        "value": qty_f * price_f,
+        "fee": float(fee or 0),
+        "feeCurrency": fee_ccy or "USD",
+        "timestamp": ts,
+        "status": "closed",
+        "tags": ["live"],
+    }
+
+
+async def fetch_page(
+    limit: int,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    strategy: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of trades, newest first, and the cursor for the next page (or None)."""
+    limit = max(1, min(limit, MAX_PAGE))
+    sql, params = build_query(limit, cursor, symbol, strategy, start, end)
+    async with db.connection("read") as conn:
+        async with conn.cursor() as cur:  # type: ignore
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [_to_trade(r) for r in rows], next_cursor
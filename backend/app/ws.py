@@ -5,7 +5,9 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from .settings import settings
-from .auth import validate_token
+from .auth import authenticate
+from . import quotes
+from . import hyperliquid_live
 
 router = APIRouter()
 
@@ -61,6 +63,20 @@ def _ndjson_path() -> Optional[str]:
     target = os.path.join(root, data_dir, fname)
     return target if os.path.exists(target) else None
 
+
+async def _push_quotes(websocket: WebSocket, sub: asyncio.Queue):
+    """Forward in-process quote batches to one client as soon as they are published."""
+    while True:
+        rows = list(await sub.get())
+        # coalesce whatever queued up while the previous frame was being sent
+        while not sub.empty():
+            rows.extend(sub.get_nowait())
+        await websocket.send_text(json.dumps({
+            "type": "quotes",
+            "count": len(rows),
+            "rows": rows,
+        }))
+
 # Helper to run the main loop shared by both styles
 async def _handle_ws(websocket: WebSocket, topic: str, token: Optional[str]):
     # Auth check
@@ -73,10 +89,13 @@ async def _handle_ws(websocket: WebSocket, topic: str, token: Optional[str]):
                 auth_header = val
                 break
         candidate = token or (auth_header.split(" ")[1] if auth_header and " " in auth_header else auth_header)
-        if not validate_token(candidate):
+        if not await authenticate(candidate):
             await websocket.close(code=1008)
             return
     await manager.connect(websocket)
+    # In-process quotes (exchange stream) arrive via the quote store, not the NDJSON file
+    quote_sub = quotes.store.subscribe() if topic in ("quotes", "all") else None
+    quote_push = asyncio.create_task(_push_quotes(websocket, quote_sub)) if quote_sub is not None else None
     try:
         last_pong = datetime.utcnow()
         ping_interval = max(1, settings.WS_PING_INTERVAL_MS // 1000)
@@ -93,7 +112,8 @@ async def _handle_ws(websocket: WebSocket, topic: str, token: Optional[str]):
             })
             if topic in ("quotes", "all"):
                 try:
-                    cur = _ndjson_path();
+                    # collector quotes ingested in-process already arrive through quote_sub
+                    cur = None if hyperliquid_live.quotes_in_process() else _ndjson_path()
                     if cur != nd_path:
                         nd_path = cur; last_pos = 0; carry = ""
                     if nd_path:
@@ -148,6 +168,11 @@ async def _handle_ws(websocket: WebSocket, topic: str, token: Optional[str]):
         manager.disconnect(websocket)
     except Exception:
         manager.disconnect(websocket)
+    finally:
+        if quote_push is not None:
+            quote_push.cancel()
+        if quote_sub is not None:
+            quotes.store.unsubscribe(quote_sub)
 
 # New UI: topic via query param (optional, default='market')
 @router.websocket("/api/ws")
@@ -177,7 +202,7 @@ async def ws_path(
                 auth_header = val
                 break
         candidate = token or (auth_header.split(" ")[1] if auth_header and " " in auth_header else auth_header)
-        if not validate_token(candidate):
+        if not await authenticate(candidate):
             await websocket.close(code=1008)
             return
     await manager.connect(websocket)
@@ -201,7 +226,7 @@ async def ws_path(
             # Stream newly appended NDJSON rows to this client when requested
             if topic in ("quotes", "all"):
                 try:
-                    cur = _ndjson_path()
+                    cur = None if hyperliquid_live.quotes_in_process() else _ndjson_path()
                     if cur != nd_path:
                         nd_path = cur
                         last_pos = 0
@@ -0,0 +1,83 @@
+"""Offline throughput/latency benchmark for the exchange market-data stream.
+
+Starts the fake venue in a separate process (so it does not share the event loop
+with the client), connects a MarketDataStream, and reports quotes/s delivered
+into the quote store plus venue-to-store latency percentiles.
+
+    cd backend && python bench/bench_market_stream.py --seconds 5 --symbols 20
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.market_stream import MarketDataStream  # noqa: E402
+from app.quotes import QuoteStore  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def main(args: argparse.Namespace) -> None:
+    symbols = [f"SYM{i}-USD" for i in range(args.symbols)]
+    port = _free_port()
+    venue = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "app.fake_venue",
+        "--port", str(port),
+        "--interval-ms", str(args.interval_ms),
+        "--batch", str(args.batch),
+        "--symbols", ",".join(symbols),
+        cwd=BACKEND_DIR,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    assert venue.stdout is not None
+    await venue.stdout.readline()  # "fake venue listening on ..."
+    store = QuoteStore(history=1)
+    sub = store.subscribe(maxsize=100_000)
+    stream = MarketDataStream(f"ws://127.0.0.1:{port}", venue="bench", symbols=symbols, store=store)
+    stream.start()
+    await stream.wait_connected(timeout=5)
+    lags: list[float] = []
+    received = 0
+    t0 = time.perf_counter()
+    deadline = t0 + args.seconds
+    try:
+        while time.perf_counter() < deadline:
+            batches = [await sub.get()]
+            while not sub.empty():
+                batches.append(sub.get_nowait())
+            now_ms = time.time() * 1000
+            for batch in batches:
+                for q in batch:
+                    received += 1
+                    lags.append(now_ms - float(q["ts"]))
+    finally:
+        elapsed = time.perf_counter() - t0
+        await stream.stop()
+        venue.terminate()
+        await venue.wait()
+    lags.sort()
+
+    def pct(p: float) -> float:
+        return lags[min(len(lags) - 1, int(p * len(lags)))] if lags else float("nan")
+
+    print(f"quotes received: {received} in {elapsed:.2f}s -> {received / elapsed:,.0f} quotes/s")
+    print(f"lag ms p50={pct(0.5):.2f} p95={pct(0.95):.2f} p99={pct(0.99):.2f} gaps={stream.gaps}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--symbols", type=int, default=20)
+    p.add_argument("--interval-ms", type=float, default=5.0)
+    p.add_argument("--batch", type=int, default=1)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,117 @@
+"""Requests/s through the request-metrics + security-header middleware stack.
+
+Compares the pure ASGI middleware in ``app.middleware`` with the previous
+``BaseHTTPMiddleware`` implementation (kept here for reference) on a small JSON
+route and a streaming route, in-process via httpx's ASGI transport, so the
+numbers isolate middleware overhead from sockets and the server.
+
+    cd backend && python bench/bench_middleware.py --requests 5000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app import middleware  # noqa: E402
+from app.settings import settings  # noqa: E402
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        for k, v in middleware.SECURITY_HEADERS:
+            response.headers.setdefault(k, v)
+        return response
+
+
+class LegacyRequestMetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.time()
+        req_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+        request.state.request_id = req_id
+        response: Response = await call_next(request)
+        duration = time.time() - start
+        middleware.REQUEST_LATENCY.labels(request.method, request.url.path).observe(duration)
+        middleware.REQUEST_COUNT.labels(request.method, request.url.path, str(response.status_code)).inc()
+        response.headers.setdefault("X-Request-Id", req_id)
+        middleware.REQUEST_LOGGER.info(json.dumps({
+            "event": "request",
+            "request_id": req_id,
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": int(duration * 1000),
+        }))
+        return response
+
+
+def build_app(security_cls, metrics_cls) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def gen():
+            for i in range(20):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    app.add_middleware(security_cls)
+    app.add_middleware(metrics_cls)
+    return app
+
+
+async def run(app: FastAPI, path: str, n: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # warm-up
+            await client.get(path)
+        remaining = n
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                r = await client.get(path)
+                assert r.status_code == 200 and "x-request-id" in r.headers
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return n / (time.perf_counter() - t0)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.DEBUG = False  # security headers are only added outside DEBUG
+    middleware.REQUEST_LOGGER.setLevel(logging.WARNING)  # measure middleware, not stderr
+    stacks = {
+        "BaseHTTPMiddleware": build_app(LegacySecurityHeadersMiddleware, LegacyRequestMetricsMiddleware),
+        "pure ASGI": build_app(middleware.SecurityHeadersMiddleware, middleware.RequestMetricsMiddleware),
+    }
+    for path in ("/api/ping", "/api/stream"):
+        results = {name: await run(app, path, args.requests, args.concurrency) for name, app in stacks.items()}
+        base = results["BaseHTTPMiddleware"]
+        for name, rps in results.items():
+            print(f"{path:12s} {name:20s} {rps:10,.0f} req/s  ({rps / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=5000)
+    p.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,133 @@
+"""Quotes/s through the batched ingestion path (decode, validate, intern, publish).
+
+Measures three paths on one event loop (pin it with ``--cpu`` to get a
+single-core number):
+
+- ``inproc``: ``quote_ingest.ingest_body`` on prebuilt batches (the floor cost)
+- ``http``: ``POST /api/live/quotes`` through the app via httpx's ASGI transport
+- ``socket``: a client streaming NDJSON over the Unix socket listener
+
+msgpack variants run when ``msgpack`` is installed. The target is at least
+100k quotes/s per core.
+
+    cd backend && python bench/bench_quote_ingest.py --quotes 500000 --batch 5000 --cpu 0
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app import quote_ingest, quotes  # noqa: E402
+from app.routes import live as live_routes  # noqa: E402
+from app.settings import settings  # noqa: E402
+
+VENUES = ["HYPERSWAP", "PRJX", "HYBRA", "KITTEN", "LAMINAR"]
+PAIRS = [f"TOK{i}/USDC" for i in range(40)]
+
+
+def make_rows(n: int) -> list:
+    rnd = random.Random(7)
+    ts = int(time.time() * 1000)
+    rows = []
+    for i in range(n):
+        mid = 10 + rnd.random()
+        rows.append({"venue": rnd.choice(VENUES), "pair": rnd.choice(PAIRS), "bid": mid - 0.01, "ask": mid + 0.01, "ts": ts + i})
+    return rows
+
+
+def ndjson_batches(rows: list, batch: int) -> list:
+    return ["\n".join(json.dumps(r) for r in rows[i:i + batch]).encode() + b"\n" for i in range(0, len(rows), batch)]
+
+
+def msgpack_batches(rows: list, batch: int) -> list:
+    import msgpack  # type: ignore
+
+    return [msgpack.packb(rows[i:i + batch]) for i in range(0, len(rows), batch)]
+
+
+def report(name: str, n: int, seconds: float) -> None:
+    rate = n / seconds
+    flag = "ok" if rate >= 100_000 else "BELOW 100k"
+    print(f"{name:18s} {rate:12,.0f} quotes/s  ({flag})")
+
+
+def bench_inproc(name: str, batches: list, fmt: str, n: int) -> None:
+    store = quotes.QuoteStore()
+    t0 = time.perf_counter()
+    accepted = 0
+    for body in batches:
+        accepted += quote_ingest.ingest_body(body, fmt, transport="bench", store=store)[0]
+    report(name, accepted, time.perf_counter() - t0)
+    assert accepted == n, accepted
+
+
+async def bench_http(name: str, batches: list, ctype: str, n: int) -> None:
+    app = FastAPI()
+    app.include_router(live_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        accepted = 0
+        for body in batches:
+            r = await client.post("/api/live/quotes", content=body, headers={"content-type": ctype})
+            accepted += r.json()["accepted"]
+        report(name, accepted, time.perf_counter() - t0)
+    assert accepted == n, accepted
+
+
+async def bench_socket(name: str, batches: list, n: int) -> None:
+    quotes.store.clear()
+    before = quotes.QUOTES_PUBLISHED.labels("ingest_socket")._value.get()
+    _, writer = await asyncio.open_unix_connection(quote_ingest._socket_path)
+    t0 = time.perf_counter()
+    for body in batches:
+        writer.write(body)
+        await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    while quotes.QUOTES_PUBLISHED.labels("ingest_socket")._value.get() - before < n:
+        await asyncio.sleep(0.001)
+    report(name, n, time.perf_counter() - t0)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {args.cpu})
+    logging.getLogger("uvicorn.error").setLevel(logging.WARNING)
+    rows = make_rows(args.quotes)
+    nd = ndjson_batches(rows, args.batch)
+    bench_inproc("inproc ndjson", nd, quote_ingest.NDJSON, args.quotes)
+    mp = None
+    if quote_ingest.msgpack_available():
+        mp = msgpack_batches(rows, args.batch)
+        bench_inproc("inproc msgpack", mp, quote_ingest.MSGPACK, args.quotes)
+    await bench_http("http ndjson", nd, "application/x-ndjson", args.quotes)
+    if mp is not None:
+        await bench_http("http msgpack", mp, "application/msgpack", args.quotes)
+    with tempfile.TemporaryDirectory() as d:
+        settings.QUOTE_INGEST_SOCKET = os.path.join(d, "ingest.sock")
+        await quote_ingest.start()
+        try:
+            await bench_socket("socket ndjson", nd, args.quotes)
+        finally:
+            await quote_ingest.stop()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--quotes", type=int, default=500_000)
+    p.add_argument("--batch", type=int, default=5000)
+    p.add_argument("--cpu", type=int, default=None, help="pin the process to this CPU")
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from app.audit import build_query, to_entry
+from app.main import app
+from app.pagination import encode_cursor
+from app.settings import settings
+
+
+def test_filters_and_keyset_cursor_in_query():
+    at = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    sql, params = build_query(
+        limit=100, cursor=encode_cursor(at, "0b7e6a1e-0000-4000-8000-000000000001"),
+        action="kill_switch_toggle", start=datetime(2024, 5, 1, tzinfo=timezone.utc),
+    )
+    assert "a.action = %s" in sql and "a.actor" not in sql.split("WHERE", 1)[1]
+    assert "(a.at, a.id) < (%s, %s::uuid)" in sql
+    assert "a.at >= %s" in sql and "OFFSET" not in sql.upper()
+    assert params[0] == "kill_switch_toggle" and params[-1] == 101
+
+
+def test_export_query_is_ascending_without_limit():
+    sql, params = build_query(ascending=True, resource="risk_limits")
+    assert sql.endswith("ORDER BY a.at ASC, a.id ASC")
+    assert params == ["risk_limits"]
+
+
+def test_to_entry_shapes_row():
+    at = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+    e = to_entry(("u1", at, "token:abcd…wxyz", "token", "risk_limits_update", "risk_limits", None,
+                  {"updated": {"maxSlippageBps": 10}}, None, None))
+    assert e["at"] == "2024-06-01T12:00:00+00:00" and e["details"]["updated"]["maxSlippageBps"] == 10
+
+
+def test_audit_api_requires_db():
+    settings.DATABASE_URL = None
+    with TestClient(app) as c:
+        assert c.get("/api/audit").status_code == 503
+        assert c.get("/api/audit/export", params={"format": "csv"}).status_code == 503
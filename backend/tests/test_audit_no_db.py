@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -55,3 +61,32 @@ def test_risk_limits_update_succeeds_without_db():
     assert r1.status_code == 200
     limits1 = r1.json()
     assert float(limits1["maxSlippageBps"]) == pytest.approx(new_bps)
+
+
+def test_audit_log_never_opens_pools_on_the_control_path(monkeypatch):
+    from app import batch_writer, db
+
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://unused")
+    opened = []
+
+    async def init_pool():
+        opened.append(True)
+
+    monkeypatch.setattr(db, "init_pool", init_pool)
+    dropped = batch_writer.WRITER_RECORDS_DROPPED.labels("audit", "db_unavailable")
+    before = dropped._value.get()
+    asyncio.run(db.audit_log(actor="u", actor_type="user", action="kill_switch_toggle"))
+    assert not opened
+    assert dropped._value.get() == before + 1
+
+
+def test_audit_details_with_non_json_values_are_queued(monkeypatch):
+    from app import db
+
+    rows = []
+    monkeypatch.setattr(db, "_pools", {"control": object()})
+    monkeypatch.setattr(db, "_audit_writer", SimpleNamespace(running=True, enqueue=rows.append))
+    at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    asyncio.run(db.audit_log(actor="u", actor_type="user", action="risk_limits_update",
+                             details={"at": at, "maxNotional": Decimal("1.5")}))
+    assert json.loads(rows[0][6]) == {"at": str(at), "maxNotional": "1.5"}
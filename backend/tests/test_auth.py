@@ -0,0 +1,135 @@
+from __future__ import annotations
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+from app.settings import settings
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _auth_settings(monkeypatch):
+    monkeypatch.setattr(settings, "REQUIRE_AUTH", True)
+    monkeypatch.setattr(settings, "AUTH_TOKENS", ["inline-token"])
+    monkeypatch.setattr(settings, "AUTH_TOKENS_FILE", None)
+    monkeypatch.setattr(settings, "RATE_LIMIT_CONTROL_PER_MIN", 1000)
+    auth.reload_tokens()
+    yield
+    monkeypatch.setattr(settings, "AUTH_TOKENS_FILE", None)
+    auth.reload_tokens()
+
+
+def test_inline_tokens_are_indexed():
+    assert auth.validate_token("inline-token")
+    assert not auth.validate_token("inline-token2")
+    assert not auth.validate_token(None)
+    settings.AUTH_TOKENS = ["rotated"]
+    assert auth.validate_token("rotated") and not auth.validate_token("inline-token")
+
+
+def test_require_auth_on_routes():
+    assert client.get("/api/strategies").status_code == 401
+    assert client.get("/api/strategies", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.get("/api/strategies", headers={"Authorization": "Bearer inline-token"}).status_code == 200
+
+
+def test_token_file_hot_reload(tmp_path, monkeypatch):
+    path = tmp_path / "tokens.txt"
+    path.write_text("file-a\n")
+    monkeypatch.setattr(settings, "AUTH_TOKENS_FILE", str(path))
+    assert auth.reload_tokens()
+    # the file replaces inline tokens
+    assert auth.validate_token("file-a") and not auth.validate_token("inline-token")
+    assert not auth.reload_tokens()  # unchanged
+
+    path.write_text("file-b\nfile-c\n")
+    os.utime(path, ns=(0, 10**18))
+    assert auth.reload_tokens()
+    assert auth.validate_token("file-c") and not auth.validate_token("file-a")
+
+    # a truncated file keeps the last good set
+    path.write_text("")
+    assert not auth.reload_tokens()
+    assert auth.validate_token("file-b")
+
+
+def test_start_loads_file_and_watches(tmp_path, monkeypatch):
+    path = tmp_path / "tokens.txt"
+    path.write_text("t1\n")
+    monkeypatch.setattr(settings, "AUTH_TOKENS_FILE", str(path))
+    monkeypatch.setattr(settings, "AUTH_TOKENS_RELOAD_SEC", 0.1)
+
+    async def run():
+        await auth.start()
+        try:
+            assert auth.validate_token("t1")
+            path.write_text("t2\n")
+            os.utime(path, ns=(0, 10**18 + 1))
+            for _ in range(50):
+                if auth.validate_token("t2"):
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await auth.stop()
+
+    asyncio.run(run())
+    assert auth.validate_token("t2") and not auth.validate_token("t1")
+
+
+def test_jwt_algorithms_follow_the_key_source(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_JWT_ALGORITHMS", "")
+    monkeypatch.setattr(settings, "AUTH_JWT_JWKS_URL", None)
+    monkeypatch.setattr(settings, "AUTH_JWT_SECRET", "s3cret")
+    assert auth.jwt_algorithms() == ["HS256"] and auth.config_error() is None
+    monkeypatch.setattr(settings, "AUTH_JWT_ALGORITHMS", "RS256,ES256")
+    assert "AUTH_JWT_SECRET" in auth.config_error()
+    with pytest.raises(ValueError):
+        asyncio.run(auth.start())
+
+    monkeypatch.setattr(settings, "AUTH_JWT_SECRET", None)
+    monkeypatch.setattr(settings, "AUTH_JWT_JWKS_URL", "https://idp.invalid/jwks.json")
+    monkeypatch.setattr(settings, "AUTH_JWT_ALGORITHMS", "")
+    assert auth.jwt_algorithms() == ["RS256", "ES256"] and auth.config_error() is None
+    monkeypatch.setattr(settings, "AUTH_JWT_ALGORITHMS", "HS256")
+    assert "HS*" in auth.config_error()
+
+
+def test_unknown_kid_refetch_is_shared_and_rate_limited(monkeypatch):
+    calls = []
+
+    async def fake_refresh():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return True
+
+    monkeypatch.setattr(auth, "refresh_jwks", fake_refresh)
+    monkeypatch.setattr(auth, "_kid_refetch_at", float("-inf"))
+    monkeypatch.setattr(settings, "AUTH_JWKS_MIN_REFETCH_SEC", 30)
+
+    async def run():
+        first = await asyncio.gather(*(auth.refetch_for_unknown_kid() for _ in range(5)))
+        again = await auth.refetch_for_unknown_kid()
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == [True] * 5 and again is False
+    assert len(calls) == 1
+
+
+def test_jwt_verification_is_cached(monkeypatch):
+    jwt = pytest.importorskip("jwt")
+    import time
+
+    monkeypatch.setattr(settings, "AUTH_JWT_SECRET", "s3cret")
+    monkeypatch.setattr(settings, "AUTH_JWT_ALGORITHMS", "HS256")
+    token = jwt.encode({"sub": "ops", "exp": int(time.time()) + 60}, "s3cret", algorithm="HS256")
+    assert auth.validate_token(token)
+    assert auth.validate_token(token)
+    assert auth._digest(token) in auth._jwt_cache
+    expired = jwt.encode({"sub": "ops", "exp": int(time.time()) - 1}, "s3cret", algorithm="HS256")
+    assert not auth.validate_token(expired)
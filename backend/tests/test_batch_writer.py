@@ -0,0 +1,69 @@
+from __future__ import annotations
+import asyncio
+
+from app.batch_writer import BatchWriter
+
+
+def test_flushes_on_batch_size_and_interval():
+    async def run():
+        batches: list[list[int]] = []
+
+        async def flush(rows):
+            batches.append(list(rows))
+
+        w = BatchWriter("t-size", flush, batch_size=3, flush_interval=0.05)
+        w.start()
+        for i in range(4):
+            w.enqueue(i)
+        await asyncio.sleep(0.01)
+        first = list(batches)
+        await asyncio.sleep(0.1)
+        await w.stop()
+        return first, batches
+
+    first, batches = asyncio.run(run())
+    # size trigger flushed a full batch right away; the remainder went out on the timer
+    assert first == [[0, 1, 2]]
+    assert batches == [[0, 1, 2], [3]]
+
+
+def test_retries_failed_flush_then_succeeds():
+    async def run():
+        attempts = {"n": 0}
+        written: list[int] = []
+
+        async def flush(rows):
+            attempts["n"] += 1
+            if attempts["n"] < 3:
+                raise RuntimeError("db down")
+            written.extend(rows)
+
+        w = BatchWriter("t-retry", flush, batch_size=10, flush_interval=0.01, retry_backoff=0.001)
+        w.start()
+        w.enqueue(1)
+        w.enqueue(2)
+        await w.stop()
+        return attempts["n"], written
+
+    n, written = asyncio.run(run())
+    assert n == 3
+    assert written == [1, 2]
+
+
+def test_enqueue_drops_when_full_and_stop_drains():
+    async def run():
+        written: list[int] = []
+
+        async def flush(rows):
+            written.extend(rows)
+
+        w = BatchWriter("t-full", flush, max_queue=2, batch_size=100, flush_interval=10)
+        accepted = [w.enqueue(i) for i in range(3)]
+        w.start()
+        # stop() must not wait for the 10s interval
+        await asyncio.wait_for(w.stop(), timeout=1)
+        return accepted, written
+
+    accepted, written = asyncio.run(run())
+    assert accepted == [True, True, False]
+    assert written == [0, 1]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import asyncio
+import json
+import sys
+
+from app import hyperliquid_live, quotes
+from app.settings import settings
+
+
+def _quote(i: int) -> dict:
+    return {"type": "quote", "venue": "HYPERSWAP", "pair": "HYPE/USDC", "mid": 10 + i, "ts": 1000 + i}
+
+
+def test_pump_publishes_quotes_and_logs_the_rest():
+    store = quotes.QuoteStore()
+    data = b"starting collector\n" + json.dumps(_quote(1)).encode() + b"\n{not json\n" + json.dumps(_quote(2)).encode()
+
+    async def run():
+        reader = asyncio.StreamReader()
+        # split mid-line to exercise the carry between reads
+        reader.feed_data(data[:30])
+        reader.feed_data(data[30:])
+        reader.feed_eof()
+        await hyperliquid_live._pump(reader, ingest=True, log_other=True, store=store)
+
+    asyncio.run(run())
+    assert [q["mid"] for q in store.recent()] == [11, 12]
+    assert store.latest[("HYPERSWAP", "HYPE/USDC")]["ts"] == 1002
+
+
+def test_fd_channel_feeds_quote_store(tmp_path, monkeypatch):
+    script = (
+        "import os, json\n"
+        "assert os.environ['QUOTES_OUT'] == 'fd'\n"
+        "fd = int(os.environ['QUOTES_FD'])\n"
+        f"os.write(fd, (json.dumps({_quote(5)!r}) + '\\n').encode())\n"
+        "print('log line on stdout', flush=True)\n"
+    )
+    (tmp_path / "collector.py").write_text(script)
+    monkeypatch.setattr(settings, "HLIQ_NODE_COLLECTOR_CMD", f"{sys.executable} collector.py")
+    monkeypatch.setattr(settings, "HLIQ_NODE_QUOTE_CHANNEL", "fd")
+    quotes.store.clear()
+
+    asyncio.run(asyncio.wait_for(hyperliquid_live._runner_node(str(tmp_path)), timeout=10))
+    assert quotes.store.latest[("HYPERSWAP", "HYPE/USDC")]["mid"] == 15
+    assert not hyperliquid_live.quotes_in_process()
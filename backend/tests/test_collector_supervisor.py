@@ -0,0 +1,108 @@
+from __future__ import annotations
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from app import hyperliquid_live, quotes
+from app.collector_supervisor import Shard, Supervisor, parse_cpus, parse_shards
+from app.settings import settings
+
+
+def test_parse_shards_and_cpus():
+    shards = parse_shards("HYPERSWAP,PRJX; venues=HYBRA|pairs=HYPE/USDC", "0,2-3")
+    assert [s.filters for s in shards] == [
+        {"venues": "HYPERSWAP,PRJX"},
+        {"venues": "HYBRA", "pairs": "HYPE/USDC"},
+    ]
+    assert shards[1].env() == {
+        "COLLECTOR_SHARD": "1", "COLLECTOR_SHARDS": "2",
+        "COLLECTOR_VENUES": "HYBRA", "COLLECTOR_PAIRS": "HYPE/USDC",
+    }
+    assert [s.cpus for s in shards] == [{0}, {2}]
+    assert parse_cpus("1-3,5") == [1, 2, 3, 5]
+    assert len(parse_shards("")) == 1 and parse_shards("")[0].filters == {}
+    with pytest.raises(ValueError):
+        parse_shards("exchanges=X")
+
+
+def test_supervisor_restarts_crashed_shard():
+    runs = []
+
+    async def run_shard(shard: Shard):
+        runs.append(shard.index)
+        if len(runs) < 3:
+            raise RuntimeError("boom")
+        await asyncio.sleep(10)
+
+    async def main():
+        sup = Supervisor([Shard(0, 1)], run_shard, backoff_base_ms=1, backoff_max_ms=5)
+        task = asyncio.create_task(sup.run())
+        while len(runs) < 3:
+            await asyncio.sleep(0.01)
+        health = sup.health()[0]
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return health, sup.health()[0]
+
+    health, after = asyncio.run(main())
+    assert health["restarts"] == 2 and health["lastError"] == "boom"
+    assert after["state"] == "stopped"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rpartition(")")[2].split()[0] != "Z"  # a zombie waits for its new parent to reap it
+    except FileNotFoundError:
+        return False
+    except OSError:  # pragma: no cover - no procfs
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+
+def test_node_shards_merge_into_one_quote_stream(tmp_path, monkeypatch):
+    script = (
+        "import json, os, time\n"
+        "venue = os.environ['COLLECTOR_VENUES']\n"
+        "cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []\n"
+        "print(json.dumps({'type': 'quote', 'venue': venue, 'pair': 'HYPE/USDC', 'mid': 1, 'ts': 1, 'cpus': cpus, 'pid': os.getpid()}), flush=True)\n"
+        "time.sleep(30)\n"
+    )
+    (tmp_path / "collector.py").write_text(script)
+    cpus = sorted(os.sched_getaffinity(0))[:1] if hasattr(os, "sched_getaffinity") else []
+    monkeypatch.setattr(settings, "HLIQ_BOT_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "HLIQ_NODE_COLLECTOR", True)
+    monkeypatch.setattr(settings, "HLIQ_NODE_COLLECTOR_CMD", f"{sys.executable} collector.py; true")  # no exec: node runs under the shell
+    monkeypatch.setattr(settings, "HLIQ_NODE_QUOTE_CHANNEL", "stdout")
+    monkeypatch.setattr(settings, "HLIQ_COLLECTOR_SHARDS", "HYPERSWAP;PRJX")
+    monkeypatch.setattr(settings, "HLIQ_COLLECTOR_CPUS", ",".join(map(str, cpus)) or None)
+    quotes.store.clear()
+
+    async def main():
+        assert hyperliquid_live.start()
+        for _ in range(200):
+            if len(quotes.store.latest) == 2:
+                break
+            await asyncio.sleep(0.05)
+        health = hyperliquid_live.health()
+        await hyperliquid_live.stop()
+        return health
+
+    health = asyncio.run(main())
+    assert {v for v, _ in quotes.store.latest} == {"HYPERSWAP", "PRJX"}
+    assert [h["state"] for h in health] == ["running", "running"]
+    assert all(h["quotes"] == 1 and h["pid"] for h in health)
+    if cpus:
+        assert all(q["cpus"] == cpus for q in quotes.store.latest.values())
+    # stopping signals the whole process group, so the collectors started by the shells are gone too
+    pids = [q["pid"] for q in quotes.store.latest.values()]
+    deadline = time.monotonic() + 5
+    while any(_alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not any(_alive(pid) for pid in pids)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+
+import pytest
+
+from app import db
+
+
+class _FakePool:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.checked_out = 0
+
+    @contextlib.asynccontextmanager
+    async def connection(self, timeout=None):
+        if self.fail:
+            raise db.PoolTimeout("timed out")
+        self.checked_out += 1
+        try:
+            yield object()
+        finally:
+            self.checked_out -= 1
+
+    def get_stats(self):
+        return {"pool_size": 2, "pool_available": 2 - self.checked_out, "requests_waiting": 0}
+
+
+def _sample(metric, **labels):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(metric, labels) or 0.0
+
+
+def test_connection_records_wait_and_timeouts(monkeypatch):
+    good, bad = _FakePool(), _FakePool(fail=True)
+    monkeypatch.setattr(db, "_pools", {"control": good, "bulk": bad})
+    waits = _sample("db_pool_checkout_wait_seconds_count", pool="control")
+    timeouts = _sample("db_pool_timeouts_total", pool="bulk")
+
+    async def run():
+        async with db.connection("control"):
+            assert good.checked_out == 1
+        with pytest.raises(db.PoolTimeout):
+            async with db.connection("bulk"):
+                pass
+        with pytest.raises(RuntimeError):
+            async with db.connection("read"):
+                pass
+
+    asyncio.run(run())
+    assert good.checked_out == 0
+    assert _sample("db_pool_checkout_wait_seconds_count", pool="control") == waits + 1
+    assert _sample("db_pool_timeouts_total", pool="bulk") == timeouts + 1
+
+
+def test_pool_gauges_are_set_on_checkout_and_return(monkeypatch):
+    # set explicitly (not computed at scrape time) so multiprocess /metrics exports them
+    pool = _FakePool()
+    monkeypatch.setattr(db, "_pools", {"control": pool})
+
+    async def run():
+        async with db.connection("control"):
+            return _sample("db_pool_connections_in_use", pool="control"), _sample("db_pool_connections_idle", pool="control")
+
+    assert asyncio.run(run()) == (1, 1)
+    assert _sample("db_pool_connections_in_use", pool="control") == 0
+    assert _sample("db_pool_connections_idle", pool="control") == 2
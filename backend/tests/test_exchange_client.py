@@ -0,0 +1,255 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+from app.exchange_client import TRACE_LOGGER, CircuitBreaker, ExchangeClient, OutcomeUnknown, RetryBudget
+from app.exchange_throttle import RequestScheduler, parse_weights
+from app.settings import settings
+
+
+def _client_with_transport(handler, venue: str = "test") -> ExchangeClient:
+    c = ExchangeClient("http://venue.test", api_key=None, api_secret=None, venue=venue)
+    c._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    c._backoff_base = 0.001
+    c._backoff_max = 0.001
+    return c
+
+
+def test_scheduler_serves_orders_before_queued_tickers():
+    async def run():
+        sched = RequestScheduler("prio", rate=200.0, capacity=1.0)
+        order: list[str] = []
+
+        async def call(op: str):
+            await sched.acquire(op)
+            order.append(op)
+
+        # First call drains the single token; the rest queue behind it
+        await call("get_ticker")
+        tasks = [asyncio.create_task(call("get_ticker")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("place_order")))
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(run())
+    assert order[0] == "get_ticker"
+    assert order[1] == "place_order"
+    assert order.count("get_ticker") == 4
+
+
+def test_scheduler_penalize_delays_next_request():
+    async def run():
+        sched = RequestScheduler("pen", rate=1000.0, capacity=10.0)
+        sched.penalize(0.05)
+        return await sched.acquire("get_ticker")
+
+    waited = asyncio.run(run())
+    assert waited >= 0.04
+
+
+def test_endpoint_weights_are_configurable_and_capped_at_capacity():
+    assert parse_weights(" place_order=3 , get_ticker=0.5,") == {"place_order": 3.0, "get_ticker": 0.5}
+    with pytest.raises(ValueError):
+        parse_weights("place_order=0")
+
+    async def run():
+        sched = RequestScheduler("w", rate=0.001, capacity=4.0, weights={"place_order": 3.0})
+        await sched.acquire("place_order")
+        after_order = sched.bucket.tokens
+        # heavier than the bucket: charged the full capacity on the fast path
+        sched.bucket._tokens = 4.0
+        await sched.acquire("get_ticker", weight=10.0)
+        return after_order, sched.bucket.tokens
+
+    after_order, after_heavy = asyncio.run(run())
+    assert 0.99 < after_order < 1.01
+    assert after_heavy < 0.01
+
+
+def test_429_is_retried_without_tripping_breaker():
+    calls = {"n": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            return httpx.Response(429, headers={"retry-after": "0"})
+        return httpx.Response(200, json={"symbol": "BTC-USD", "price": 1.0})
+
+    async def run():
+        c = _client_with_transport(handler)
+        return c, await c.get_ticker("BTC-USD")
+
+    c, data = asyncio.run(run())
+    assert data["symbol"] == "BTC-USD"
+    assert calls["n"] == 3
+    assert c._breaker("get_ticker").state == "closed"
+
+
+def test_breaker_opens_on_failure_rate_and_admits_single_probe():
+    cb = CircuitBreaker("v", "op", failure_rate_threshold=0.5, window_sec=60, min_requests=4, open_cooldown_sec=0)
+    cb.on_success()
+    cb.on_failure()
+    cb.on_success()
+    assert cb.state == "closed"
+    cb.on_failure()  # 2 of 4 failed
+    assert cb.state == "open"
+    # cooldown elapsed: exactly one probe gets through
+    assert cb.allow_request() is True
+    assert cb.state == "half_open"
+    assert cb.allow_request() is False
+    assert cb.allow_request() is False
+    # a straggler from before the trip does not close the breaker
+    cb.on_success()
+    assert cb.state == "half_open"
+    cb.on_success(probe=True)
+    assert cb.state == "closed"
+    assert cb.allow_request() is True
+
+
+def test_breaker_probe_released_when_caller_gives_up():
+    cb = CircuitBreaker("v", "op2", min_requests=1, open_cooldown_sec=0)
+    cb.on_failure()
+    assert cb.allow_request() is True
+    assert cb.allow_request() is False
+    cb.release_probe()
+    assert cb.allow_request() is True
+
+
+def test_ticker_failures_do_not_block_order_placement():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/ticker":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"id": "o-1"})
+
+    async def run():
+        c = _client_with_transport(handler, venue="isolation")
+        c._max_retries = 0
+        for _ in range(10):
+            try:
+                await c.get_ticker("BTC-USD")
+            except RuntimeError:
+                pass
+        order = await c.place_order("BTC-USD", "buy", 1.0)
+        return c, order
+
+    c, order = asyncio.run(run())
+    assert c._breaker("get_ticker").state == "open"
+    assert c._breaker("place_order").state == "closed"
+    assert order["id"] == "o-1"
+
+
+def test_order_retries_reuse_client_order_id_and_dedupe_repeats():
+    seen: list[tuple[str, str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        seen.append((body["clientOrderId"], request.headers.get("idempotency-key")))
+        if len(seen) == 1:
+            raise httpx.ReadTimeout("slow venue", request=request)
+        return httpx.Response(200, json={"id": "ex-1"})
+
+    async def run():
+        c = _client_with_transport(handler, venue="idem")
+        first = await c.place_order("BTC-USD", "buy", 1.0, client_order_id="cid-1")
+        again = await c.place_order("BTC-USD", "buy", 1.0, client_order_id="cid-1")
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first["id"] == "ex-1" and first["clientOrderId"] == "cid-1"
+    assert again == first
+    # one timeout + one successful retry, both with the same key; the repeat was not sent
+    assert seen == [("cid-1", "cid-1"), ("cid-1", "cid-1")]
+
+
+def test_exhausted_read_timeouts_and_bad_bodies_are_outcome_unknown():
+    def timeout(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("slow venue", request=request)
+
+    def garbage(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"<html>oops</html>")
+
+    def refused(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run(handler, venue):
+        c = _client_with_transport(handler, venue=venue)
+        c._max_retries = 1
+        try:
+            await c.place_order("BTC-USD", "buy", 1.0, client_order_id=f"cid-{venue}")
+        except RuntimeError as e:
+            return e
+
+    assert isinstance(asyncio.run(run(timeout, "unknown-timeout")), OutcomeUnknown)
+    assert isinstance(asyncio.run(run(garbage, "unknown-body")), OutcomeUnknown)
+    refused_err = asyncio.run(run(refused, "unknown-refused"))
+    assert isinstance(refused_err, RuntimeError) and not isinstance(refused_err, OutcomeUnknown)
+
+
+def test_cancelled_original_send_does_not_cancel_joiners():
+    sent: list[str] = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            sent.append(json.loads(request.content)["clientOrderId"])
+            await release.wait()
+            return httpx.Response(200, json={"id": "ex-2"})
+
+        c = _client_with_transport(handler, venue="idem-cancel")
+        original = asyncio.create_task(c.place_order("BTC-USD", "buy", 1.0, client_order_id="cid-2"))
+        while not sent:
+            await asyncio.sleep(0)
+        joiner = asyncio.create_task(c.place_order("BTC-USD", "buy", 1.0, client_order_id="cid-2"))
+        await asyncio.sleep(0)
+        original.cancel()
+        release.set()
+        return original, await joiner
+
+    original, ack = asyncio.run(run())
+    assert original.cancelled()
+    assert ack["id"] == "ex-2"
+    assert sent == ["cid-2"]
+
+
+def test_retry_budget_caps_retries_to_ratio_of_traffic():
+    budget = RetryBudget(ratio=0.1, window_sec=10, min_per_sec=0)
+    for _ in range(50):
+        budget.record_request()
+    granted = sum(1 for _ in range(20) if budget.try_spend())
+    assert granted == 5
+    assert (budget._requests, budget._retries) == (50, 5)
+
+
+def test_sampled_trace_logs_attempts_and_backoff(caplog):
+    calls = {"n": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"symbol": "ETH-USD"})
+
+    async def run():
+        c = _client_with_transport(handler, venue="traced")
+        return await c.get_ticker("ETH-USD")
+
+    settings.EXCHANGE_TRACE_SAMPLE_RATE = 1.0
+    TRACE_LOGGER.propagate = True
+    try:
+        with caplog.at_level(logging.INFO, logger="app.exchange.trace"):
+            asyncio.run(run())
+    finally:
+        settings.EXCHANGE_TRACE_SAMPLE_RATE = 0.0
+        TRACE_LOGGER.propagate = False
+    # structured records carry the dict; the log pipeline JSON-encodes it off the event loop
+    entry = caplog.records[-1].msg
+    assert entry["operation"] == "get_ticker" and entry["venue"] == "traced"
+    assert entry["status"] == "ok"
+    assert [a["outcome"] for a in entry["attempts"]] == ["server_error", "ok"]
+    assert entry["backoff_ms"] > 0
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from app import kill_switch
+from app.routes import bot as bot_routes
+from app.settings import settings
+
+
+def test_state_write_drives_local_flag():
+    bot_routes.STATE["killSwitch"] = True
+    assert kill_switch.is_engaged()
+    assert kill_switch.KILL_SWITCH_GAUGE._value.get() == 1
+    bot_routes.STATE["killSwitch"] = False
+    assert not kill_switch.is_engaged()
+
+
+def test_receive_ignores_own_and_stale_messages():
+    kill_switch.apply(False)
+    now = time.time()
+    kill_switch._receive(json.dumps({"enabled": True, "ts": now, "origin": kill_switch._origin, "seq": 1}), "socket")
+    assert not kill_switch.is_engaged()
+    kill_switch._receive(json.dumps({"enabled": True, "ts": now + 1, "origin": "peer", "seq": 1}), "socket")
+    assert kill_switch.is_engaged()
+    # an older toggle arriving late does not undo a newer one
+    kill_switch._receive(json.dumps({"enabled": False, "ts": now, "origin": "peer2", "seq": 1}), "socket")
+    assert kill_switch.is_engaged()
+    kill_switch._receive(json.dumps({"enabled": False, "ts": now + 2, "origin": "peer", "seq": 2}), "socket")
+    assert not kill_switch.is_engaged()
+
+
+def test_database_version_orders_toggles_not_sender_clocks(monkeypatch):
+    monkeypatch.setattr(kill_switch, "_last", (0, 0.0))
+    kill_switch.apply(False)
+    now = time.time()
+    v = 5
+    kill_switch._receive(json.dumps({"enabled": True, "version": v + 2, "ts": now, "origin": "a", "seq": 1}), "postgres")
+    assert kill_switch.is_engaged()
+    # a node whose clock runs ahead cannot undo a later-committed toggle
+    kill_switch._receive(json.dumps({"enabled": False, "version": v + 1, "ts": now + 100, "origin": "b", "seq": 1}), "postgres")
+    assert kill_switch.is_engaged()
+    # and one whose clock runs behind is not dropped as stale
+    kill_switch._receive(json.dumps({"enabled": False, "version": v + 3, "ts": now - 100, "origin": "c", "seq": 1}), "postgres")
+    assert not kill_switch.is_engaged()
+
+
+class _FakeListenConn:
+    """One LISTEN connection per connect(); the first drops once ``lost`` is set."""
+
+    def __init__(self, events, drop):
+        self.events = events
+        self.drop = drop
+
+    @classmethod
+    async def connect(cls, *args, **kwargs):
+        return cls(cls.events, cls.drops.pop(0) if cls.drops else None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql):
+        self.events.append(sql)
+
+    async def notifies(self):
+        if self.drop is not None:
+            await self.drop.wait()
+            raise OSError("server closed the connection")
+        await asyncio.Event().wait()
+        yield  # pragma: no cover
+
+
+def test_listener_reads_state_after_listen_and_after_reconnect(monkeypatch):
+    events = []
+    persisted = iter([(False, 7, 1.0), (True, 8, 2.0)])
+
+    async def load():
+        events.append("load")
+        return next(persisted)
+
+    class Conn(_FakeListenConn):
+        pass
+
+    lost = asyncio.Event()
+    Conn.events, Conn.drops = events, [lost]
+    monkeypatch.setattr(kill_switch, "psycopg", type("psycopg", (), {"AsyncConnection": Conn}))
+    monkeypatch.setattr(kill_switch, "_load", load)
+    monkeypatch.setattr(kill_switch, "_choose_transport", lambda: "postgres")
+    monkeypatch.setattr(kill_switch, "_last", (0, 0.0))
+    kill_switch.apply(False)
+
+    async def run():
+        try:
+            await kill_switch.start(True)
+            at_start = kill_switch.is_engaged(), kill_switch.is_known()
+            # the connection drops; the toggle committed meanwhile comes from the row
+            lost.set()
+            for _ in range(300):  # the listener retries after 0.5s
+                if kill_switch.is_engaged():
+                    break
+                await asyncio.sleep(0.01)
+            return at_start, kill_switch.is_engaged()
+        finally:
+            await kill_switch.stop()
+
+    try:
+        assert asyncio.run(run()) == ((False, True), True)
+        assert events == ["LISTEN kill_switch", "load", "LISTEN kill_switch", "load"]
+    finally:
+        kill_switch.apply(False)
+
+
+def test_socket_transport_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "KILL_SWITCH_SOCKET_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "KILL_SWITCH_TRANSPORT", "socket")
+    seen = []
+    listener = seen.append
+
+    async def run():
+        await kill_switch.start(False)
+        kill_switch.add_listener(listener)
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(os.path.join(str(tmp_path), "ks-999999.sock"))
+        peer.settimeout(1)
+        try:
+            # outbound: a local toggle reaches every peer socket
+            await kill_switch.publish(True)
+            msg = json.loads(peer.recv(4096))
+            assert msg["enabled"] is True and msg["origin"] == kill_switch._origin
+            # inbound: a peer's toggle flips the local flag without polling
+            kill_switch.apply(False)
+            peer.sendto(json.dumps({"enabled": True, "ts": time.time() + 5, "origin": "peer", "seq": 1}).encode(),
+                        kill_switch._sock_path)
+            for _ in range(100):
+                if kill_switch.is_engaged():
+                    break
+                await asyncio.sleep(0.005)
+        finally:
+            peer.close()
+            kill_switch.remove_listener(listener)
+            await kill_switch.stop()
+
+    asyncio.run(run())
+    assert kill_switch.is_engaged()
+    assert seen == [True]
+    assert not os.path.exists(os.path.join(str(tmp_path), f"ks-{os.getpid()}.sock"))
+    kill_switch.apply(False)
+
+
+def _peer(tmp_path, name):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(os.path.join(str(tmp_path), name))
+    sock.settimeout(2)
+    return sock
+
+
+def test_joining_process_takes_state_from_a_peer(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "KILL_SWITCH_SOCKET_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "KILL_SWITCH_TRANSPORT", "socket")
+    peer = _peer(tmp_path, "ks-999997.sock")
+
+    def answer():
+        req = json.loads(peer.recv(4096))
+        assert req["type"] == "sync"
+        state = {"type": "state", "enabled": True, "ts": time.time() - 60, "known": True, "origin": "peer"}
+        peer.sendto(json.dumps(state).encode(), req["replyTo"])
+
+    responder = threading.Thread(target=answer)
+    responder.start()
+
+    async def run():
+        try:
+            # configured/per-process value says disengaged; the running peer is engaged
+            await kill_switch.start(False)
+            return kill_switch.is_engaged(), kill_switch.is_known()
+        finally:
+            await kill_switch.stop()
+
+    try:
+        assert asyncio.run(run()) == (True, True)
+    finally:
+        responder.join()
+        peer.close()
+        kill_switch.apply(False)
+
+
+def test_joining_process_stays_engaged_when_state_is_unknown(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "KILL_SWITCH_SOCKET_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "KILL_SWITCH_TRANSPORT", "socket")
+    monkeypatch.setattr(settings, "KILL_SWITCH_SYNC_TIMEOUT_MS", 50)
+    silent = _peer(tmp_path, "ks-999996.sock")
+
+    async def run():
+        try:
+            await kill_switch.start(False)
+            before = kill_switch.is_engaged(), kill_switch.is_known()
+            # an operator toggle settles it
+            await kill_switch.publish(False)
+            kill_switch.apply(False)
+            return before, kill_switch.is_known()
+        finally:
+            await kill_switch.stop()
+
+    try:
+        assert asyncio.run(run()) == ((True, False), True)
+    finally:
+        silent.close()
+        kill_switch.apply(False)
+
+
+def test_durable_initial_value_is_used_as_is(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "KILL_SWITCH_TRANSPORT", "none")
+
+    async def run():
+        try:
+            await kill_switch.start(False, durable=True)
+            return kill_switch.is_engaged(), kill_switch.is_known()
+        finally:
+            await kill_switch.stop()
+
+    assert asyncio.run(run()) == (False, True)
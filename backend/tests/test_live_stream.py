@@ -9,6 +9,7 @@ from typing import Iterator
 import pytest
 from fastapi.testclient import TestClient
 
+from app import quotes
 from app.main import app
 from app.settings import settings
 
@@ -158,3 +159,22 @@ def test_ws_stream_status_and_quotes(temp_data_dir: str):
                     break
             assert got_status, "did not receive liveStatus frame"
             assert got_quotes, "did not receive quotes batch"
+
+
+def test_ws_pushes_in_process_quotes_without_waiting_for_the_tick(monkeypatch):
+    monkeypatch.setattr(settings, "HLIQ_BOT_PATH", None)
+    monkeypatch.setattr(settings, "WS_BROADCAST_INTERVAL", 30)
+    batch = [{"type": "quote", "venue": "FAKE", "pair": f"T{i}/USDC", "mid": 1.0 + i, "ts": i} for i in range(150)]
+
+    with TestClient(app) as c:
+        with c.websocket_connect("/api/ws?topic=quotes") as ws:
+            assert json.loads(ws.receive_text())["type"] == "liveStatus"
+            assert json.loads(ws.receive_text())["type"] == "ping"
+            started = time.monotonic()
+            # publish on the app's loop, as the in-process producers do
+            c.portal.call(quotes.store.publish_many, batch, "test")
+            data = json.loads(ws.receive_text())
+            assert data["type"] == "quotes"
+            # the whole batch, not a per-tick slice
+            assert data["count"] == 150
+            assert time.monotonic() - started < 5
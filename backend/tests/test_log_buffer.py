@@ -0,0 +1,64 @@
+from __future__ import annotations
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.log_buffer import LogRing
+from app.main import app
+from app.routes import bot as bot_routes
+
+
+def test_ring_evicts_and_keeps_level_index():
+    ring = LogRing(capacity=5)
+    for i in range(1, 13):
+        ring.add("error" if i % 4 == 0 else "info", f"m{i}")
+    assert len(ring) == 5
+    assert (ring.first_seq, ring.last_seq) == (8, 12)
+    assert ring.get(7) is None and ring.get(8).message == "m8"
+    items, cursor = ring.page(10, level="error")
+    assert [e.id for e in items] == ["8", "12"] and cursor is None
+    items, cursor = ring.page(2)
+    assert [e.id for e in items] == ["11", "12"] and cursor == 11
+    items, cursor = ring.page(2, before=cursor)
+    assert [e.id for e in items] == ["9", "10"] and cursor == 9
+    items, cursor = ring.page(2, before=cursor)
+    assert [e.id for e in items] == ["8"] and cursor is None
+    assert [e.id for e in ring.page(10, after=10)[0]] == ["11", "12"]
+
+
+def test_logs_route_filters_before_limiting(monkeypatch):
+    ring = LogRing(capacity=100)
+    monkeypatch.setattr(bot_routes, "LOGS", ring)
+    ring.add("error", "boom")
+    for i in range(20):
+        ring.add("info", f"tick {i}")
+    client = TestClient(app)
+    r = client.get("/api/bot/logs", params={"limit": 5, "level": "error"})
+    assert r.status_code == 200
+    assert [e["message"] for e in r.json()] == ["boom"]
+    r = client.get("/api/bot/logs", params={"limit": 5})
+    assert [e["id"] for e in r.json()] == ["17", "18", "19", "20", "21"]
+    r = client.get("/api/bot/logs", params={"limit": 5, "cursor": r.headers["X-Next-Cursor"]})
+    assert [e["id"] for e in r.json()] == ["12", "13", "14", "15", "16"]
+    assert client.get("/api/bot/logs", params={"cursor": "nope"}).status_code == 400
+
+
+def test_stream_replays_after_last_event_id_then_tails(monkeypatch):
+    ring = LogRing(capacity=100)
+    monkeypatch.setattr(bot_routes, "LOGS", ring)
+    for i in range(5):
+        ring.add("info", f"m{i + 1}")
+
+    async def run():
+        resp = await bot_routes.stream_logs(request=None, level=None, after=None, last_event_id="3", auth=None)
+        it = resp.body_iterator
+        events = [await it.__anext__(), await it.__anext__()]
+        ring.add("warn", "live")
+        events.append(await asyncio.wait_for(it.__anext__(), timeout=1))
+        await it.aclose()
+        return events
+
+    events = asyncio.run(run())
+    assert [e.split("\n", 1)[0] for e in events] == ["id: 4", "id: 5", "id: 6"]
+    assert '"message":"live"' in events[2]
+    assert not ring._subscribers
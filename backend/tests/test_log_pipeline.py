@@ -0,0 +1,52 @@
+from __future__ import annotations
+import io
+import json
+import logging
+
+from app import log_pipeline
+
+
+def _logger(name: str, w: log_pipeline.LogWriter) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [w.handler]
+    return logger
+
+
+def test_writer_batches_json_and_plain_lines():
+    out = io.StringIO()
+    w = log_pipeline.LogWriter(out, batch_size=100)
+    log = _logger("test.pipeline", w)
+    log.info({"event": "request", "status": 200})
+    log.info("node| %s", "hello")
+    w.start()
+    w.stop()
+    lines = out.getvalue().splitlines()
+    assert json.loads(lines[0]) == {"event": "request", "status": 200}
+    assert lines[1] == "node| hello"
+
+
+def test_sampling_keeps_one_in_n_and_counts_drops():
+    out = io.StringIO()
+    w = log_pipeline.LogWriter(out)
+    w.handler.addFilter(log_pipeline.SamplingFilter(log_pipeline.parse_sample_rules("test.sampled=5, bad=x")))
+    log = _logger("test.sampled", w)
+    dropped = log_pipeline.LOG_RECORDS_DROPPED.labels("test.sampled", "sampled")._value.get()
+    w.start()
+    for i in range(20):
+        log.info("line %d", i)
+    log.error("always kept")
+    w.stop()
+    lines = out.getvalue().splitlines()
+    assert lines == ["line 0", "line 5", "line 10", "line 15", "always kept"]
+    assert log_pipeline.LOG_RECORDS_DROPPED.labels("test.sampled", "sampled")._value.get() == dropped + 16
+
+
+def test_full_queue_drops_instead_of_blocking():
+    w = log_pipeline.LogWriter(io.StringIO(), max_queue=2)
+    log = _logger("test.full", w)
+    before = log_pipeline.LOG_RECORDS_DROPPED.labels("test.full", "queue_full")._value.get()
+    for i in range(5):  # writer not started: nothing drains
+        log.info("x")
+    assert log_pipeline.LOG_RECORDS_DROPPED.labels("test.full", "queue_full")._value.get() == before + 3
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import asyncio
+
+from app.fake_venue import FakeVenueServer
+from app.market_stream import MarketDataStream
+from app.quotes import QuoteStore
+
+
+async def _wait_for(pred, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not pred():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_stream_publishes_quotes_into_store():
+    async def run():
+        venue = await FakeVenueServer(interval_ms=5, symbols=["BTC-USD", "ETH-USD"]).start()
+        store = QuoteStore()
+        sub = store.subscribe()
+        stream = MarketDataStream(venue.url, venue="fake", symbols=["BTC-USD"], store=store)
+        stream.start()
+        try:
+            await _wait_for(lambda: len(store.recent()) >= 5)
+            batch = await asyncio.wait_for(sub.get(), timeout=1)
+        finally:
+            await stream.stop()
+            await venue.stop()
+        return store, batch
+
+    store, batch = asyncio.run(run())
+    assert batch[0]["venue"] == "fake"
+    # only the subscribed symbol is published
+    assert {q["pair"] for q in store.recent()} == {"BTC-USD"}
+    q = store.latest[("fake", "BTC-USD")]
+    assert q["bid"] < q["mid"] < q["ask"]
+
+
+def test_stream_detects_sequence_gaps_and_resyncs():
+    async def run():
+        venue = await FakeVenueServer(interval_ms=2, symbols=["BTC-USD"], skip_every=5).start()
+        stream = MarketDataStream(venue.url, venue="gappy", symbols=["BTC-USD"], store=QuoteStore())
+        stream.start()
+        try:
+            await _wait_for(lambda: stream.gaps >= 2)
+        finally:
+            await stream.stop()
+            await venue.stop()
+        return stream
+
+    assert asyncio.run(run()).gaps >= 2
+
+
+def test_stream_reconnects_and_resubscribes_after_venue_drop():
+    async def run():
+        venue = await FakeVenueServer(interval_ms=5, symbols=["BTC-USD", "ETH-USD"]).start()
+        store = QuoteStore()
+        stream = MarketDataStream(
+            venue.url, venue="flaky", symbols=["BTC-USD"], store=store,
+            backoff_base_ms=10, backoff_max_ms=50,
+        )
+        stream.start()
+        try:
+            await stream.wait_connected(timeout=5)
+            await stream.subscribe(["ETH-USD"])
+            await venue.disconnect_all()
+            await _wait_for(lambda: stream.reconnects >= 1 and stream.connected)
+            store.clear()
+            await _wait_for(lambda: {"BTC-USD", "ETH-USD"} <= {q["pair"] for q in store.recent()})
+        finally:
+            await stream.stop()
+            await venue.stop()
+        return stream
+
+    stream = asyncio.run(run())
+    assert stream.symbols == {"BTC-USD", "ETH-USD"}
+
+
+def test_malformed_ticker_is_skipped_without_dropping_the_session():
+    async def run():
+        store = QuoteStore()
+        stream = MarketDataStream("ws://unused", venue="sloppy", symbols=["BTC-USD"], store=store)
+        await stream._handle_ticker({"type": "ticker", "symbol": "BTC-USD", "seq": 1, "bid": "n/a", "ask": 2, "ts": 1})
+        await stream._handle_ticker({"type": "ticker", "symbol": "BTC-USD", "seq": 2, "bid": 1, "ask": 2, "ts": [1]})
+        await stream._handle_ticker({"type": "ticker", "symbol": "BTC-USD", "seq": 3, "bid": 1, "ask": 3, "ts": 5})
+        return stream, store
+
+    stream, store = asyncio.run(run())
+    assert stream.malformed == 2
+    # the bad updates were not recorded, so the next good one still publishes
+    assert [q["seq"] for q in store.recent()] == [3]
+    assert store.latest[("sloppy", "BTC-USD")]["mid"] == 2
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import middleware
+from app.settings import settings
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/rid")
+    async def rid(request: Request):
+        return {"rid": request.state.request_id}
+
+    @app.get("/stream")
+    async def stream():
+        async def gen():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream",
+                                 headers={"X-Frame-Options": "SAMEORIGIN"})
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(middleware.SecurityHeadersMiddleware)
+    app.add_middleware(middleware.RequestMetricsMiddleware)
+    return app
+
+
+def _count(path: str, status: str) -> float:
+    return middleware.REQUEST_COUNT.labels("GET", path, status)._value.get()
+
+
+def test_request_id_is_propagated_and_generated():
+    client = TestClient(_app())
+    r = client.get("/rid", headers={"X-Request-Id": "abc"})
+    assert r.json() == {"rid": "abc"} and r.headers["x-request-id"] == "abc"
+    r = client.get("/rid")
+    assert r.headers["x-request-id"] == r.json()["rid"]
+
+
+def test_security_headers_on_streaming_response(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", False)
+    before = _count("/stream", "200")
+    r = TestClient(_app()).get("/stream")
+    assert r.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert r.headers["x-content-type-options"] == "nosniff"
+    # route-set headers win
+    assert r.headers["x-frame-options"] == "SAMEORIGIN"
+    assert _count("/stream", "200") == before + 1
+
+
+def test_security_headers_skipped_in_debug(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    r = TestClient(_app()).get("/rid")
+    assert "strict-transport-security" not in r.headers
+
+
+def test_unhandled_error_counts_as_500():
+    before = _count("/boom", "500")
+    r = TestClient(_app(), raise_server_exceptions=False).get("/boom")
+    assert r.status_code == 500
+    assert _count("/boom", "500") == before + 1
+
+
+def test_metrics_use_route_templates():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    app.add_middleware(middleware.RequestMetricsMiddleware)
+    client = TestClient(app)
+    before = _count("/items/{item_id}", "200")
+    client.get("/items/a")
+    client.get("/items/b")
+    assert _count("/items/{item_id}", "200") == before + 2
+    unmatched = _count(middleware.UNMATCHED_PATH, "404")
+    client.get("/scan/1")
+    client.get("/scan/2")
+    assert _count(middleware.UNMATCHED_PATH, "404") == unmatched + 2
+    assert middleware.REQUEST_COUNT.labels("POST", "/items/{item_id}", "405")._value.get() == 0
+    client.post("/items/a")
+    assert middleware.REQUEST_COUNT.labels("POST", "/items/{item_id}", "405")._value.get() == 1
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import asyncio
+
+from app import order_store
+from app.batch_writer import BatchWriter
+
+
+def _reset():
+    order_store.ORDERS.clear()
+
+
+def test_fills_advance_status_and_coalesce_to_one_row_per_order():
+    _reset()
+    captured = []
+
+    async def flush(ops):
+        captured.extend(ops)
+
+    async def run():
+        order_store._writer = BatchWriter("orders-test", flush, batch_size=100, flush_interval=0.01)
+        order_store._writer.start()
+        try:
+            order_store.record_new("c1", symbol="BTC-USD", side="buy", quantity=2.0, price=100.0)
+            order_store.record_ack("c1", {"id": "x1", "status": "open", "fills": [{"qty": 1, "price": 100}]})
+            assert order_store.ORDERS["c1"]["status"] == "partially_filled"
+            order_store.record_fill("c1", {"qty": 1, "price": 101, "liquidity": "taker"})
+        finally:
+            await order_store._writer.stop()
+            order_store._writer = None
+
+    asyncio.run(run())
+    assert order_store.ORDERS["c1"]["status"] == "filled"
+    orders, executions = order_store.coalesce(captured)
+    assert len(orders) == 1
+    assert orders[0]["status"] == "filled" and orders[0]["exchange_order_id"] == "x1"
+    assert [e["price"] for e in executions] == [100.0, 101.0]
+    assert all(e["client_order_id"] == "c1" for e in executions)
+
+
+def test_retry_with_same_client_order_id_keeps_existing_record():
+    _reset()
+    first = order_store.record_new("c2", symbol="ETH-USD", side="sell", quantity=1.0)
+    order_store.record_fill("c2", {"qty": 0.5, "price": 2500})
+    again = order_store.record_new("c2", symbol="ETH-USD", side="sell", quantity=1.0)
+    assert again is first and again["filled_qty"] == 0.5
+    order_store.update_status("c2", "rejected", error="boom")
+    assert order_store.record_new("c2", symbol="ETH-USD", side="sell", quantity=1.0)["status"] == "new"
+
+
+def test_repeated_ack_and_fills_are_applied_once():
+    _reset()
+    seen = []
+    listener = lambda order, row: seen.append(row["execution_id"])  # noqa: E731
+    order_store.add_fill_listener(listener)
+    try:
+        order_store.record_new("c3", symbol="BTC-USD", side="buy", quantity=2.0)
+        ack = {"id": "x3", "status": "open", "fills": [{"executionId": "e1", "qty": 1, "price": 100}]}
+        order_store.record_ack("c3", ack)
+        # a retry with the same client order id gets the cached ack back
+        order_store.record_ack("c3", ack)
+        # and the stream redelivers the same execution
+        assert order_store.record_fill("c3", {"executionId": "e1", "qty": 1, "price": 100}) is None
+    finally:
+        order_store.remove_fill_listener(listener)
+    order = order_store.ORDERS["c3"]
+    assert order["filled_qty"] == 1.0 and order["status"] == "partially_filled"
+    assert seen == ["e1"]
+
+
+def test_ack_ignored_once_order_is_terminal_and_settles_unknown():
+    _reset()
+    order_store.record_new("c4", symbol="BTC-USD", side="buy", quantity=1.0)
+    order_store.record_fill("c4", {"executionId": "e9", "qty": 1, "price": 100})
+    order_store.record_ack("c4", {"id": "x4", "status": "open"})
+    assert order_store.ORDERS["c4"]["status"] == "filled"
+
+    order_store.record_new("c5", symbol="BTC-USD", side="buy", quantity=1.0)
+    order_store.update_status("c5", "unknown", error="read timeout")
+    assert order_store.ORDERS["c5"] in order_store.open_orders()
+    order_store.record_ack("c5", {"id": "x5"})
+    assert order_store.ORDERS["c5"]["status"] == "new"
+
+
+def test_normalize_status_aliases():
+    assert order_store.normalize_status("CANCELLED") == "canceled"
+    assert order_store.normalize_status("open") == "new"
+    assert order_store.normalize_status("weird", default="filled") == "filled"
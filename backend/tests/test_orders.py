@@ -95,3 +95,43 @@ def test_order_success_when_risk_ok_and_kill_switch_off(http_client):
     data = r.json()
     assert data.get("success") is True
     assert data.get("order", {}).get("symbol") == "ETH-USD"
+
+
+def test_order_recorded_in_order_store(http_client):
+    from app import order_store
+
+    payload = {
+        "symbol": "ETH-USD",
+        "side": "buy",
+        "qty": 1,
+        "clientOrderId": "test-store-1",
+        "notionalUsd": 100,
+        "slippageBps": 5,
+        "orderbookLiquidityUsd": 1_000_000,
+    }
+    r = http_client.post("/api/orders/place", json=payload)
+    assert r.status_code == 200
+    rec = order_store.ORDERS["test-store-1"]
+    assert rec["status"] == "new" and rec["exchange_order_id"] == "abc123"
+
+
+def test_order_with_lost_outcome_is_unknown_not_rejected(http_client, monkeypatch):
+    from app import order_store
+
+    class _TimingOutClient:
+        async def place_order(self, **kwargs):
+            raise exchange_client_module.OutcomeUnknown("exchange request outcome unknown for place_order: timed out")
+
+    monkeypatch.setattr(orders_routes.exchange_client, "get_exchange_client", lambda: _TimingOutClient())
+    payload = {
+        "symbol": "ETH-USD",
+        "side": "buy",
+        "qty": 1,
+        "clientOrderId": "test-unknown-1",
+        "notionalUsd": 100,
+        "slippageBps": 5,
+        "orderbookLiquidityUsd": 1_000_000,
+    }
+    r = http_client.post("/api/orders/place", json=payload)
+    assert r.status_code == 504
+    assert order_store.ORDERS["test-unknown-1"]["status"] == "unknown"
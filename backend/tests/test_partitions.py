@@ -0,0 +1,39 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+
+from app import partitions
+from app.settings import settings
+
+
+def _utc(y, m, d=1):
+    return datetime(y, m, d, tzinfo=timezone.utc)
+
+
+def test_month_helpers_roll_over_years():
+    assert partitions.add_months(_utc(2024, 11), 3) == _utc(2025, 2)
+    assert partitions.add_months(_utc(2024, 1), -1) == _utc(2023, 12)
+    assert partitions.partition_name("audit_log", _utc(2024, 3)) == "audit_log_p2024_03"
+    assert partitions.partition_month("executions_p2023_12") == _utc(2023, 12)
+    assert partitions.partition_month("executions_default") is None
+
+
+def test_plan_premakes_future_months_and_retires_expired(monkeypatch):
+    monkeypatch.setattr(settings, "PARTITION_PREMAKE_MONTHS", 2)
+    monkeypatch.setattr(settings, "PARTITION_RETENTION_MONTHS_AUDIT", 3)
+    attached = ["audit_log_p2024_01", "audit_log_p2024_02", "audit_log_p2024_05", "audit_log_p2024_06"]
+    create, retire = partitions.plan("audit_log", attached, _utc(2024, 6, 15))
+    assert create == [_utc(2024, 7), _utc(2024, 8)]
+    # cutoff is 2024-03: January and February are past retention
+    assert retire == ["audit_log_p2024_01", "audit_log_p2024_02"]
+
+
+def test_plan_keeps_everything_without_retention(monkeypatch):
+    monkeypatch.setattr(settings, "PARTITION_RETENTION_MONTHS_EXECUTIONS", 0)
+    _, retire = partitions.plan("executions", ["executions_p2000_01"], _utc(2024, 6))
+    assert retire == []
+
+
+def test_time_range_uses_bare_half_open_predicates():
+    where, params = partitions.time_range("e.executed_at", _utc(2024, 1), _utc(2024, 2))
+    assert where == ["e.executed_at >= %s", "e.executed_at < %s"]
+    assert params == [_utc(2024, 1), _utc(2024, 2)]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import pnl
+from app.pnl import PnlEngine
+from app.quotes import QuoteStore
+
+
+def test_fifo_realizes_against_oldest_lots():
+    e = PnlEngine("fifo")
+    e.apply("BTC-USD", "buy", 1, 100)
+    e.apply("BTC-USD", "buy", 1, 110)
+    assert e.apply("BTC-USD", "sell", 1.5, 120) == pytest.approx(20 + 5)
+    assert e.books["BTC-USD"].qty == pytest.approx(0.5)
+    assert e.books["BTC-USD"].avg_price == pytest.approx(110)
+    e.mark({"BTC-USD": 100})
+    assert e.unrealized == pytest.approx(-5)
+    s = e.summary()
+    assert s["tradesCount"] == 1 and s["winRate"] == 1.0
+
+
+def test_avg_cost_and_position_flip():
+    e = PnlEngine("avg")
+    e.apply("ETH-USD", "buy", 1, 100)
+    e.apply("ETH-USD", "buy", 1, 110)
+    # closes 2 @ avg 105, opens a 1 unit short at 100
+    assert e.apply("ETH-USD", "sell", 3, 100) == pytest.approx(-10)
+    assert e.books["ETH-USD"].qty == pytest.approx(-1)
+    assert e.apply("ETH-USD", "buy", 1, 90, fee=1) == pytest.approx(10)
+    assert e.realized == pytest.approx(-1)
+    assert e.summary()["positions"] == {}
+
+
+@pytest.mark.parametrize("kind", ["long", "short", "mixed"])
+def test_vectorized_recompute_matches_replay(kind):
+    rng = np.random.default_rng(7)
+    rows, pos = [], 0.0
+    for _ in range(300):
+        qty = float(rng.integers(1, 5))
+        if kind == "long":
+            side = "buy" if pos < qty or rng.random() < 0.5 else "sell"
+        elif kind == "short":
+            side = "sell" if -pos < qty or rng.random() < 0.5 else "buy"
+        else:
+            side = "buy" if rng.random() < 0.5 else "sell"
+        pos += qty if side == "buy" else -qty
+        rows.append(("BTC-USD", side, qty, float(rng.uniform(90, 110)), 0.01))
+    df = pd.DataFrame(rows, columns=["symbol", "side", "qty", "price", "fee"])
+
+    replay = PnlEngine("fifo")
+    for sym, side, qty, price, fee in rows:
+        replay.apply(sym, side, qty, price, fee)
+    fast = PnlEngine("fifo")
+    fast.recompute(df)
+
+    assert fast.realized == pytest.approx(replay.realized)
+    assert fast.trades == replay.trades and fast.wins == replay.wins
+    assert fast.books["BTC-USD"].qty == pytest.approx(replay.books["BTC-USD"].qty)
+    assert fast.books["BTC-USD"].cost == pytest.approx(replay.books["BTC-USD"].cost)
+
+
+def test_positions_are_marked_when_order_symbol_and_quote_pair_are_spelled_differently(monkeypatch):
+    store = QuoteStore()
+    monkeypatch.setattr(pnl.quotes, "store", store)
+    monkeypatch.setattr(pnl, "engine", PnlEngine("fifo"))
+    pnl.engine.apply("hype/usdc", "buy", 2, 10)
+    pnl.engine.apply("ETH-USD", "sell", 1, 100)
+    store.publish({"type": "quote", "venue": "PRJX", "pair": "HYPE/USDC", "mid": 12.0})
+    store.publish({"type": "quote", "venue": "PRJX", "pair": "ETH/USD", "mid": 90.0})
+    summary = pnl.refresh()
+    assert summary["unrealized"] == pytest.approx(2 * 2 + 10)
+    # positions keep the symbol as ordered
+    assert set(summary["positions"]) == {"hype/usdc", "ETH-USD"}
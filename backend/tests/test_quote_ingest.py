@@ -0,0 +1,82 @@
+from __future__ import annotations
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import quote_ingest, quotes
+from app.main import app
+from app.settings import settings
+
+
+def test_normalize_validates_and_interns():
+    # only canonical names count toward the bound: HYPERSWAP, HYPE/USDC, PRJX
+    table = quote_ingest.SymbolTable(max_size=3)
+    rows = [
+        {"venue": "hyperswap", "pair": "hype/usdc", "bid": 9.9, "ask": 10.1, "ts": 1},
+        {"venue": "HYPERSWAP", "pair": "HYPE/USDC", "mid": 10.0},
+        {"venue": "PRJX", "pair": "hype/usdc", "mid": -1},
+        {"venue": "PRJX", "pair": "HYPE/USDC", "bid": 1},
+        {"venue": " prjx ", "pair": "Hype/Usdc ", "mid": 2.0},
+        {"venue": "NEWVENUE", "pair": "HYPE/USDC", "mid": 1},
+        {"venue": "   ", "pair": "HYPE/USDC", "mid": 1},
+        ["not", "a", "dict"],
+        {"venue": 3, "pair": "X", "mid": 1},
+    ]
+    valid, rejected = quote_ingest.normalize(rows, table)
+    assert rejected == 6
+    assert len(table) == 3
+    assert [q["mid"] for q in valid] == [10.0, 10.0, 2.0]
+    assert valid[0]["venue"] is valid[1]["venue"] and valid[0]["pair"] is valid[1]["pair"] is valid[2]["pair"]
+    assert valid[2]["venue"] == "PRJX"
+    assert valid[0]["pair"] == "HYPE/USDC" and isinstance(valid[1]["ts"], int)
+
+
+def test_http_ndjson_batch_reaches_quote_store():
+    quotes.store.clear()
+    lines = [json.dumps({"venue": "PRJX", "pair": f"P{i}/USDC", "mid": 1 + i, "ts": 5}) for i in range(3)]
+    body = ("\n".join(lines) + "\n{broken\n").encode()
+    client = TestClient(app)
+    r = client.post("/api/live/quotes", content=body, headers={"content-type": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.json() == {"accepted": 3, "rejected": 1}
+    assert quotes.store.latest[("PRJX", "P2/USDC")]["mid"] == 3
+    r = client.post("/api/live/quotes", content=b"{}", headers={"content-type": "text/plain"})
+    assert r.status_code == 415
+
+
+def test_unix_socket_ndjson_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "QUOTE_INGEST_SOCKET", str(tmp_path / "ingest-{pid}.sock"))
+    store = quotes.QuoteStore()
+    monkeypatch.setattr(quotes, "store", store)
+
+    async def run():
+        await quote_ingest.start()
+        try:
+            _, writer = await asyncio.open_unix_connection(quote_ingest._socket_path)
+            payload = b"".join(json.dumps({"venue": "HYBRA", "pair": "HYPE/USDC", "mid": m}).encode() + b"\n" for m in (1, 2, 3))
+            # split inside a line: the listener must carry the partial row over
+            writer.write(payload[:20])
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            writer.write(payload[20:])
+            writer.close()
+            await writer.wait_closed()
+            for _ in range(100):
+                if len(store.recent()) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await quote_ingest.stop()
+
+    asyncio.run(run())
+    assert [q["mid"] for q in store.recent()] == [1, 2, 3]
+
+
+def test_http_msgpack_batch():
+    msgpack = pytest.importorskip("msgpack")
+    quotes.store.clear()
+    body = msgpack.packb([{"venue": "PRJX", "pair": "HYPE/USDC", "mid": 2.5, "ts": 1}])
+    r = TestClient(app).post("/api/live/quotes", content=body, headers={"content-type": "application/msgpack"})
+    assert r.json() == {"accepted": 1, "rejected": 0}
@@ -28,3 +28,48 @@ def test_rate_limit_blocks_after_threshold():
     # Third exceeds
     r3 = client.post("/api/bot/pause")
     assert r3.status_code == 429
+
+
+def test_rate_limit_sets_retry_after():
+    settings.RATE_LIMIT_CONTROL_PER_MIN = 1
+    assert client.post("/api/bot/pause").status_code == 200
+    r = client.post("/api/bot/pause")
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+
+def test_gcra_refills_at_rate_and_caps_tracked_keys():
+    from app.ratelimit import GcraLimiter
+
+    lim = GcraLimiter("test", max_keys=3)
+    # 60/min with burst 2: two immediate, then one per second
+    assert lim.check("a", 60, 2, now=0.0) == (True, 0.0)
+    assert lim.check("a", 60, 2, now=0.0)[0]
+    allowed, retry = lim.check("a", 60, 2, now=0.0)
+    assert not allowed and retry == 1.0
+    assert lim.check("a", 60, 2, now=1.0)[0]
+    # spoofed identities cannot grow state past the cap
+    for i in range(100):
+        lim.check(f"spoof-{i}", 60, 2, now=1.0)
+    assert len(lim) == 3
+    # expired keys are swept as soon as time passes
+    lim.check("fresh", 60, 2, now=1000.0)
+    assert len(lim) == 1
+
+
+def test_shared_backend_error_falls_back_to_local_limiter(monkeypatch):
+    from app import ratelimit, shared_state
+
+    class _BrokenBackend:
+        name = "postgres"
+        shared = True
+
+        async def gcra(self, key, interval, tolerance):
+            raise OSError("connection refused")
+
+    monkeypatch.setattr(shared_state, "_backend", _BrokenBackend())
+    settings.RATE_LIMIT_CONTROL_PER_MIN = 1
+    before = ratelimit.RATE_LIMIT_FALLBACKS.labels("control")._value.get()
+    assert client.post("/api/bot/pause").status_code == 200
+    assert client.post("/api/bot/pause").status_code == 429
+    assert ratelimit.RATE_LIMIT_FALLBACKS.labels("control")._value.get() == before + 2
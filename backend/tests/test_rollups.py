@@ -0,0 +1,28 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rollups import floor_bucket, pick_bucket
+
+
+def test_pick_bucket_uses_coarsest_width_that_fits():
+    end = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert pick_bucket(end - timedelta(minutes=30), end, 500) == "1m"
+    assert pick_bucket(end - timedelta(hours=6), end, 500) == "1h"
+    assert pick_bucket(end - timedelta(days=7), end, 500) == "1d"
+    assert pick_bucket(end - timedelta(seconds=10), end, 500) == "1m"
+    # nothing fits: fall back to the day rollup
+    assert pick_bucket(end - timedelta(days=3650), end, 500) == "1d"
+
+
+def test_floor_bucket_is_utc():
+    at = datetime(2024, 6, 1, 13, 47, 12, tzinfo=timezone(timedelta(hours=2)))
+    assert floor_bucket(at, "1h") == datetime(2024, 6, 1, 11, 0, tzinfo=timezone.utc)
+    assert floor_bucket(at, "1d") == datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def test_rollup_api_requires_db():
+    with TestClient(app) as c:
+        assert c.get("/api/rollups/volume").status_code == 503
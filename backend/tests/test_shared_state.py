@@ -0,0 +1,168 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+
+from app import shared_state
+from app.schemas import Strategy
+from app.shared_state import MemoryBackend, SharedDict, SqliteBackend
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_unbound_shared_dict_behaves_like_a_dict():
+    d = SharedDict("t-unbound", {"a": 1})
+    d["b"] = 2
+    del d["a"]
+    assert dict(d) == {"b": 2}
+    assert "a" not in d and d.get("a", 5) == 5
+
+
+def test_memory_backend_seeds_and_reloads():
+    backend = MemoryBackend()
+    d = SharedDict("t-mem", {"x": 1})
+    d.bind(backend)
+    d["y"] = {"k": [1, 2]}
+    assert backend.load("t-mem") == {"x": "1", "y": '{"k": [1, 2]}'}
+    assert d["y"] == {"k": [1, 2]}
+
+
+def test_sqlite_changes_propagate_between_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    # two backends on one file stand in for two workers
+    b1, b2 = SqliteBackend(path, poll_ms=5), SqliteBackend(path, poll_ms=5)
+    w1 = SharedDict("t-bot", {"killSwitch": False, "isRunning": False})
+    w2 = SharedDict("t-bot", {})
+    w1.bind(b1)
+    w2.bind(b2)
+    seen = []
+    w2.on_change(lambda k, v: seen.append((k, v)))
+    b2.watch(lambda ns: w2.reload() if ns == "t-bot" else None)
+    try:
+        assert dict(w2) == {"killSwitch": False, "isRunning": False}
+        w1["killSwitch"] = True
+        assert _wait_for(lambda: w2["killSwitch"] is True)
+        assert ("killSwitch", True) in seen
+        del w1["isRunning"]
+        assert _wait_for(lambda: "isRunning" not in w2)
+    finally:
+        b1.close()
+        b2.close()
+
+
+def test_on_loop_writes_are_queued_and_reloads_land_on_the_loop_thread(tmp_path):
+    path = str(tmp_path / "state.db")
+    other = SqliteBackend(path)
+    d = SharedDict("t-loop", {"a": 1})
+    hook_threads = []
+    d.on_change(lambda k, v: hook_threads.append(threading.current_thread()))
+
+    async def run():
+        shared_state.start(SqliteBackend(path, poll_ms=5))
+        try:
+            d["a"] = 2
+            assert d["a"] == 2
+            # another worker writes; the watcher thread picks it up
+            other.put("t-loop", "b", "3")
+            for _ in range(200):
+                if d.get("b") == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            shared_state.stop()
+
+    asyncio.run(run())
+    assert d["b"] == 3 and d["a"] == 2
+    assert other.load("t-loop")["a"] == "2"
+    assert hook_threads and all(t is threading.main_thread() for t in hook_threads)
+    other.close()
+
+
+def test_sqlite_seed_does_not_override_existing_values(tmp_path):
+    path = str(tmp_path / "state.db")
+    b1 = SqliteBackend(path)
+    first = SharedDict("t-risk", {"maxSlippageBps": 50.0})
+    first.bind(b1)
+    first["maxSlippageBps"] = 10.0
+    later = SharedDict("t-risk", {"maxSlippageBps": 50.0, "maxOpenPositions": 3})
+    later.bind(SqliteBackend(path))
+    assert dict(later) == {"maxSlippageBps": 10.0, "maxOpenPositions": 3}
+
+
+def test_namespace_seed_respects_deletes(tmp_path):
+    path = str(tmp_path / "state.db")
+    strat = Strategy(id="s1", name="n", description="d", category="arbitrage", parameters={},
+                     createdAt="t", updatedAt="t", isActive=True, version="1", tags=[])
+    codec = dict(encode=lambda s: s.model_dump(), decode=lambda d: Strategy(**d), seed_per_key=False)
+    a = SharedDict("t-strats", {"s1": strat}, **codec)
+    a.bind(SqliteBackend(path))
+    assert a["s1"] == strat
+    a["s2"] = strat.model_copy(update={"id": "s2"})
+    del a["s1"]
+    b = SharedDict("t-strats", {"s1": strat}, **codec)
+    b.bind(SqliteBackend(path))
+    assert list(b) == ["s2"]
+
+
+def test_sqlite_gcra_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    b1, b2 = SqliteBackend(path), SqliteBackend(path)
+    interval, tolerance = 60.0 / 6, 60.0 / 6 * 2  # 6/min, burst 3
+
+    async def run():
+        results = []
+        for b in (b1, b2, b1, b2):
+            results.append(await b.gcra("orders:tok:abc", interval, tolerance))
+        return results
+
+    results = asyncio.run(run())
+    assert [ok for ok, _ in results] == [True, True, True, False]
+    assert 0 < results[-1][1] <= interval
+    # other identities are unaffected
+    assert asyncio.run(b2.gcra("orders:tok:other", interval, tolerance))[0]
+
+
+class _FakeListenConn:
+    def __init__(self, payloads, backend):
+        self.payloads = payloads
+        self.backend = backend
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        pass
+
+    def notifies(self):
+        for payload in self.payloads:
+            if isinstance(payload, Exception):
+                raise payload
+            if payload == shared_state._STOP_PAYLOAD:
+                self.backend._stop.set()
+            yield type("Notify", (), {"payload": payload, "pid": 0})()
+
+
+def test_postgres_watcher_reconnects_and_reloads_everything(monkeypatch):
+    # no database here: drive the watcher loop with fake LISTEN connections
+    backend = object.__new__(shared_state.PostgresBackend)
+    backend.url = "postgresql://test"
+    backend._stop = threading.Event()
+    conns = iter([
+        _FakeListenConn(["risk", OSError("server closed the connection unexpectedly")], backend),
+        _FakeListenConn(["strategies", shared_state._STOP_PAYLOAD], backend),
+    ])
+    monkeypatch.setattr(shared_state, "psycopg", type("psycopg", (), {"connect": staticmethod(lambda *a, **k: next(conns))}))
+    seen = []
+    backend._watch(seen.append)
+    # every (re)connect reloads all namespaces: notifications sent while it was down are gone
+    assert seen == [shared_state.ALL_NAMESPACES, "risk", shared_state.ALL_NAMESPACES, "strategies"]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import asyncio
+import json
+
+from app import order_store, trade_stream
+from app.trade_stream import HEARTBEAT, RESET, TradeBroadcaster
+
+
+def _data(frame: bytes) -> dict:
+    return json.loads(frame.split(b"data: ", 1)[1])
+
+
+def test_one_encoding_fans_out_to_all_subscribers():
+    b = TradeBroadcaster(replay=10)
+
+    async def run():
+        s1, s2 = b.stream(), b.stream()
+        assert await s1.__anext__() == b"retry: 2000\n\n"
+        assert await s2.__anext__() == b"retry: 2000\n\n"
+        # both subscribed once their first frame was pulled
+        event_id = b.publish({"id": "t1", "price": 1})
+        f1, f2 = await s1.__anext__(), await s2.__anext__()
+        await s1.aclose()
+        await s2.aclose()
+        return event_id, f1, f2
+
+    event_id, f1, f2 = asyncio.run(run())
+    assert f1 is f2
+    assert f1.startswith(f"id: {event_id}\n".encode()) and _data(f1)["id"] == "t1"
+    assert not b._subscribers
+
+
+def test_last_event_id_resumes_or_resets():
+    b = TradeBroadcaster(replay=3)
+    ids = [b.publish({"n": i}) for i in range(5)]
+    frames, complete = b.replay(ids[2])
+    assert complete and [_data(f)["n"] for f in frames] == [3, 4]
+    frames, complete = b.replay(ids[0])  # the event after it (n=1) has left the window
+    assert not complete and [_data(f)["n"] for f in frames] == [2, 3, 4]
+    frames, complete = b.replay("otherboot-4")
+    assert not complete and len(frames) == 3
+
+    async def run():
+        gen = b.stream(ids[0])
+        out = [await gen.__anext__() for _ in range(5)]
+        await gen.aclose()
+        return out
+
+    out = asyncio.run(run())
+    assert out[1] == RESET and [_data(f)["n"] for f in out[2:]] == [2, 3, 4]
+
+
+def test_slow_subscriber_is_dropped_and_heartbeats_when_idle(monkeypatch):
+    monkeypatch.setattr(trade_stream.settings, "SSE_HEARTBEAT_SEC", 0.01)
+    b = TradeBroadcaster(replay=10, queue_size=2)
+
+    async def run():
+        gen = b.stream()
+        await gen.__anext__()
+        assert await gen.__anext__() == HEARTBEAT
+        for i in range(3):
+            b.publish({"n": i})
+        rest = [frame async for frame in gen]
+        return rest
+
+    rest = asyncio.run(run())
+    assert [_data(f)["n"] for f in rest] == [0, 1]
+    assert not b._subscribers
+
+
+def test_recorded_fills_are_published():
+    order_store.ORDERS.clear()
+    b = TradeBroadcaster(replay=10)
+    orig, trade_stream.broadcaster = trade_stream.broadcaster, b
+    trade_stream.start()
+    try:
+        order_store.record_new("c1", symbol="ETH-USD", side="buy", quantity=1.0, strategy="s1")
+        order_store.record_fill("c1", {"qty": 1, "price": 2000, "executionId": "e1", "fee": 0.5, "feeCurrency": "USD"})
+    finally:
+        trade_stream.stop()
+        trade_stream.broadcaster = orig
+        order_store.ORDERS.clear()
+    frames, _ = b.replay(f"{b.boot}-0")
+    trade = _data(frames[0])
+    assert trade["id"] == "e1" and trade["pair"] == "ETH-USD" and trade["value"] == 2000.0
+    assert trade["timestamp"].endswith("Z")
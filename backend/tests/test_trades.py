@@ -0,0 +1,38 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.trades import build_query
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    c = encode_cursor(at, "0b7e6a1e-0000-4000-8000-000000000001")
+    assert decode_cursor(c) == (at, "0b7e6a1e-0000-4000-8000-000000000001")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+    # well-formed cursor, but the id would fail the ::uuid cast in Postgres
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(at, "not-a-uuid"))
+
+
+def test_query_is_keyset_not_offset():
+    at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    sql, params = build_query(50, encode_cursor(at, "0b7e6a1e-0000-4000-8000-000000000001"), symbol="BTC-USD")
+    assert "OFFSET" not in sql.upper()
+    assert "(e.executed_at, e.id) < (%s, %s::uuid)" in sql
+    assert sql.endswith("ORDER BY e.executed_at DESC, e.id DESC LIMIT %s")
+    assert params == ["BTC-USD", at, "0b7e6a1e-0000-4000-8000-000000000001", 51]
+    # unused filters stay out of the WHERE clause
+    assert "strategy" not in sql.split("FROM", 1)[1]
+
+
+def test_trades_fall_back_to_demo_data_without_db():
+    with TestClient(app) as c:
+        r = c.get("/api/activity/trades", params={"limit": 3})
+    assert r.status_code == 200
+    assert len(r.json()) == 3 and "X-Next-Cursor" not in r.headers
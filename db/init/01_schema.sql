@@ -15,8 +15,9 @@ CREATE TABLE IF NOT EXISTS orders (
   quantity          numeric(38,10) NOT NULL CHECK (quantity > 0),
   price             numeric(38,10),
   notional_usd      numeric(38,10),
+  strategy          text,
   status            text NOT NULL CHECK (status IN (
-                        'new','partially_filled','filled','canceled','rejected','expired'
+                        'new','partially_filled','unknown','filled','canceled','rejected','expired'
                       )),
   exchange_order_id text,
   error             text,
@@ -26,11 +27,18 @@ CREATE TABLE IF NOT EXISTS orders (
 
 CREATE INDEX IF NOT EXISTS idx_orders_symbol_status ON orders (symbol, status);
 CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at);
+-- Write-behind upserts are keyed by client_order_id (NULLs stay allowed for manual rows)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_orders_client_order_id ON orders (client_order_id);
 
--- Trade executions for each order
+-- Trade executions for each order, partitioned by month on executed_at
+-- (partitions are created ahead and retired by the backend, see app/partitions.py)
 CREATE TABLE IF NOT EXISTS executions (
-  id            uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  id            uuid NOT NULL DEFAULT gen_random_uuid(),
   order_id      uuid NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+  -- denormalized from orders so trade history reads never join
+  symbol        text NOT NULL,
+  side          text NOT NULL CHECK (side IN ('buy','sell')),
+  strategy      text,
   execution_id  text,
   trade_id      text,
   price         numeric(38,10) NOT NULL,
@@ -38,11 +46,31 @@ CREATE TABLE IF NOT EXISTS executions (
   fee_currency  text,
   fee_amount    numeric(38,10),
   liquidity     text CHECK (liquidity IN ('maker','taker')),
-  executed_at   timestamptz NOT NULL DEFAULT now()
-);
+  executed_at   timestamptz NOT NULL DEFAULT now(),
+  -- when the row was written; rollups advance on this, since fills can land late
+  ingested_at   timestamptz NOT NULL DEFAULT now(),
+  -- the partition key must be part of the primary key
+  PRIMARY KEY (id, executed_at)
+) PARTITION BY RANGE (executed_at);
 
 CREATE INDEX IF NOT EXISTS idx_exec_order_id ON executions (order_id);
-CREATE INDEX IF NOT EXISTS idx_exec_executed_at ON executions (executed_at);
+CREATE INDEX IF NOT EXISTS idx_exec_ingested_at ON executions (ingested_at);
+-- Venue execution ids already stored, one per order. executions is partitioned, so a
+-- unique index there would have to include executed_at; a redelivered fill is claimed
+-- here first and skipped when its id is taken (see app/order_store.py)
+CREATE TABLE IF NOT EXISTS execution_ids (
+  order_id      uuid NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+  execution_id  text NOT NULL,
+  PRIMARY KEY (order_id, execution_id)
+);
+-- Covering keyset indexes for trade history: (filter, executed_at, id) + Trade fields,
+-- so any page is an index-only range scan regardless of depth
+CREATE INDEX IF NOT EXISTS idx_exec_keyset ON executions (executed_at DESC, id DESC)
+  INCLUDE (symbol, side, strategy, price, quantity, fee_amount, fee_currency);
+CREATE INDEX IF NOT EXISTS idx_exec_symbol_keyset ON executions (symbol, executed_at DESC, id DESC)
+  INCLUDE (side, strategy, price, quantity, fee_amount, fee_currency);
+CREATE INDEX IF NOT EXISTS idx_exec_strategy_keyset ON executions (strategy, executed_at DESC, id DESC)
+  INCLUDE (symbol, side, price, quantity, fee_amount, fee_currency);
 
 -- PnL snapshots for monitoring/reporting
 CREATE TABLE IF NOT EXISTS pnl_snapshots (
@@ -51,14 +79,82 @@ CREATE TABLE IF NOT EXISTS pnl_snapshots (
   realized_pnl_usd     numeric(38,10) NOT NULL DEFAULT 0,
   unrealized_pnl_usd   numeric(38,10) NOT NULL DEFAULT 0,
   equity_usd           numeric(38,10),
-  notes                text
+  notes                text,
+  ingested_at          timestamptz NOT NULL DEFAULT now()
 );
 
 CREATE INDEX IF NOT EXISTS idx_pnl_at ON pnl_snapshots (at);
+CREATE INDEX IF NOT EXISTS idx_pnl_ingested_at ON pnl_snapshots (ingested_at);
+
+-- Rollups for charts: per bucket width ('1m' | '1h' | '1d'), buckets in UTC.
+-- Filled incrementally by the backend (app/rollups.py) up to the watermark below.
+CREATE TABLE IF NOT EXISTS exec_rollup (
+  bucket_width   text NOT NULL CHECK (bucket_width IN ('1m','1h','1d')),
+  bucket         timestamptz NOT NULL,
+  symbol         text NOT NULL,
+  trades         bigint NOT NULL DEFAULT 0,
+  buy_qty        numeric(38,10) NOT NULL DEFAULT 0,
+  sell_qty       numeric(38,10) NOT NULL DEFAULT 0,
+  buy_notional   numeric(38,10) NOT NULL DEFAULT 0,
+  sell_notional  numeric(38,10) NOT NULL DEFAULT 0,
+  fees           numeric(38,10) NOT NULL DEFAULT 0,  -- USD-denominated fees only
+  PRIMARY KEY (bucket_width, symbol, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_exec_rollup_bucket ON exec_rollup (bucket_width, bucket);
+
+CREATE TABLE IF NOT EXISTS pnl_rollup (
+  bucket_width        text NOT NULL CHECK (bucket_width IN ('1m','1h','1d')),
+  bucket              timestamptz NOT NULL,
+  realized_pnl_usd    numeric(38,10),  -- last snapshot in the bucket
+  unrealized_pnl_usd  numeric(38,10),
+  equity_usd          numeric(38,10),
+  last_at             timestamptz,     -- time of that snapshot
+  total_min_usd       numeric(38,10),
+  total_max_usd       numeric(38,10),
+  samples             bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket_width, bucket)
+);
+
+-- Source rows ingested before processed_to are already folded into the named rollup
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+  name          text PRIMARY KEY,
+  processed_to  timestamptz NOT NULL
+);
+
+-- Control state shared by all backend workers/nodes (SHARED_STATE_BACKEND=postgres);
+-- writers NOTIFY shared_state with the namespace so other processes reload it
+CREATE TABLE IF NOT EXISTS shared_state (
+  ns          text NOT NULL,
+  key         text NOT NULL,
+  value       jsonb NOT NULL,
+  updated_at  timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (ns, key)
+);
+
+-- GCRA theoretical arrival time (epoch seconds) per limit class + identity; disposable, so unlogged
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+  key  text PRIMARY KEY,
+  tat  double precision NOT NULL
+);
+
+-- Bot log entries evicted from the backend's in-memory ring (BOT_LOG_SPILL_TO_DB=1);
+-- seq restarts with each process, boot_id tells the runs apart
+CREATE TABLE IF NOT EXISTS bot_logs (
+  boot_id  text NOT NULL,
+  seq      bigint NOT NULL,
+  level    text NOT NULL,
+  message  text NOT NULL,
+  context  jsonb,
+  at       timestamptz NOT NULL,
+  PRIMARY KEY (boot_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_bot_logs_level ON bot_logs (boot_id, level, seq DESC);
+CREATE INDEX IF NOT EXISTS idx_bot_logs_at ON bot_logs (at);
 
 -- Audit log for compliance: control actions and changes
 CREATE TABLE IF NOT EXISTS audit_log (
-  id           uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  id           uuid NOT NULL DEFAULT gen_random_uuid(),
   at           timestamptz NOT NULL DEFAULT now(),
   actor        text,          -- e.g. user/email/token id
   actor_type   text,          -- 'user' | 'token' | 'system'
@@ -67,13 +163,37 @@ CREATE TABLE IF NOT EXISTS audit_log (
   resource_id  text,
   details      jsonb,
   ip           text,
-  user_agent   text
-);
+  user_agent   text,
+  PRIMARY KEY (id, at)
+) PARTITION BY RANGE (at);
 
-CREATE INDEX IF NOT EXISTS idx_audit_at ON audit_log (at);
-CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log (action);
+-- Keyset indexes for /api/audit: each filter column, then (at, id) for paging
+CREATE INDEX IF NOT EXISTS idx_audit_keyset ON audit_log (at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log (action, at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_actor ON audit_log (actor, at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_resource ON audit_log (resource, at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_audit_details ON audit_log USING GIN (details);
 
+-- Monthly partitions (UTC) from last month to three months ahead; the backend keeps
+-- PARTITION_PREMAKE_MONTHS ahead from then on. Names: <table>_pYYYY_MM.
+DO $$
+DECLARE
+  m timestamptz;
+  t text;
+BEGIN
+  -- month arithmetic on timestamptz follows the session time zone
+  PERFORM set_config('TimeZone', 'UTC', true);
+  FOREACH t IN ARRAY ARRAY['executions', 'audit_log'] LOOP
+    FOR i IN -1..3 LOOP
+      m := date_trunc('month', now()) + make_interval(months => i);
+      EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        t || '_p' || to_char(m, 'YYYY_MM'), t, m, m + interval '1 month'
+      );
+    END LOOP;
+  END LOOP;
+END $$;
+
 -- Trigger to maintain updated_at on orders
 CREATE OR REPLACE FUNCTION set_updated_at()
 RETURNS trigger AS $$